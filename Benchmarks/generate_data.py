@@ -0,0 +1,149 @@
+"""Generate a scaled-up synthetic dataset with the same CSV schemas as Data/.
+
+    python generate_data.py --characters 10000 --movies 20 --avg-degree 6 --out generated/10k
+    python generate_data.py --characters 1000000 --distribution uniform --out generated/1m
+
+With the default power-law distribution a few characters become hubs (like Jack Sparrow),
+which is what stresses path finding, ego graphs and the leaderboard. Output is streamed, so
+large datasets do not need to fit in memory beyond the per-character weights.
+"""
+import argparse
+import csv
+import os
+import random
+from itertools import accumulate
+
+FIRST_NAMES = ["Jack", "William", "Elizabeth", "Hector", "Davy", "James", "Joshamee", "Anamaria",
+               "Tia", "Carina", "Henry", "Armando", "Edward", "Angelica", "Philip", "Syrena",
+               "Cutler", "Weatherby", "Sao", "Ragetti", "Pintel", "Marty", "Cotton", "Bootstrap"]
+LAST_NAMES = ["Sparrow", "Turner", "Swann", "Barbossa", "Jones", "Norrington", "Gibbs", "Dalma",
+              "Smyth", "Salazar", "Teach", "Swift", "Beckett", "Feng", "Mercer", "Groves", "Murtogg"]
+ROLES = ["Pirate", "Pirate Lord", "Captain", "Blacksmith", "Governor", "Officer", "Sailor",
+         "Sea Witch", "First Mate", "Navigator", "Cook", "Quartermaster"]
+FACTIONS = ["Pirate", "Black Pearl Crew", "Brethren Court", "Royal Navy", "Flying Dutchman",
+            "East India Trading Company", "Cursed", "Independent", "Spanish Navy"]
+STATUSES = ["Alive", "Alive", "Alive", "Dead", "Cursed", "Unknown"]
+
+# Relationship and route types with roughly the mix of the real data
+RELATIONSHIP_TYPES = {"ALLY": 17, "ENEMY": 12, "CREW": 10, "FAMILY": 6, "LOVE": 4, "RIVALRY": 3,
+                      "MISTRUST": 3, "BETRAYED": 3, "UNEASY_ALLY": 2, "FRIENDS": 2, "RESPECT": 1,
+                      "RESCUED": 1, "HELPED": 1}
+ROUTE_TYPES = {"SAILED_IN": 7, "ENGAGED_IN_BATTLE": 7, "DOCKED_AT": 6, "ARRIVED_AT": 3, "VISITED": 1,
+               "DISCOVERED": 1, "PATROLS": 1, "DEPARTED_FROM": 1, "RETURNED_TO": 1}
+SHIP_TYPES = ["Pirate Ship", "Ghost Ship", "Navy Ship", "Merchant Ship", "Galleon"]
+PLACES = ["Cove", "Isle", "Port", "Reef", "Bay", "Harbour", "Keys", "Fortress", "Lagoon"]
+
+
+def weighted_picker(rng, weights):
+    items = list(weights)
+    cumulative = list(accumulate(weights.values()))
+    return lambda: rng.choices(items, cum_weights=cumulative)[0]
+
+
+def writer(out, filename, header):
+    f = open(os.path.join(out, filename), 'w', newline='', encoding='utf-8')
+    w = csv.writer(f)
+    w.writerow(header)
+    return f, w
+
+
+def generate(args):
+    rng = random.Random(args.seed)
+    os.makedirs(args.out, exist_ok=True)
+    n, movies = args.characters, [f"M{i}" for i in range(1, args.movies + 1)]
+
+    f, w = writer(args.out, 'nodes_movies.csv', ['id', 'title', 'release_year', 'budget_in_million'])
+    for i, movie_id in enumerate(movies):
+        w.writerow([movie_id, f"Synthetic Voyage {i + 1}", 2003 + i, f"${rng.randint(100, 450)}"])
+    f.close()
+
+    # Activity weight per character: drives both its degree and how many movies it is in
+    if args.distribution == 'powerlaw':
+        weights = [rng.paretovariate(args.alpha) for _ in range(n)]
+    else:
+        weights = [1.0] * n
+    cumulative = list(accumulate(weights))
+    max_weight = max(weights)
+
+    def pick_characters(k):
+        return rng.choices(range(n), cum_weights=cumulative, k=k)
+
+    f, w = writer(args.out, 'nodes_characters.csv', ['id', 'name', 'role', 'faction', 'status'])
+    for i in range(n):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i + 1}"
+        w.writerow([f"C{i + 1}", name, rng.choice(ROLES), rng.choice(FACTIONS), rng.choice(STATUSES)])
+    f.close()
+
+    f, w = writer(args.out, 'nodes_cast.csv', ['cast_id', 'actor_name'])
+    for i in range(n):
+        w.writerow([i + 1, f"Actor {i + 1}"])
+    f.close()
+
+    cast_f, cast_w = writer(args.out, 'relationships_cast.csv', ['character_id', 'cast_id', 'movie_id', 'type'])
+    movies_f, movies_w = writer(args.out, 'relationships_movies.csv', ['character_id', 'movie_id', 'type'])
+    for i in range(n):
+        share = weights[i] / max_weight
+        count = max(1, min(len(movies), round(1 + share * (len(movies) - 1) * 2)))
+        for movie_id in sorted(rng.sample(movies, count), key=lambda m: int(m[1:])):
+            cast_w.writerow([f"C{i + 1}", i + 1, movie_id, 'PLAYED_BY'])
+            movies_w.writerow([f"C{i + 1}", movie_id, 'APPEARS_IN'])
+    cast_f.close()
+    movies_f.close()
+
+    relationship_type = weighted_picker(rng, RELATIONSHIP_TYPES)
+    total = n * args.avg_degree // 2
+    f, w = writer(args.out, 'relationships_characters.csv',
+                  ['relationship_id', 'movie_id', 'character_id_1', 'character_id_2', 'type'])
+    written, batch = 0, 10000
+    while written < total:
+        size = min(batch, total - written)
+        sources, targets = pick_characters(size), pick_characters(size)
+        for a, b in zip(sources, targets):
+            if a == b:
+                b = (b + 1) % n
+            written += 1
+            w.writerow([f"R{written}", rng.choice(movies), f"C{a + 1}", f"C{b + 1}", relationship_type()])
+    f.close()
+
+    f, w = writer(args.out, 'nodes_ships.csv', ['id', 'ship_name', 'type', 'captain'])
+    for i in range(args.ships):
+        w.writerow([f"S{i + 1}", f"The {rng.choice(LAST_NAMES)} {rng.choice(['Pearl', 'Revenge', 'Star', 'Wraith', 'Maiden'])} {i + 1}",
+                    rng.choice(SHIP_TYPES), f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"])
+    f.close()
+
+    f, w = writer(args.out, 'nodes_locations.csv', ['id', 'location_name', 'description'])
+    for i in range(args.locations):
+        place = rng.choice(PLACES)
+        w.writerow([f"L{i + 1}", f"{rng.choice(LAST_NAMES)} {place} {i + 1}",
+                    f"a {rng.choice(['hidden', 'lawless', 'guarded', 'cursed', 'forgotten'])} {place.lower()}"])
+    f.close()
+
+    route_type = weighted_picker(rng, ROUTE_TYPES)
+    f, w = writer(args.out, 'relationships_ship_locations.csv', ['movie_id', 'ship_id', 'location_id', 'type'])
+    for movie_id in movies:
+        for ship in range(args.ships):
+            for location in rng.sample(range(args.locations), min(args.routes_per_ship, args.locations)):
+                w.writerow([movie_id, f"S{ship + 1}", f"L{location + 1}", route_type()])
+    f.close()
+
+    print(f"Wrote {n} characters, {total} relationships, {len(movies)} movies, "
+          f"{args.ships} ships and {args.locations} locations to {args.out}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic Pirates dataset")
+    parser.add_argument('--characters', type=int, default=10000)
+    parser.add_argument('--movies', type=int, default=5)
+    parser.add_argument('--avg-degree', type=int, default=4, help="average relationships per character")
+    parser.add_argument('--distribution', choices=['powerlaw', 'uniform'], default='powerlaw')
+    parser.add_argument('--alpha', type=float, default=2.0, help="Pareto shape for the power law (lower = bigger hubs)")
+    parser.add_argument('--ships', type=int, default=50)
+    parser.add_argument('--locations', type=int, default=200)
+    parser.add_argument('--routes-per-ship', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'generated'))
+    generate(parser.parse_args(argv))
+
+
+if __name__ == '__main__':
+    main()
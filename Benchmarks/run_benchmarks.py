@@ -0,0 +1,210 @@
+"""Benchmark every API endpoint and report throughput and p50/p95/p99 latency.
+
+    python run_benchmarks.py --backend snapshot --data-dir generated/10k
+    python run_benchmarks.py --backend neo4j --data-dir generated/10k --load
+    python run_benchmarks.py --backend http --url http://localhost:5000 --data-dir ../Data
+
+Backends:
+  snapshot  in-process server answering from an in-memory snapshot of the CSVs (no database)
+  neo4j     in-process server talking to Neo4j; --load first loads the CSVs with ingest.py
+  http      a server that is already running somewhere, reached over HTTP
+
+The data dir is also where request parameters (character ids, movies, search terms) come from,
+so point it at the same CSVs the server is using.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WEB_APP = os.path.join(HERE, '..', 'WebApplication')
+DEFAULT_DATA_DIR = os.path.join(HERE, '..', 'Data')
+
+
+def read_ids(data_dir, filename, column):
+    with open(os.path.join(data_dir, filename), newline='', encoding='utf-8') as f:
+        return [row[column] for row in csv.DictReader(f) if row.get(column)]
+
+
+class Params:
+    """Random but realistic request parameters drawn from the dataset"""
+
+    def __init__(self, data_dir, seed):
+        self.rng = random.Random(seed)
+        self.characters = read_ids(data_dir, 'nodes_characters.csv', 'id')
+        self.movies = read_ids(data_dir, 'nodes_movies.csv', 'id')
+        names = read_ids(data_dir, 'nodes_characters.csv', 'name')
+        # What people type: the first few letters of a name
+        self.terms = [word.lower()[:self.rng.randint(3, 6)] for name in names[:1000] for word in name.split()[:2]]
+
+    def character(self):
+        return self.rng.choice(self.characters)
+
+    def movie(self):
+        return self.rng.choice(self.movies)
+
+    def term(self):
+        return self.rng.choice(self.terms)
+
+
+ENDPOINTS = {
+    'health': lambda p: ('GET', '/api/health', None),
+    'characters': lambda p: ('GET', '/api/characters', None),
+    'character_relationships': lambda p: ('GET', '/api/characters/relationships', None),
+    'movie_relationships': lambda p: ('GET', f'/api/relationships/{p.movie()}', None),
+    'character_connections': lambda p: ('GET', f'/api/character/{p.character()}/connections', None),
+    'character_movies': lambda p: ('GET', f'/api/character/{p.character()}/movies', None),
+    'ship_routes': lambda p: ('GET', f'/api/ships/routes?movie_id={p.movie()}', None),
+    'rivalries': lambda p: ('GET', '/api/rivalries', None),
+    'factions': lambda p: ('GET', f'/api/factions?movie_id={p.movie()}', None),
+    'movies': lambda p: ('GET', '/api/movies', None),
+    'full_graph': lambda p: ('GET', '/api/graph/full', None),
+    'search': lambda p: ('GET', f'/api/search?q={p.term()}', None),
+    'path': lambda p: ('GET', f'/api/path/{p.character()}/{p.character()}', None),
+    'path_batch': lambda p: ('POST', '/api/path/batch',
+                             {"pairs": [[p.character(), p.character()] for _ in range(20)]}),
+    'leaderboard': lambda p: ('GET', '/api/leaderboard', None),
+    'stats_top': lambda p: ('GET', f'/api/stats/top/pagerank?limit=10&movie_id={p.movie()}', None),
+    'layout': lambda p: ('GET', '/api/layout/characters', None),
+    'fortune': lambda p: ('GET', '/api/fortune', None),
+    'pirate_name': lambda p: ('GET', '/api/pirate-name', None),
+}
+
+
+class InProcessClient:
+    """Flask test clients, one per thread, against server.py imported in this process"""
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def request(self, method, path, body):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body)
+        response.get_data()
+        return response.status_code
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, body):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+
+def make_client(args):
+    if args.backend == 'http':
+        return HttpClient(args.url)
+
+    # server.py reads its configuration from the environment at import time
+    os.environ['GRAPH_BACKEND'] = 'snapshot' if args.backend == 'snapshot' else 'neo4j'
+    os.environ['SNAPSHOT_SOURCE'] = 'csv'
+    os.environ['DATA_DIR'] = os.path.abspath(args.data_dir)
+    sys.path.insert(0, WEB_APP)
+    if args.load:
+        import ingest
+        if ingest.main(['--data-dir', args.data_dir, '--full']) != 0:
+            raise SystemExit("Loading the data into Neo4j failed")
+    import server
+    # Same as POST /api/reload, without needing the admin token
+    server.reload_local()
+    return InProcessClient(server.app)
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def bench_endpoint(client, make_request, params, args):
+    for _ in range(args.warmup):
+        client.request(*make_request(params))
+    requests = [make_request(params) for _ in range(args.requests)]
+
+    def timed(req):
+        started = time.perf_counter()
+        try:
+            status = client.request(*req)
+        except Exception:
+            status = 0
+        return time.perf_counter() - started, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(timed, requests))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    errors = sum(1 for _, status in results if status == 0 or status >= 500)
+    return {
+        "requests": len(results),
+        "errors": errors,
+        "throughput": len(results) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Pirates API")
+    parser.add_argument('--backend', choices=['snapshot', 'neo4j', 'http'], default='snapshot')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--url', default='http://localhost:5000', help="server for --backend http")
+    parser.add_argument('--load', action='store_true', help="load the CSVs into Neo4j first (neo4j backend)")
+    parser.add_argument('--endpoints', help=f"comma separated subset of: {', '.join(ENDPOINTS)}")
+    parser.add_argument('--requests', type=int, default=200, help="measured requests per endpoint")
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    names = args.endpoints.split(',') if args.endpoints else list(ENDPOINTS)
+    unknown = [n for n in names if n not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)}")
+
+    params = Params(args.data_dir, args.seed)
+    started = time.perf_counter()
+    client = make_client(args)
+    print(f"Backend {args.backend} ready in {time.perf_counter() - started:.2f}s "
+          f"({len(params.characters)} characters, {len(params.movies)} movies)")
+
+    print(f"{'endpoint':<26}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    results = {}
+    for name in names:
+        result = bench_endpoint(client, ENDPOINTS[name], params, args)
+        results[name] = result
+        print(f"{name:<26}{result['throughput']:>10.1f}{result['p50_ms']:>10.2f}"
+              f"{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['errors']:>8}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"backend": args.backend, "data_dir": args.data_dir, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
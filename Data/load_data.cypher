@@ -1,3 +1,10 @@
+// Create indexes first so the MERGEs below can use them
+CREATE INDEX character_id IF NOT EXISTS FOR (c:Character) ON (c.id);
+CREATE INDEX movie_id IF NOT EXISTS FOR (m:Movie) ON (m.id);
+CREATE INDEX ship_id IF NOT EXISTS FOR (s:Ship) ON (s.id);
+CREATE INDEX location_id IF NOT EXISTS FOR (l:Location) ON (l.id);
+CREATE INDEX cast_id IF NOT EXISTS FOR (ca:Cast) ON (ca.id);
+
 // Load all nodes
 LOAD CSV WITH HEADERS FROM 'file:///nodes_movies.csv' AS row
 MERGE (m:Movie {id: row.id})
@@ -32,13 +39,6 @@ ON CREATE SET
   l.location_name = row.location_name,
   l.description   = row.description;
 
-// Create indexes
-CREATE INDEX character_id IF NOT EXISTS FOR (c:Character) ON (c.id);
-CREATE INDEX movie_id IF NOT EXISTS FOR (m:Movie) ON (m.id);
-CREATE INDEX ship_id IF NOT EXISTS FOR (s:Ship) ON (s.id);
-CREATE INDEX location_id IF NOT EXISTS FOR (l:Location) ON (l.id);
-CREATE INDEX cast_id IF NOT EXISTS FOR (ca:Cast) ON (ca.id);
-
 // Load relationships
 LOAD CSV WITH HEADERS FROM 'file:///relationships_cast.csv' AS row
 MATCH (c:Character {id: row.character_id})
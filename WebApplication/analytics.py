@@ -0,0 +1,161 @@
+"""Faction x faction x relationship type x movie cube, kept current as relationships change.
+
+Each relationship is counted in every cell it belongs to, including the rolled-up cells
+where a coordinate is ANY, so a slice is one dictionary lookup and a rollup is one lookup
+per group. A relationship counts once for each faction at its ends: (faction, other_faction)
+holds the relationships between two factions in either direction, and (faction, ANY) holds
+every relationship the faction takes part in. The type coordinate is a relationship type,
+a group such as "conflict" or "alliance", or ANY.
+"""
+import itertools
+import threading
+
+from snapshot import RELATIONSHIP_GROUPS
+
+ANY = '*'
+
+DIMENSIONS = ['faction', 'other_faction', 'type', 'movie_id']
+
+
+class Cell:
+    __slots__ = ('count', 'members')
+
+    def __init__(self):
+        self.count = 0
+        self.members = {}   # character id -> relationships of theirs in this cell
+
+
+class FactionCube:
+    """Relationship counts and the characters involved, for every slice of the four dimensions"""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self._lock = threading.Lock()
+        self.cells = {}
+        # dimension -> {coordinate: number of cells using it}, to enumerate groups in a rollup
+        self.coordinates = {dim: {} for dim in DIMENSIONS}
+        for key in graph.relationships:
+            self._apply(1, key)
+        # Characters and appearances only change on reload, so faction membership is fixed
+        self.factions = {None: graph.get_factions()}
+        for movie_id in graph.movies:
+            self.factions[movie_id] = graph.get_factions(movie_id)
+        graph.listeners.append(self.on_change)
+
+    def on_change(self, op, kind, key):
+        if kind != 'relationship':
+            return
+        with self._lock:
+            self._apply(1 if op == 'add' else -1, key)
+
+    def get_factions(self, movie_id=None):
+        return self.factions.get(movie_id or None, [])
+
+    def dimensions(self):
+        with self._lock:
+            values = {dim: sorted((c for c in coords if c != ANY), key=lambda c: (c is None, c or ''))
+                      for dim, coords in self.coordinates.items()}
+        values["groups"] = {name: list(types) for name, types in RELATIONSHIP_GROUPS.items()}
+        return values
+
+    def slice(self, faction=ANY, other_faction=ANY, rel_type=ANY, movie_id=ANY, members=False):
+        """One cell, e.g. conflicts between the Royal Navy and pirates in M3"""
+        with self._lock:
+            return self._row(self._coordinate(faction, other_faction, rel_type, movie_id), members)
+
+    def rollup(self, group_by, members=False, **fixed):
+        """One row per combination of the group_by dimensions that has any relationships"""
+        with self._lock:
+            rows = []
+            for coordinate in self._groups(group_by, fixed):
+                row = self._row(coordinate, members)
+                if row["count"]:
+                    rows.append(row)
+            return rows
+
+    def ratio(self, rel_type, group_by, **fixed):
+        """Share of relationships of one type or group, e.g. alliances per faction per movie"""
+        fixed = dict(fixed, rel_type=ANY)
+        with self._lock:
+            rows = []
+            for coordinate in self._groups(group_by, fixed):
+                total = self.cells.get(coordinate)
+                if total is None:
+                    continue
+                cell = self.cells.get(coordinate[:2] + (rel_type,) + coordinate[3:])
+                row = self._row(coordinate, False)
+                row["type"] = rel_type
+                row["count"] = cell.count if cell is not None else 0
+                row["total"] = total.count
+                row["ratio"] = round(row["count"] / total.count, 4)
+                rows.append(row)
+            return rows
+
+    def _groups(self, group_by, fixed):
+        for dim in group_by:
+            if dim not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension: {dim} (expected one of {', '.join(DIMENSIONS)})")
+        base = {"faction": fixed.get('faction', ANY), "other_faction": fixed.get('other_faction', ANY),
+                "type": fixed.get('rel_type', ANY), "movie_id": fixed.get('movie_id', ANY)}
+        choices = [[c for c in self.coordinates[dim] if c != ANY] for dim in group_by]
+        seen = {}
+        for values in itertools.product(*choices):
+            coords = dict(base)
+            coords.update(zip(group_by, values))
+            coordinate = self._coordinate(coords["faction"], coords["other_faction"], coords["type"], coords["movie_id"])
+            seen.setdefault(coordinate, True)
+        return list(seen)
+
+    def _coordinate(self, faction, other_faction, rel_type, movie_id):
+        # (ANY, X) is stored as (X, ANY): relationships with X at either end
+        if faction == ANY and other_faction != ANY:
+            faction, other_faction = other_faction, ANY
+        return (faction, other_faction, rel_type, movie_id)
+
+    def _row(self, coordinate, members):
+        cell = self.cells.get(coordinate)
+        row = dict(zip(DIMENSIONS, coordinate))
+        row["count"] = cell.count if cell is not None else 0
+        row["characters"] = len(cell.members) if cell is not None else 0
+        if members:
+            row["members"] = []
+            for character_id in (cell.members if cell is not None else ()):
+                character = self.graph.characters.get(character_id, {})
+                row["members"].append({"id": character_id, "name": character.get('name'),
+                                       "faction": character.get('faction')})
+        return row
+
+    def _cells_for(self, key):
+        source, target, rel_type, movie_id = key
+        faction = self.graph.characters.get(source, {}).get('faction')
+        other = self.graph.characters.get(target, {}).get('faction')
+        pairs = [(faction, other), (faction, ANY), (ANY, ANY)]
+        if faction != other:
+            pairs += [(other, faction), (other, ANY)]
+        types = [rel_type, ANY] + [name for name, group in RELATIONSHIP_GROUPS.items() if rel_type in group]
+        for (f, o), t, m in itertools.product(pairs, types, (movie_id, ANY)):
+            yield (f, o, t, m)
+
+    def _apply(self, delta, key):
+        source, target = key[0], key[1]
+        for coordinate in self._cells_for(key):
+            cell = self.cells.get(coordinate)
+            if cell is None:
+                if delta < 0:
+                    continue
+                cell = self.cells[coordinate] = Cell()
+                for dim, value in zip(DIMENSIONS, coordinate):
+                    self.coordinates[dim][value] = self.coordinates[dim].get(value, 0) + 1
+            cell.count += delta
+            for character_id in dict.fromkeys((source, target)):
+                count = cell.members.get(character_id, 0) + delta
+                if count > 0:
+                    cell.members[character_id] = count
+                else:
+                    cell.members.pop(character_id, None)
+            if cell.count <= 0:
+                del self.cells[coordinate]
+                for dim, value in zip(DIMENSIONS, coordinate):
+                    self.coordinates[dim][value] -= 1
+                    if not self.coordinates[dim][value]:
+                        del self.coordinates[dim][value]
@@ -7,6 +7,13 @@ let allNodesData = [];
 let allEdgesData = [];
 let currentQuery = 'full';
 let allCharacters = [];
+// Movie whose character graph is on screen, so switching movies can apply a diff instead
+let shownMovie = null;
+let movieSwitch = Promise.resolve();
+// Last change seen, and how often / how long to poll when the server has no stream to spare
+let lastEventId = null;
+const EVENT_POLL_INTERVAL = 10000;
+const EVENT_POLL_DURATION = 300000;
 
 const nodeColors = {
     Character: { background: '#7c5700', border: '#efd793' },
@@ -20,6 +27,7 @@ document.addEventListener('DOMContentLoaded', () => {
     setupEventListeners();
     initGraph();
     loadFullGraph();
+    listenForChanges();
     setTimeout(loadWisdom, 2000);
 });
 
@@ -101,6 +109,12 @@ function initGraph() {
         }
     });
 
+    network.on('doubleClick', (params) => {
+        if (params.nodes.length > 0) {
+            expandNode(params.nodes[0]);
+        }
+    });
+
     network.on('hoverNode', () => {
         document.getElementById('graph').style.cursor = 'pointer';
     });
@@ -110,9 +124,150 @@ function initGraph() {
     });
 }
 
+async function fetchLayout(view, movieId = null) {
+    try {
+        const url = movieId ? `${API_BASE}/layout/${view}?movie_id=${movieId}` : `${API_BASE}/layout/${view}`;
+        const response = await fetch(url);
+        if (!response.ok) return null;
+        const data = await response.json();
+        return data.positions || null;
+    } catch (error) {
+        return null;
+    }
+}
+
+async function fetchBatch(requests) {
+    const response = await fetch(`${API_BASE}/batch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ requests })
+    });
+    const data = await response.json();
+    if (data.error) throw new Error(data.error);
+    return data.results;
+}
+
+// Drill down: add a node's neighbourhood to whatever is on screen
+async function expandNode(nodeId) {
+    try {
+        const response = await fetch(`${API_BASE}/ego?seeds=${encodeURIComponent(nodeId)}&depth=1`);
+        const data = await response.json();
+        if (data.error) {
+            console.error('API Error:', data.error);
+            return;
+        }
+        const nodes = data.nodes
+            .filter(n => !nodesDataSet.get(n.id))
+            .map(n => ({
+                id: n.id,
+                label: n.label,
+                group: n.group,
+                color: nodeColors[n.group] || nodeColors.Character,
+                title: n.hidden ? `${n.title} (+${n.hidden} more)` : n.title,
+                nodeData: n.props
+            }));
+        const shown = new Set(edgesDataSet.get().map(e => `${e.from}->${e.to}:${e.label}`));
+        const edges = data.edges.filter(e => !edgesDataSet.get(e.id) && !shown.has(`${e.from}->${e.to}:${e.label}`));
+        nodesDataSet.add(nodes);
+        edgesDataSet.add(edges.map(e => ({ id: e.id, from: e.from, to: e.to, label: e.label, title: e.title })));
+    } catch (error) {
+        console.error('Failed to expand node:', error);
+    }
+}
+
+function placeNodes(nodes, positions) {
+    // Use the server's coordinates when every node has one, otherwise let physics lay it out
+    const placed = !!positions && nodes.length > 0 && nodes.every(n => positions[n.id]);
+    if (placed) {
+        nodes.forEach(n => {
+            n.x = positions[n.id].x;
+            n.y = positions[n.id].y;
+        });
+    }
+    network.setOptions({ physics: { enabled: !placed } });
+    return nodes;
+}
+
+function listenForChanges() {
+    // The server pushes data changes and counters, so nothing has to be refetched
+    if (!window.EventSource) {
+        pollForChanges();
+        return;
+    }
+    const events = new EventSource(`${API_BASE}/events`);
+    ['relationship', 'reload', 'reset', 'counter'].forEach(type => {
+        events.addEventListener(type, (e) => {
+            lastEventId = e.lastEventId || lastEventId;
+            handleChange(type, JSON.parse(e.data));
+        });
+    });
+    events.onerror = () => {
+        // Closed means the server refused the stream (all its slots are taken): poll instead
+        if (events.readyState === EventSource.CLOSED) pollForChanges();
+    };
+}
+
+async function pollForChanges() {
+    const started = Date.now();
+    while (Date.now() - started < EVENT_POLL_DURATION) {
+        try {
+            const query = lastEventId ? `&last_event_id=${lastEventId}` : '';
+            const response = await fetch(`${API_BASE}/events?poll=1${query}`);
+            const data = await response.json();
+            if (lastEventId && data.reset) handleChange('reset', {});
+            if (lastEventId) data.events.forEach(e => handleChange(e.type, e.data));
+            lastEventId = String(data.last_event_id);
+        } catch (error) {
+            console.error('Failed to poll for changes:', error);
+        }
+        await new Promise(resolve => setTimeout(resolve, EVENT_POLL_INTERVAL));
+    }
+    // Try for a stream again; a slot may have come free
+    listenForChanges();
+}
+
+function handleChange(type, data) {
+    if (type === 'relationship') applyRelationshipChange(data);
+    else if (type === 'reload' || type === 'reset') executeQuery(currentQuery);
+    else if (type === 'counter' && data.name === 'rum_gone') showRumCount(data.value);
+}
+
+function applyRelationshipChange(change) {
+    if (shownMovie) {
+        if (change.movie_id === shownMovie) {
+            movieSwitch = movieSwitch.then(() => showMovie(shownMovie));
+        }
+        return;
+    }
+    if (currentQuery === 'rivalries') {
+        loadRivalries(document.getElementById('movieFilter').value || null);
+        return;
+    }
+    if (currentQuery !== 'full' && currentQuery !== 'characters') return;
+
+    if (change.op === 'add') {
+        change.nodes.forEach(n => {
+            if (!nodesDataSet.get(n.id)) nodesDataSet.add(timelineNode(n));
+        });
+        edgesDataSet.update({
+            id: `live_${change.source_id}_${change.target_id}_${change.type}_${change.movie_id}`,
+            from: change.source_id,
+            to: change.target_id,
+            label: change.type,
+            title: `Movie: ${change.movie_id}`
+        });
+    } else {
+        const match = edgesDataSet.get({
+            filter: e => e.from === change.source_id && e.to === change.target_id && e.label === change.type
+        });
+        if (match.length > 0) edgesDataSet.remove(match[0].id);
+    }
+}
+
 async function executeQuery(queryType) {
     document.getElementById('table-view').classList.add('hidden');
     const movieId = document.getElementById('movieFilter').value;
+    shownMovie = null;
 
     switch (queryType) {
         case 'full':
@@ -154,6 +309,11 @@ async function loadFullGraph() {
             title: `${n.type}: ${n.label}`,
             nodeData: n.props
         }));
+        const positions = {};
+        data.nodes.forEach(n => {
+            if (n.x !== undefined) positions[n.id] = { x: n.x, y: n.y };
+        });
+        placeNodes(nodes, positions);
 
         const edges = data.edges.map((e, i) => ({
             id: `e${i}`,
@@ -175,12 +335,13 @@ async function loadFullGraph() {
 
 async function loadCharacters() {
     try {
-        const [charResponse, relResponse] = await Promise.all([
-            fetch(`${API_BASE}/characters`),
-            fetch(`${API_BASE}/characters/relationships`)
+        // One round trip for the characters, their relationships and the layout
+        const { characters: view, layout } = await fetchBatch([
+            { name: 'characters', view: 'characters' },
+            { name: 'layout', path: '/api/layout/characters' }
         ]);
-        const characters = await charResponse.json();
-        const relationships = await relResponse.json();
+        const { characters, relationships } = view.body;
+        const positions = layout.status === 200 ? layout.body.positions : null;
 
         const nodes = characters.map(c => ({
             id: c.id,
@@ -201,7 +362,7 @@ async function loadCharacters() {
 
         nodesDataSet.clear();
         edgesDataSet.clear();
-        nodesDataSet.add(nodes);
+        nodesDataSet.add(placeNodes(nodes, positions));
         edgesDataSet.add(edges);
 
         showTable('Characters', characters, ['name', 'role', 'faction', 'status']);
@@ -214,7 +375,7 @@ async function loadCharacters() {
 async function loadShipRoutes(movieId = null) {
     try {
         const url = movieId ? `${API_BASE}/ships/routes?movie_id=${movieId}` : `${API_BASE}/ships/routes`;
-        const response = await fetch(url);
+        const [response, positions] = await Promise.all([fetch(url), fetchLayout('ships', movieId)]);
         const routes = await response.json();
 
         const nodesMap = new Map();
@@ -250,7 +411,7 @@ async function loadShipRoutes(movieId = null) {
 
         nodesDataSet.clear();
         edgesDataSet.clear();
-        nodesDataSet.add(Array.from(nodesMap.values()));
+        nodesDataSet.add(placeNodes(Array.from(nodesMap.values()), positions));
         edgesDataSet.add(edges);
 
         showTable('Ship Routes', routes, ['ship_name', 'location_name', 'route_type', 'movie_id']);
@@ -263,7 +424,7 @@ async function loadShipRoutes(movieId = null) {
 async function loadRivalries(movieId = null) {
     try {
         const url = movieId ? `${API_BASE}/rivalries?movie_id=${movieId}` : `${API_BASE}/rivalries`;
-        const response = await fetch(url);
+        const [response, positions] = await Promise.all([fetch(url), fetchLayout('rivalries', movieId)]);
         const rivalries = await response.json();
 
         const nodesMap = new Map();
@@ -307,7 +468,7 @@ async function loadRivalries(movieId = null) {
 
         nodesDataSet.clear();
         edgesDataSet.clear();
-        nodesDataSet.add(Array.from(nodesMap.values()));
+        nodesDataSet.add(placeNodes(Array.from(nodesMap.values()), positions));
         edgesDataSet.add(edges);
 
         showTable('Rivalries & Conflicts', rivalries, ['character1', 'character2', 'conflict_type', 'movie']);
@@ -320,7 +481,7 @@ async function loadRivalries(movieId = null) {
 async function loadFactions(movieId = null) {
     try {
         const url = movieId ? `${API_BASE}/factions?movie_id=${movieId}` : `${API_BASE}/factions`;
-        const response = await fetch(url);
+        const [response, positions] = await Promise.all([fetch(url), fetchLayout('factions', movieId)]);
         const factions = await response.json();
 
         const nodes = [];
@@ -357,7 +518,7 @@ async function loadFactions(movieId = null) {
 
         nodesDataSet.clear();
         edgesDataSet.clear();
-        nodesDataSet.add(nodes);
+        nodesDataSet.add(placeNodes(nodes, positions));
         edgesDataSet.add(edges);
 
         const tableData = factions.map(f => ({
@@ -375,52 +536,75 @@ async function loadFactions(movieId = null) {
 
 function filterByMovie(movieId) {
     if (!movieId) {
+        shownMovie = null;
         loadFullGraph();
         return;
     }
 
-    fetch(`${API_BASE}/relationships/${movieId}`)
-        .then(res => res.json())
-        .then(relationships => {
-            const nodesMap = new Map();
-            const edges = [];
-
-            relationships.forEach((r, i) => {
-                if (!nodesMap.has(r.source_id)) {
-                    nodesMap.set(r.source_id, {
-                        id: r.source_id,
-                        label: r.source,
-                        group: 'Character',
-                        color: nodeColors.Character,
-                        title: r.source_faction
-                    });
-                }
-                if (!nodesMap.has(r.target_id)) {
-                    nodesMap.set(r.target_id, {
-                        id: r.target_id,
-                        label: r.target,
-                        group: 'Character',
-                        color: nodeColors.Character,
-                        title: r.target_faction
-                    });
-                }
-                edges.push({
-                    id: `rel${i}`,
-                    from: r.source_id,
-                    to: r.target_id,
-                    label: r.relationship_type
-                });
-            });
+    // Queue switches so a fast scrub through the movies applies its diffs in order
+    movieSwitch = movieSwitch.then(() => {
+        if (shownMovie && shownMovie !== movieId) {
+            return applyMovieDiff(shownMovie, movieId);
+        }
+        return showMovie(movieId);
+    });
+}
 
+function showMovie(movieId) {
+    return Promise.all([
+        fetch(`${API_BASE}/timeline/${movieId}`).then(res => res.json()),
+        fetchLayout('movie', movieId)
+    ])
+        .then(([state, positions]) => {
             nodesDataSet.clear();
             edgesDataSet.clear();
-            nodesDataSet.add(Array.from(nodesMap.values()));
-            edgesDataSet.add(edges);
+            nodesDataSet.add(placeNodes(state.nodes.map(timelineNode), positions));
+            edgesDataSet.add(state.edges.map(timelineEdge));
+            shownMovie = movieId;
             network.fit();
         })
         .catch(err => console.error('Filter error:', err));
 }
 
+function applyMovieDiff(fromMovie, toMovie) {
+    return Promise.all([
+        fetch(`${API_BASE}/timeline/diff?from=${fromMovie}&to=${toMovie}`).then(res => res.json()),
+        fetchLayout('movie', toMovie)
+    ])
+        .then(([diff, positions]) => {
+            edgesDataSet.remove(diff.edges.removed.map(e => timelineEdge(e).id));
+            nodesDataSet.remove(diff.nodes.removed);
+            nodesDataSet.add(diff.nodes.added.map(timelineNode));
+            edgesDataSet.update(diff.edges.added.concat(diff.edges.changed).map(timelineEdge));
+            // Everything still on screen moves to where the new movie's layout puts it
+            nodesDataSet.update(placeNodes(nodesDataSet.get(), positions));
+            shownMovie = toMovie;
+        })
+        .catch(err => {
+            console.error('Timeline diff error:', err);
+            return showMovie(toMovie);
+        });
+}
+
+function timelineNode(n) {
+    return {
+        id: n.id,
+        label: n.name,
+        group: 'Character',
+        color: nodeColors.Character,
+        title: n.faction
+    };
+}
+
+function timelineEdge(e) {
+    return {
+        id: `${e.source_id}->${e.target_id}`,
+        from: e.source_id,
+        to: e.target_id,
+        label: e.types.join(', ')
+    };
+}
+
 async function runSearch() {
     const query = document.getElementById('searchInput').value.trim();
     if (!query) return;
@@ -508,6 +692,31 @@ function showNodeDetails(nodeId) {
     }
 
     detailsDiv.innerHTML = html;
+    detailsDiv.dataset.nodeId = nodeId;
+
+    if (node.group === 'Character') {
+        showCharacterMovies(nodeId, detailsDiv);
+    }
+}
+
+async function showCharacterMovies(characterId, detailsDiv) {
+    try {
+        // Only the movies are shown, so skip the view that also queries every connection
+        const { movies: result } = await fetchBatch([
+            { name: 'movies', path: `/api/character/${encodeURIComponent(characterId)}/movies` }
+        ]);
+        const movies = (result.status === 200 && result.body) || [];
+        // Another node may have been clicked while this was loading
+        if (movies.length === 0 || detailsDiv.dataset.nodeId !== characterId) return;
+        detailsDiv.innerHTML += `
+            <div class="detail-row">
+                <div class="detail-label">Movies</div>
+                <div class="detail-value">${movies.map(m => m.title).join(', ')}</div>
+            </div>
+        `;
+    } catch (error) {
+        console.error('Failed to load character details:', error);
+    }
 }
 
 function showTable(title, data, columns) {
@@ -648,6 +857,15 @@ async function showLeaderboard() {
             ).join('')}</ol>
         </div>`;
 
+        if (data.most_central) {
+            html += `<div class="leaderboard-card">
+                <h3>Most Central</h3>
+                <ol>${data.most_central.map(c =>
+                    `<li><span>${c.name}</span><span class="stat-value">${(c.betweenness * 100).toFixed(1)}%</span></li>`
+                ).join('')}</ol>
+            </div>`;
+        }
+
         html += `<div class="leaderboard-card">
             <h3>Most Traveled Ships</h3>
             <ol>${data.most_traveled_ships.map(s =>
@@ -731,7 +949,6 @@ async function generatePirateName() {
 async function drinkRum() {
     openModal('rum-modal');
     const messageDiv = document.getElementById('rum-message');
-    const counterDiv = document.getElementById('rum-counter');
 
     const bottle = document.querySelector('.rum-bottle');
     bottle.style.animation = 'none';
@@ -742,13 +959,18 @@ async function drinkRum() {
         const data = await response.json();
 
         messageDiv.textContent = data.message;
-        counterDiv.textContent = `The rum has been gone ${data.times_gone} time${data.times_gone !== 1 ? 's' : ''} this session`;
+        showRumCount(data.times_gone);
     } catch (error) {
         messageDiv.textContent = "Why is the rum always gone?";
         console.error('Rum error:', error);
     }
 }
 
+function showRumCount(timesGone) {
+    document.getElementById('rum-counter').textContent =
+        `The rum has been gone ${timesGone} time${timesGone !== 1 ? 's' : ''}`;
+}
+
 async function loadWisdom() {
     try {
         const response = await fetch(`${API_BASE}/wisdom`);
@@ -0,0 +1,143 @@
+"""Neighbourhoods of one or more seed nodes, expanded hop by hop in memory.
+
+Relationships are read live from the graph, so a change is visible at once; routes,
+appearances and cast only change on reload and are indexed here by both ends. Each hop
+keeps at most max_degree new neighbours per node, strongest ties first, so a hub like
+Jack Sparrow adds a bounded number of nodes instead of half the graph.
+"""
+from collections import defaultdict
+
+from snapshot import NODE_LABELS, RELATIONSHIP_GROUPS, _display_name
+
+EDGE_KINDS = ['RELATIONSHIP', 'ROUTE', 'APPEARS_IN', 'PLAYED_BY']
+EGO_LABELS = NODE_LABELS + ['Cast']
+
+
+def expand_types(types):
+    """Relationship types with group names such as "conflict" replaced by their members"""
+    expanded = []
+    for rel_type in types:
+        for member in RELATIONSHIP_GROUPS.get(rel_type.lower(), [rel_type.upper()]):
+            if member not in expanded:
+                expanded.append(member)
+    return expanded
+
+
+class EgoIndex:
+    """Adjacency for every edge kind, built once per loaded graph"""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.labels = {}
+        for label in EGO_LABELS:
+            for node_id in graph.nodes_for_label(label):
+                self.labels.setdefault(node_id, label)
+        # node -> [(edge kind, source, target, detail, movie)] for the edges that never change live
+        self.fixed = defaultdict(list)
+        for ship, location, movie_id, route_type in graph.routes:
+            edge = ('ROUTE', ship, location, route_type, movie_id)
+            self.fixed[ship].append(edge)
+            self.fixed[location].append(edge)
+        for character, movie in graph.appearances:
+            edge = ('APPEARS_IN', character, movie, None, movie)
+            self.fixed[character].append(edge)
+            self.fixed[movie].append(edge)
+        for character, cast_id, movie_id in graph.played_by:
+            edge = ('PLAYED_BY', character, cast_id, None, movie_id)
+            self.fixed[character].append(edge)
+            self.fixed[cast_id].append(edge)
+
+    def edges(self, node, kinds=None, types=None, movie_id=None):
+        """Edges at a node that pass the filters, as (kind, source, target, detail, movie)"""
+        found = []
+        if kinds is None or 'RELATIONSHIP' in kinds:
+            for source, target, rel_type, movie in self.graph.relationships_by_character.get(node, ()):
+                if (types is None or rel_type in types) and (movie_id is None or movie == movie_id):
+                    found.append(('RELATIONSHIP', source, target, rel_type, movie))
+        for edge in self.fixed.get(node, ()):
+            if kinds is not None and edge[0] not in kinds:
+                continue
+            # Routes have a type like relationships; appearances and cast are untyped
+            if types is not None and edge[0] == 'ROUTE' and edge[3] not in types:
+                continue
+            if movie_id is None or edge[4] == movie_id:
+                found.append(edge)
+        return found
+
+    def expand(self, seeds, depth=1, kinds=None, types=None, movie_id=None, labels=None,
+               max_degree=None, max_nodes=None):
+        """Nodes within depth hops of the seeds and the edges between them, ready for vis-network.
+
+        max_degree is a list of per-hop caps (the last one repeats); labels limits which nodes
+        may join, and the seeds always do.
+        """
+        missing = [seed for seed in seeds if seed not in self.labels]
+        if missing:
+            raise KeyError(', '.join(missing))
+        hop = dict.fromkeys(seeds, 0)
+        hidden = {}
+        truncated = False
+        frontier = list(hop)
+        for level in range(1, depth + 1):
+            cap = max_degree[min(level, len(max_degree)) - 1] if max_degree else None
+            next_frontier = []
+            for node in frontier:
+                ties = defaultdict(int)
+                for edge in self.edges(node, kinds, types, movie_id):
+                    for other in (edge[1], edge[2]):
+                        if other == node or other in hop:
+                            continue
+                        if labels is None or self.labels.get(other) in labels:
+                            ties[other] += 1
+                candidates = sorted(ties, key=lambda other: (-ties[other], other))
+                if cap is not None and len(candidates) > cap:
+                    hidden[node] = len(candidates) - cap
+                    candidates = candidates[:cap]
+                for other in candidates:
+                    if max_nodes is not None and len(hop) >= max_nodes:
+                        truncated = True
+                        break
+                    hop[other] = level
+                    next_frontier.append(other)
+            frontier = next_frontier
+            if not frontier:
+                break
+
+        edges = {}
+        for node in hop:
+            for edge in self.edges(node, kinds, types, movie_id):
+                if edge[1] in hop and edge[2] in hop:
+                    edges.setdefault(edge, True)
+        return {
+            "seeds": list(seeds),
+            "depth": depth,
+            "nodes": [self._node(node, level, hidden.get(node, 0)) for node, level in hop.items()],
+            "edges": [self._edge(edge) for edge in edges],
+            "truncated": truncated or bool(hidden)
+        }
+
+    def _node(self, node_id, level, hidden):
+        label = self.labels[node_id]
+        props = self.graph.nodes_for_label(label)[node_id]
+        name = _display_name(props)
+        return {
+            "id": node_id,
+            "label": name,
+            "group": label,
+            "title": f"{label}: {name}",
+            "hop": level,
+            "hidden": hidden,
+            "props": dict(props)
+        }
+
+    def _edge(self, edge):
+        kind, source, target, detail, movie = edge
+        return {
+            "id": f"{kind}:{source}->{target}:{detail or ''}:{movie or ''}",
+            "from": source,
+            "to": target,
+            "type": kind,
+            "label": detail or kind,
+            "title": f"{kind} ({movie})" if movie else kind,
+            "movie_id": movie
+        }
@@ -0,0 +1,561 @@
+"""Binary columnar graph file: a string table, node columns and CSR adjacency, memory-mapped.
+
+    python graphfile.py export --out ../Data/graph.pgraph             # from the CSVs in ../Data
+    python graphfile.py export --source neo4j --out ../Data/graph.pgraph
+    python graphfile.py info ../Data/graph.pgraph
+    python graphfile.py to-csv ../Data/graph.pgraph --out exported/   # back to CSVs for ingest.py
+
+The file is an 8-byte magic, a u32 header length, a JSON header listing every section, and
+then the sections, each 8-byte aligned. Arrays are raw little-endian unsigned ints, so a
+reader maps the file and casts a memoryview over each section without copying anything;
+processes that map the same file share its pages. Every edge kind is stored once in load
+order (one column per field) plus CSR offsets into that list by source and by target.
+
+The server loads a file as a MappedSnapshot, which answers from those pages and decodes
+nodes and edges as they are read instead of copying the whole graph into dicts.
+"""
+import argparse
+import csv
+import heapq
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+
+from snapshot import NODE_LABELS, GraphSnapshot
+
+MAGIC = b'PIRGRPH1'
+FORMAT_VERSION = 1
+NULL = 0xFFFFFFFF
+
+LABELS = NODE_LABELS + ['Cast']
+
+# Edge kind -> (source label, target label, string columns besides the endpoints)
+EDGE_KINDS = {
+    "relationship": ('Character', 'Character', ['type', 'movie']),
+    "route": ('Ship', 'Location', ['movie_id', 'type']),
+    "appears_in": ('Character', 'Movie', []),
+    "played_by": ('Character', 'Cast', ['movie_id']),
+}
+
+# Property values that are not strings are stored as JSON text with this kind
+STRING, JSON = 0, 1
+
+
+def _edges(graph, kind):
+    return {
+        "relationship": graph.relationships,
+        "route": graph.routes,
+        "appears_in": graph.appearances,
+        "played_by": graph.played_by,
+    }[kind]
+
+
+def _csr(count, keys):
+    """Offsets (count + 1) and edge numbers grouped by key, keeping load order inside a group"""
+    offsets = array('I', [0]) * (count + 1)
+    for key in keys:
+        offsets[key + 1] += 1
+    for i in range(count):
+        offsets[i + 1] += offsets[i]
+    position = array('I', offsets[:-1])
+    edges = array('I', [0]) * len(keys)
+    for edge, key in enumerate(keys):
+        edges[position[key]] = edge
+        position[key] += 1
+    return offsets, edges
+
+
+def write_graph(graph, path):
+    """Write a GraphSnapshot to path; returns the section sizes"""
+    strings = {}
+
+    def intern(value):
+        if value is None:
+            return NULL
+        index = strings.get(value)
+        if index is None:
+            index = strings[value] = len(strings)
+        return index
+
+    sections = {}
+    node_index, node_ids, labels = {}, array('I'), {}
+    props_offsets, props_keys, props_values, props_kinds = array('I', [0]), array('I'), array('I'), array('B')
+    for label in LABELS:
+        start = len(node_ids)
+        for node_id, props in graph.nodes_for_label(label).items():
+            node_index[(label, node_id)] = len(node_ids)
+            node_ids.append(intern(node_id))
+            for key, value in props.items():
+                props_keys.append(intern(key))
+                if isinstance(value, str):
+                    props_values.append(intern(value))
+                    props_kinds.append(STRING)
+                else:
+                    props_values.append(intern(json.dumps(value)))
+                    props_kinds.append(JSON)
+            props_offsets.append(len(props_keys))
+        labels[label] = [start, len(node_ids)]
+    sections.update(node_ids=node_ids, props_offsets=props_offsets, props_keys=props_keys,
+                    props_values=props_values, props_kinds=props_kinds)
+
+    edge_counts = {}
+    for kind, (source_label, target_label, columns) in EDGE_KINDS.items():
+        keys = list(_edges(graph, kind))
+        sources = array('I', (node_index[(source_label, key[0])] for key in keys))
+        targets = array('I', (node_index[(target_label, key[1])] for key in keys))
+        sections[f"{kind}_source"] = sources
+        sections[f"{kind}_target"] = targets
+        for i, column in enumerate(columns):
+            sections[f"{kind}_{column}"] = array('I', (intern(key[2 + i]) for key in keys))
+        sections[f"{kind}_out_offsets"], sections[f"{kind}_out_edges"] = _csr(len(node_ids), sources)
+        sections[f"{kind}_in_offsets"], sections[f"{kind}_in_edges"] = _csr(len(node_ids), targets)
+        edge_counts[kind] = len(keys)
+
+    blob = bytearray()
+    string_offsets = array('Q', [0])
+    for value in strings:
+        blob += value.encode('utf-8')
+        string_offsets.append(len(blob))
+    sections["strings"] = bytes(blob)
+    sections["string_offsets"] = string_offsets
+
+    header = {"version": FORMAT_VERSION, "labels": labels, "edges": edge_counts,
+              "strings": len(strings), "sections": {}}
+    payloads = []
+    offset = 0
+    for name, data in sections.items():
+        if isinstance(data, array):
+            typecode = data.typecode
+            if sys.byteorder != 'little':
+                data = array(typecode, data)
+                data.byteswap()
+            data = data.tobytes()
+        else:
+            typecode = 'B'
+        header["sections"][name] = {"offset": offset, "length": len(data), "type": typecode}
+        padding = -len(data) % 8
+        payloads.append(data + b'\0' * padding)
+        offset += len(data) + padding
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    header_bytes += b' ' * (-(len(MAGIC) + 4 + len(header_bytes)) % 8)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<I', len(header_bytes)))
+        f.write(header_bytes)
+        for payload in payloads:
+            f.write(payload)
+    os.replace(tmp, path)
+    return {name: spec["length"] for name, spec in header["sections"].items()}
+
+
+class GraphFile:
+    """Read-only view of a graph file; arrays are memoryviews straight over the mapped pages"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a graph file")
+        header_length = struct.unpack_from('<I', self._map, len(MAGIC))[0]
+        start = len(MAGIC) + 4
+        self.header = json.loads(bytes(self._map[start:start + header_length]))
+        if self.header["version"] != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path} has format version {self.header['version']}, expected {FORMAT_VERSION}")
+        self.labels = {label: tuple(bounds) for label, bounds in self.header["labels"].items()}
+        self.node_count = max((end for _, end in self.labels.values()), default=0)
+
+        data = memoryview(self._map)[start + header_length:]
+        self.arrays = {}
+        for name, spec in self.header["sections"].items():
+            view = data[spec["offset"]:spec["offset"] + spec["length"]]
+            if spec["type"] != 'B':
+                view = view.cast(spec["type"])
+                if sys.byteorder != 'little':
+                    # Only big-endian machines pay for a copy
+                    swapped = array(spec["type"], view)
+                    swapped.byteswap()
+                    view = memoryview(swapped)
+            self.arrays[name] = view
+        self._edge_arrays = {
+            kind: (self.arrays[f"{kind}_source"], self.arrays[f"{kind}_target"],
+                   [self.arrays[f"{kind}_{column}"] for column in columns])
+            for kind, (_, _, columns) in EDGE_KINDS.items()
+        }
+        # Strings, edge keys and the node index are decoded on first use and shared after that
+        self._strings = [None] * self.header["strings"]
+        self._all_strings = False
+        self._edge_keys = {kind: [None] * count for kind, count in self.header["edges"].items()}
+        self._node_index = None
+
+    def close(self):
+        # Views over the map must be released before the map itself can close
+        self._edge_arrays = {}
+        for view in getattr(self, 'arrays', {}).values():
+            view.release()
+        self.arrays = {}
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def string(self, index):
+        if index == NULL:
+            return None
+        value = self._strings[index]
+        if value is None:
+            offsets = self.arrays["string_offsets"]
+            value = bytes(self.arrays["strings"][offsets[index]:offsets[index + 1]]).decode('utf-8')
+            self._strings[index] = value
+        return value
+
+    def all_strings(self):
+        """Decode the whole string table at once, for readers that touch most of it"""
+        if not self._all_strings:
+            blob = bytes(self.arrays["strings"])
+            offsets = self.arrays["string_offsets"]
+            self._strings = [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+            self._all_strings = True
+        return self._strings
+
+    def node_label(self, node):
+        for label, (start, end) in self.labels.items():
+            if start <= node < end:
+                return label
+        raise IndexError(node)
+
+    def node_id(self, node):
+        return self.string(self.arrays["node_ids"][node])
+
+    def node_index(self, label, node_id):
+        """Position of a node in the node columns, or None"""
+        if self._node_index is None:
+            # Published only once complete, so a concurrent first lookup at worst builds it twice
+            node_index = {}
+            for node_label, (start, end) in self.labels.items():
+                for node in range(start, end):
+                    node_index[(node_label, self.node_id(node))] = node
+            self._node_index = node_index
+        return self._node_index.get((label, node_id))
+
+    def properties(self, node):
+        offsets = self.arrays["props_offsets"]
+        keys, values, kinds = self.arrays["props_keys"], self.arrays["props_values"], self.arrays["props_kinds"]
+        props = {}
+        for i in range(offsets[node], offsets[node + 1]):
+            value = self.string(values[i])
+            props[self.string(keys[i])] = json.loads(value) if kinds[i] == JSON else value
+        return props
+
+    def edge_count(self, kind):
+        return self.header["edges"][kind]
+
+    def edge(self, kind, edge):
+        """One edge as (source id, target id, *columns)"""
+        keys = self._edge_keys[kind]
+        key = keys[edge]
+        if key is None:
+            ids, string = self.arrays["node_ids"], self.string
+            sources, targets, columns = self._edge_arrays[kind]
+            key = ((string(ids[sources[edge]]), string(ids[targets[edge]]))
+                   + tuple(string(values[edge]) for values in columns))
+            keys[edge] = key
+        return key
+
+    def edges(self, kind):
+        """Every edge of one kind as (source id, target id, *columns), in load order"""
+        for edge in range(self.edge_count(kind)):
+            yield self.edge(kind, edge)
+
+    def groups(self, kind, column):
+        """Edge numbers of one kind grouped by a column's value, groups in order of first use"""
+        groups = {}
+        for edge, value in enumerate(self.arrays[f"{kind}_{column}"]):
+            groups.setdefault(value, array('I')).append(edge)
+        return {self.string(value): edges for value, edges in groups.items()}
+
+    def neighbours(self, kind, node, direction='out'):
+        """Edge numbers of one node's outgoing or incoming edges, as a zero-copy slice"""
+        offsets = self.arrays[f"{kind}_{direction}_offsets"]
+        return self.arrays[f"{kind}_{direction}_edges"][offsets[node]:offsets[node + 1]]
+
+    def to_snapshot(self):
+        """Materialise a GraphSnapshot, in the same order the file was written from"""
+        self.all_strings()
+        graph = GraphSnapshot()
+        for label, (start, end) in self.labels.items():
+            for node in range(start, end):
+                graph.add_node(label, self.properties(node))
+        for source, target, rel_type, movie in self.edges("relationship"):
+            graph.add_relationship(source, target, rel_type, movie)
+        for ship, location, movie_id, route_type in self.edges("route"):
+            graph.add_route(ship, location, movie_id, route_type)
+        for character, cast_id, movie_id in self.edges("played_by"):
+            graph.add_played_by(character, cast_id, movie_id)
+        for character, movie in self.edges("appears_in"):
+            graph.add_appearance(character, movie)
+        return graph
+
+
+class MappedNodes(Mapping):
+    """One label's nodes as id -> properties, decoded from the file on first lookup"""
+
+    def __init__(self, graph_file, label):
+        self._file = graph_file
+        self._label = label
+        self._start, self._end = graph_file.labels.get(label, (0, 0))
+        # Node properties are read far more often than edges, and are a small part of the file
+        self._decoded = {}
+
+    def __getitem__(self, node_id):
+        props = self._decoded.get(node_id)
+        if props is None:
+            node = self._file.node_index(self._label, node_id)
+            if node is None:
+                raise KeyError(node_id)
+            props = self._decoded.setdefault(node_id, self._file.properties(node))
+        return props
+
+    def __contains__(self, node_id):
+        return self._file.node_index(self._label, node_id) is not None
+
+    def __iter__(self):
+        return (self._file.node_id(node) for node in range(self._start, self._end))
+
+    def __len__(self):
+        return self._end - self._start
+
+
+class MappedEdges(Mapping):
+    """Edges of one kind as the snapshot's key tuples -> True, or keyed by one end only.
+
+    numbers lists the edge numbers in load order; None means every edge of the kind.
+    """
+
+    def __init__(self, graph_file, kind, numbers=None, end=None):
+        self._file = graph_file
+        self._kind = kind
+        self._numbers = numbers
+        self._end = end
+        self._members = None
+
+    def _edge_numbers(self):
+        return range(self._file.edge_count(self._kind)) if self._numbers is None else self._numbers
+
+    def __iter__(self):
+        for edge in self._edge_numbers():
+            key = self._file.edge(self._kind, edge)
+            yield key if self._end is None else key[self._end]
+
+    def __len__(self):
+        return len(self._edge_numbers())
+
+    def __contains__(self, key):
+        if self._numbers is None and self._end is None:
+            # Only the source's own edges can match
+            node = self._file.node_index(EDGE_KINDS[self._kind][0], key[0])
+            if node is None:
+                return False
+            return any(self._file.edge(self._kind, edge) == key
+                       for edge in self._file.neighbours(self._kind, node))
+        if self._members is None:
+            self._members = frozenset(self)
+        return key in self._members
+
+    def __getitem__(self, key):
+        if key in self:
+            return True
+        raise KeyError(key)
+
+
+class MappedIndex(Mapping):
+    """Edges of one kind grouped by source, target, either end or a column, as key -> MappedEdges"""
+
+    def __init__(self, graph_file, kind, by, end=None):
+        self._file = graph_file
+        self._kind = kind
+        self._by = by
+        self._end = end
+        self._groups = graph_file.groups(kind, by) if by not in ('source', 'target', 'either') else None
+        self._keys = None
+        self._buckets = {}
+
+    def _numbers(self, node):
+        if self._by == 'source':
+            return self._file.neighbours(self._kind, node, 'out')
+        if self._by == 'target':
+            return self._file.neighbours(self._kind, node, 'in')
+        # Both directions, merged back into load order; a self-loop is listed once
+        merged = heapq.merge(self._file.neighbours(self._kind, node, 'out'),
+                             self._file.neighbours(self._kind, node, 'in'))
+        return array('I', dict.fromkeys(merged))
+
+    def _label(self):
+        source_label, target_label, _ = EDGE_KINDS[self._kind]
+        return target_label if self._by == 'target' else source_label
+
+    def __getitem__(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            return bucket
+        if self._groups is not None:
+            numbers = self._groups[key]
+        else:
+            node = self._file.node_index(self._label(), key)
+            numbers = self._numbers(node) if node is not None else ()
+            if not len(numbers):
+                raise KeyError(key)
+        return self._buckets.setdefault(key, MappedEdges(self._file, self._kind, numbers, self._end))
+
+    def __iter__(self):
+        if self._groups is not None:
+            return iter(self._groups)
+        if self._keys is None:
+            # Keys come in order of their first edge, as they would in a snapshot built edge by edge
+            start, end = self._file.labels.get(self._label(), (0, 0))
+            first = {}
+            for node in range(start, end):
+                numbers = self._numbers(node)
+                if len(numbers):
+                    first[self._file.node_id(node)] = numbers[0]
+            self._keys = sorted(first, key=first.get)
+        return iter(self._keys)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class MappedSnapshot(GraphSnapshot):
+    """A GraphSnapshot that answers from a graph file's mapped pages instead of its own dicts.
+
+    Loading only groups the relationship and route columns by type and movie. Strings, edge
+    keys, node properties and the node index are decoded the first time something reads them
+    and kept from then on, so a worker that has read everything holds about what a dict
+    snapshot holds, minus the dicts themselves. A live relationship change copies the buckets
+    it touches into dicts, as every change does (see GraphSnapshot._swap_relationship).
+    """
+
+    def __init__(self, graph_file):
+        super().__init__()
+        self.graph_file = graph_file
+        self.characters = MappedNodes(graph_file, 'Character')
+        self.ships = MappedNodes(graph_file, 'Ship')
+        self.locations = MappedNodes(graph_file, 'Location')
+        self.movies = MappedNodes(graph_file, 'Movie')
+        self.cast = MappedNodes(graph_file, 'Cast')
+
+        self.relationships = MappedEdges(graph_file, 'relationship')
+        self.routes = MappedEdges(graph_file, 'route')
+        self.appearances = MappedEdges(graph_file, 'appears_in')
+        self.played_by = MappedEdges(graph_file, 'played_by')
+
+        self.relationships_by_type = MappedIndex(graph_file, 'relationship', 'type')
+        self.relationships_by_movie = MappedIndex(graph_file, 'relationship', 'movie')
+        self.relationships_by_character = MappedIndex(graph_file, 'relationship', 'either')
+        self.routes_by_movie = MappedIndex(graph_file, 'route', 'movie_id')
+        self.routes_by_ship = MappedIndex(graph_file, 'route', 'source')
+        self.movies_by_character = MappedIndex(graph_file, 'appears_in', 'source', end=1)
+        self.characters_by_movie = MappedIndex(graph_file, 'appears_in', 'target', end=0)
+        self.cast_by_character = MappedIndex(graph_file, 'played_by', 'source')
+
+
+def load_snapshot(path):
+    """Open a graph file as a MappedSnapshot; the file stays mapped for as long as the snapshot lives"""
+    return MappedSnapshot(GraphFile(path))
+
+
+def write_csvs(graph_file, out):
+    """Write the CSVs Data/ uses, so ingest.py or load_data.cypher can load an exported graph"""
+    os.makedirs(out, exist_ok=True)
+    graph_file.all_strings()
+
+    def write(filename, header, rows):
+        with open(os.path.join(out, filename), 'w', newline='', encoding='utf-8') as f:
+            w = csv.writer(f)
+            w.writerow(header)
+            w.writerows(rows)
+
+    def nodes(label, columns, id_column='id'):
+        start, end = graph_file.labels[label]
+        for node in range(start, end):
+            props = graph_file.properties(node)
+            yield [props.get('id') if c == id_column else props.get(c) for c in columns]
+
+    write('nodes_movies.csv', ['id', 'title', 'release_year', 'budget_in_million'],
+          nodes('Movie', ['id', 'title', 'release_year', 'budget_in_million']))
+    write('nodes_characters.csv', ['id', 'name', 'role', 'faction', 'status'],
+          nodes('Character', ['id', 'name', 'role', 'faction', 'status']))
+    write('nodes_cast.csv', ['cast_id', 'actor_name'], nodes('Cast', ['cast_id', 'actor_name'], 'cast_id'))
+    write('nodes_ships.csv', ['id', 'ship_name', 'type', 'captain'],
+          nodes('Ship', ['id', 'ship_name', 'type', 'captain']))
+    write('nodes_locations.csv', ['id', 'location_name', 'description'],
+          nodes('Location', ['id', 'location_name', 'description']))
+    write('relationships_cast.csv', ['character_id', 'cast_id', 'movie_id', 'type'],
+          ([c, a, m, 'PLAYED_BY'] for c, a, m in graph_file.edges("played_by")))
+    write('relationships_movies.csv', ['character_id', 'movie_id', 'type'],
+          ([c, m, 'APPEARS_IN'] for c, m in graph_file.edges("appears_in")))
+    write('relationships_characters.csv', ['relationship_id', 'movie_id', 'character_id_1', 'character_id_2', 'type'],
+          ([f"R{i + 1}", m, s, t, rt] for i, (s, t, rt, m) in enumerate(graph_file.edges("relationship"))))
+    write('relationships_ship_locations.csv', ['movie_id', 'ship_id', 'location_id', 'type'],
+          ([m, s, l, rt] for s, l, m, rt in graph_file.edges("route")))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export and inspect binary graph files")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help="write a graph file from the CSVs or from Neo4j")
+    export.add_argument('--source', choices=['csv', 'neo4j'], default='csv')
+    export.add_argument('--data-dir', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Data'))
+    export.add_argument('--out', required=True)
+    info = commands.add_parser('info', help="show what a graph file holds")
+    info.add_argument('path')
+    to_csv = commands.add_parser('to-csv', help="write a graph file back out as CSVs")
+    to_csv.add_argument('path')
+    to_csv.add_argument('--out', required=True)
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        if args.source == 'csv':
+            graph = GraphSnapshot.from_csv(args.data_dir)
+        else:
+            from dotenv import load_dotenv
+            from neo4j import GraphDatabase
+            load_dotenv()
+            driver = GraphDatabase.driver(os.getenv('NEO4J_URI', 'bolt://localhost:7687'),
+                                          auth=(os.getenv('NEO4J_USER', 'neo4j'),
+                                                os.getenv('NEO4J_PASSWORD', 'piratesproject')))
+            try:
+                graph = GraphSnapshot.from_neo4j(driver)
+            finally:
+                driver.close()
+        sizes = write_graph(graph, args.out)
+        print(f"Wrote {args.out}: {sum(sizes.values())} bytes, {graph.counts()}")
+    elif args.command == 'info':
+        with GraphFile(args.path) as graph_file:
+            print(json.dumps({
+                "nodes": {label: end - start for label, (start, end) in graph_file.labels.items()},
+                "edges": graph_file.header["edges"],
+                "strings": graph_file.header["strings"],
+                "bytes": os.path.getsize(args.path)
+            }, indent=2))
+    else:
+        with GraphFile(args.path) as graph_file:
+            write_csvs(graph_file, args.out)
+        print(f"Wrote CSVs to {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
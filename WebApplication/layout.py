@@ -0,0 +1,209 @@
+"""Server-side force-directed layout, so browsers can draw big graphs without running physics.
+
+Each view (full graph, characters, ship routes, rivalries, factions, one movie) gets its
+own Fruchterman-Reingold layout, computed once per data version on a background thread.
+Until it is ready the last layout keeps being served; the new one starts from the previous
+coordinates and only needs a short settle.
+"""
+import logging
+import math
+import random
+import threading
+from collections import defaultdict
+
+VIEWS = ['full', 'characters', 'ships', 'rivalries', 'factions', 'movie']
+
+SPACING = 120.0
+
+
+def view_graph(graph, view, movie_id=None):
+    """The node ids and edges the frontend draws for a view, as (nodes, edges)"""
+    if view == 'full' and not movie_id:
+        data = graph.get_full_graph()
+        return [n["id"] for n in data["nodes"]], [(e["from"], e["to"]) for e in data["edges"]]
+    if view in ('full', 'characters', 'movie'):
+        if movie_id:
+            rows = graph.get_movie_relationships(movie_id)
+            edges = [(r["source_id"], r["target_id"]) for r in rows]
+            return _endpoints(edges), edges
+        if view == 'movie':
+            raise ValueError("The movie view needs a movie_id")
+        edges = [(r["source_id"], r["target_id"]) for r in graph.get_character_relationships()]
+        return [c["id"] for c in graph.get_characters()], edges
+    if view == 'ships':
+        edges = [(r["ship_id"], r["location_id"]) for r in graph.get_ship_routes(movie_id)]
+        return _endpoints(edges), edges
+    if view == 'rivalries':
+        edges = [(r["char1_id"], r["char2_id"]) for r in graph.get_rivalries(movie_id)]
+        return _endpoints(edges), edges
+    if view == 'factions':
+        # Matches the faction_<i> hub ids app.js gives each faction
+        nodes, edges = [], []
+        for i, faction in enumerate(graph.get_factions(movie_id)):
+            hub = f"faction_{i}"
+            nodes.append(hub)
+            for member in faction["member_ids"]:
+                nodes.append(member)
+                edges.append((member, hub))
+        return nodes, edges
+    raise ValueError(f"Unknown view: {view} (expected one of {', '.join(VIEWS)})")
+
+
+def _endpoints(edges):
+    nodes = {}
+    for a, b in edges:
+        nodes[a] = True
+        nodes[b] = True
+    return list(nodes)
+
+
+def force_layout(nodes, edges, previous=None, iterations=None):
+    """Fruchterman-Reingold with grid-bucketed repulsion; returns {id: (x, y)}"""
+    n = len(nodes)
+    if not n:
+        return {}
+    previous = previous or {}
+    k = SPACING
+    extent = k * math.sqrt(n)
+
+    neighbours = defaultdict(set)
+    for a, b in edges:
+        if a != b:
+            neighbours[a].add(b)
+            neighbours[b].add(a)
+
+    pos = {}
+    for node in nodes:
+        if node in previous:
+            pos[node] = list(previous[node])
+    reused = len(pos)
+    for node in nodes:
+        if node in pos:
+            continue
+        # Start new nodes next to neighbours that already have a place
+        placed = [pos[o] for o in neighbours[node] if o in pos]
+        rng = random.Random(node)
+        if placed:
+            cx = sum(p[0] for p in placed) / len(placed)
+            cy = sum(p[1] for p in placed) / len(placed)
+            pos[node] = [cx + rng.uniform(-k, k) / 2, cy + rng.uniform(-k, k) / 2]
+        else:
+            angle, radius = rng.uniform(0, 2 * math.pi), extent / 2 * math.sqrt(rng.random())
+            pos[node] = [radius * math.cos(angle), radius * math.sin(angle)]
+
+    incremental = reused > 0 and reused >= n // 2
+    if iterations is None:
+        iterations = 200 if n <= 500 else 100 if n <= 5000 else 50
+        if incremental:
+            iterations = max(15, iterations // 4)
+    temperature = (k if incremental else extent / 10)
+    cooling = temperature / (iterations + 1)
+
+    edge_list = [(a, b) for a, b in edges if a != b and a in pos and b in pos]
+    cell = 2 * k
+    for _ in range(iterations):
+        disp = {node: [0.0, 0.0] for node in pos}
+
+        grid = defaultdict(list)
+        for node, (x, y) in pos.items():
+            grid[(int(x // cell), int(y // cell))].append(node)
+        for (gx, gy), members in grid.items():
+            nearby = [o for dx in (-1, 0, 1) for dy in (-1, 0, 1) for o in grid.get((gx + dx, gy + dy), ())]
+            for v in members:
+                vx, vy = pos[v]
+                d = disp[v]
+                for u in nearby:
+                    if u == v:
+                        continue
+                    dx, dy = vx - pos[u][0], vy - pos[u][1]
+                    dist2 = dx * dx + dy * dy
+                    if dist2 < 0.01:
+                        dx, dy, dist2 = 0.1, 0.0, 0.01
+                    force = k * k / dist2
+                    d[0] += dx * force
+                    d[1] += dy * force
+
+        for a, b in edge_list:
+            dx, dy = pos[a][0] - pos[b][0], pos[a][1] - pos[b][1]
+            dist = math.sqrt(dx * dx + dy * dy) or 0.1
+            force = dist / k
+            disp[a][0] -= dx * force
+            disp[a][1] -= dy * force
+            disp[b][0] += dx * force
+            disp[b][1] += dy * force
+
+        for node, (dx, dy) in disp.items():
+            # Light gravity keeps disconnected pieces from drifting away
+            dx -= pos[node][0] * 0.01
+            dy -= pos[node][1] * 0.01
+            length = math.sqrt(dx * dx + dy * dy)
+            if length > 0:
+                step = min(length, temperature)
+                pos[node][0] += dx / length * step
+                pos[node][1] += dy / length * step
+        temperature -= cooling
+
+    return {node: (x, y) for node, (x, y) in pos.items()}
+
+
+class LayoutEngine:
+    """Caches one layout per view and movie, and lays out new data versions in the background"""
+
+    def __init__(self):
+        self._layouts = {}     # (view, movie_id) -> (version, positions)
+        self._wanted = {}      # (view, movie_id) -> (version, graph) for the background thread
+        self._key_locks = {}
+        self._working = False
+        self._lock = threading.Lock()
+
+    def positions(self, view, movie_id, version, graph):
+        """The view's positions for this version, or else the last ones (None before the first).
+
+        A missing or stale layout is queued for the background thread instead of computed here.
+        """
+        key = (view, movie_id or None)
+        entry = self._layouts.get(key)
+        if entry is not None and entry[0] >= version:
+            return entry[1]
+        with self._lock:
+            self._wanted[key] = (version, graph)
+            if not self._working:
+                self._working = True
+                threading.Thread(target=self._work, name='layout', daemon=True).start()
+        return entry[1] if entry is not None else None
+
+    def version(self, view, movie_id=None):
+        """Data version of the positions positions() currently returns"""
+        entry = self._layouts.get((view, movie_id or None))
+        return entry[0] if entry is not None else None
+
+    def stats(self):
+        return {key: entry[0] for key, entry in list(self._layouts.items())}
+
+    def _work(self):
+        while True:
+            with self._lock:
+                if not self._wanted:
+                    self._working = False
+                    return
+                key, (version, graph) = self._wanted.popitem()
+            try:
+                self._compute(key, version, graph)
+            except Exception:
+                logging.getLogger(__name__).exception("Layout of %s failed", key)
+
+    def _compute(self, key, version, graph):
+        # One lock per view, so a slow layout never holds up the others
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            entry = self._layouts.get(key)
+            if entry is not None and entry[0] >= version:
+                return entry[1]
+            nodes, edges = view_graph(graph, *key)
+            previous = entry[1] if entry is not None else None
+            seed = {node: (p["x"], p["y"]) for node, p in previous.items()} if previous else None
+            layout = force_layout(nodes, edges, seed)
+            positions = {node: {"x": round(x, 1), "y": round(y, 1)} for node, (x, y) in layout.items()}
+            self._layouts[key] = (version, positions)
+            return positions
@@ -0,0 +1,290 @@
+"""Request and query instrumentation, exposed in the Prometheus text format on /metrics.
+
+Counters, gauges and histograms are kept in process; no client library is needed.
+Cypher goes through InstrumentedSession, which times every query, records the server's
+result_available_after/result_consumed_after, and can re-run slow read queries under
+PROFILE to log their plan.
+"""
+import hashlib
+import logging
+import queue
+import threading
+import time
+
+from neo4j import READ_ACCESS
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+slow_query_log = logging.getLogger('pirates.slow_queries')
+
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labels, labels)} {value}")
+        return lines
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labels=(), callback=None):
+        super().__init__(name, help_text, labels)
+        self.callback = callback
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def render(self):
+        if self.callback is not None:
+            self.set(self.callback())
+        lines = self.header()
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labels, labels)} {value}")
+        return lines
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._values.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    bucket_labels = _label_text(self.labels + ('le',), labels + (bound,))
+                    lines.append(f"{self.name}_bucket{bucket_labels} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_label_text(self.labels + ('le',), labels + ('+Inf',))} {count}")
+                lines.append(f"{self.name}_sum{_label_text(self.labels, labels)} {total}")
+                lines.append(f"{self.name}_count{_label_text(self.labels, labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_requests = registry.add(Counter(
+    'http_requests_total', 'HTTP requests by route, method and status', ('route', 'method', 'status')))
+http_errors = registry.add(Counter(
+    'http_request_errors_total', 'HTTP requests that ended in a 5xx', ('route',)))
+http_latency = registry.add(Histogram(
+    'http_request_duration_seconds', 'Time spent handling a request', ('route',)))
+query_latency = registry.add(Histogram(
+    'neo4j_query_duration_seconds', 'Client-side time to run a query and fetch all records', ('query',)))
+query_available = registry.add(Histogram(
+    'neo4j_result_available_after_seconds', 'Server time until the first record was available', ('query',)))
+query_consumed = registry.add(Histogram(
+    'neo4j_result_consumed_after_seconds', 'Server time to stream the remaining records', ('query',)))
+query_errors = registry.add(Counter(
+    'neo4j_query_errors_total', 'Queries that raised an error', ('query',)))
+query_db_hits = registry.add(Counter(
+    'neo4j_query_db_hits_total', 'Database hits of slow queries that were profiled', ('query',)))
+slow_queries = registry.add(Counter(
+    'neo4j_slow_queries_total', 'Queries slower than SLOW_QUERY_MS', ('query',)))
+sessions_in_use = registry.add(Gauge(
+    'neo4j_sessions_in_use', 'Neo4j sessions currently open by the server'))
+profiles_dropped = registry.add(Counter(
+    'neo4j_profiles_dropped_total', 'Slow queries not profiled because the profile queue was full'))
+
+
+def query_name(endpoint, cypher):
+    """Low-cardinality label for a query: the endpoint plus a fingerprint of the Cypher"""
+    fingerprint = hashlib.sha1(' '.join(cypher.split()).encode('utf-8')).hexdigest()[:8]
+    return f"{endpoint}:{fingerprint}"
+
+
+class QueryResult:
+    """Fully fetched records plus their summary, usable like a neo4j Result"""
+
+    def __init__(self, records, summary):
+        self.records = records
+        self.summary = summary
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def single(self):
+        return self.records[0] if self.records else None
+
+    def consume(self):
+        return self.summary
+
+
+class InstrumentedSession:
+    """Wraps a neo4j session so every run() is timed and slow queries get profiled.
+
+    Pass an already open session to borrow it; it is then left open on exit.
+    """
+
+    def __init__(self, driver, endpoint, slow_query_ms=0, profile_pool=None, session=None):
+        self.driver = driver
+        self.endpoint = endpoint
+        self.slow_query_ms = slow_query_ms
+        self.profile_pool = profile_pool
+        self.session = session
+        self.owned = session is None
+
+    def __enter__(self):
+        if self.owned:
+            self.session = self.driver.session()
+            sessions_in_use.inc()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.owned:
+            sessions_in_use.dec()
+            self.session.close()
+
+    def run(self, cypher, **params):
+        name = query_name(self.endpoint, cypher)
+        started = time.perf_counter()
+        try:
+            result = self.session.run(cypher, **params)
+            records = list(result)
+            summary = result.consume()
+        except Exception:
+            query_errors.inc(name)
+            raise
+        elapsed = time.perf_counter() - started
+
+        query_latency.observe(elapsed, name)
+        if summary.result_available_after is not None:
+            query_available.observe(summary.result_available_after / 1000.0, name)
+        if summary.result_consumed_after is not None:
+            query_consumed.observe(summary.result_consumed_after / 1000.0, name)
+        if self.slow_query_ms and elapsed * 1000 >= self.slow_query_ms:
+            slow_queries.inc(name)
+            if summary.query_type != 'r':
+                # Re-running a write would repeat it, possibly after later changes
+                slow_query_log.warning("%s took %.1f ms (not profiled, query type %s)\n%s",
+                                       name, elapsed * 1000, summary.query_type, cypher.strip())
+            elif self.profile_pool is not None:
+                # Profile off the request thread so the slow request does not get slower still
+                self.profile_pool.submit(profile_query, self.driver, name, cypher, params, elapsed)
+        return QueryResult(records, summary)
+
+
+class ProfilePool:
+    """One background thread working through a bounded queue; work that does not fit is dropped"""
+
+    def __init__(self, max_pending=32):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, function, *args):
+        try:
+            self._queue.put_nowait((function, args))
+        except queue.Full:
+            profiles_dropped.inc()
+            return False
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name='profile', daemon=True)
+                self._thread.start()
+        return True
+
+    def _work(self):
+        while True:
+            function, args = self._queue.get()
+            try:
+                function(*args)
+            except Exception:
+                slow_query_log.exception("Profiling a slow query failed")
+
+
+def profile_query(driver, name, cypher, params, elapsed):
+    """Re-run a slow read query under PROFILE and log its plan"""
+    try:
+        # A read session, so the database refuses the query if it writes after all
+        with driver.session(default_access_mode=READ_ACCESS) as session:
+            profile = session.run("PROFILE " + cypher, **params).consume().profile or {}
+    except Exception as e:
+        slow_query_log.warning("%s took %.1f ms, PROFILE failed: %s", name, elapsed * 1000, e)
+        return
+    db_hits = _total_db_hits(profile)
+    query_db_hits.inc(name, amount=db_hits)
+    slow_query_log.warning("%s took %.1f ms, %d db hits\n%s\n%s", name, elapsed * 1000, db_hits,
+                           cypher.strip(), '\n'.join(_plan_lines(profile)))
+
+
+def _total_db_hits(plan):
+    return (plan.get('dbHits') or 0) + sum(_total_db_hits(child) for child in plan.get('children', []))
+
+
+def _plan_lines(plan, depth=0):
+    lines = [f"{'  ' * depth}{plan.get('operatorType', '?')} rows={plan.get('rows', '?')} "
+             f"dbHits={plan.get('dbHits', '?')}"]
+    for child in plan.get('children', []):
+        lines.extend(_plan_lines(child, depth + 1))
+    return lines
@@ -0,0 +1,290 @@
+"""Six Degrees path finding over an in-process index of the RELATIONSHIP edges.
+
+Relationships are treated as undirected, like the `-[:RELATIONSHIP*]-` pattern the
+Cypher version used. Unfiltered queries are answered from a precomputed all-pairs
+distance table when the graph is small enough, everything else runs a bidirectional BFS.
+
+Live relationship changes update the adjacency at once. Components and the distance
+table are then recomputed on a background thread, and queries use the BFS until they are.
+"""
+import heapq
+import threading
+from array import array
+
+UNREACHABLE = 255
+# Distances are stored in one byte, so anything further apart counts as unreachable
+MAX_TABLE_DISTANCE = UNREACHABLE - 1
+
+
+class PathIndex:
+    """Adjacency index of the character graph plus its connected components and distance table"""
+
+    def __init__(self, graph, table_limit=3000):
+        self.graph = graph
+        self.table_limit = table_limit
+        # Inner dicts and key lists are replaced on a change, never mutated, so readers need no lock
+        self.adjacency = {c: {} for c in graph.characters}
+        for key in graph.relationships:
+            source, target = key[0], key[1]
+            if source == target:
+                continue
+            self.adjacency[source].setdefault(target, []).append(key)
+            self.adjacency[target].setdefault(source, []).append(key)
+        # None while a change is being folded in; queries then skip the shortcuts
+        self.component, self.ordinal, self.table = self._summaries(self.adjacency)
+        self._lock = threading.Lock()
+        self._pending = False
+        self._refreshing = False
+        graph.listeners.append(self.on_change)
+
+    def on_change(self, op, kind, key):
+        if kind != 'relationship' or key[0] == key[1]:
+            return
+        with self._lock:
+            self.component = self.table = None
+            for node, other in ((key[0], key[1]), (key[1], key[0])):
+                neighbours = dict(self.adjacency[node])
+                keys = [k for k in neighbours.get(other, ()) if k != key]
+                if op == 'add':
+                    keys.append(key)
+                if keys:
+                    neighbours[other] = keys
+                else:
+                    neighbours.pop(other, None)
+                self.adjacency[node] = neighbours
+            self._pending = True
+            if not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh_loop, name='paths-refresh', daemon=True).start()
+
+    # Public API
+
+    def find_paths(self, source, target, types=None, movie_id=None, max_depth=None, mode='shortest', k=3):
+        """Return a list of paths (lists of character ids), shortest first"""
+        if source not in self.adjacency or target not in self.adjacency:
+            return []
+        if source == target:
+            return [[source]]
+        max_depth = max_depth if max_depth is not None else len(self.adjacency)
+        rel_ok = self._rel_filter(types, movie_id)
+
+        component, table = self.component, self.table
+        if rel_ok is None and component is not None:
+            # Cheap miss detection: different components can never be connected
+            if component[source] != component[target]:
+                return []
+            distance = self.distance(source, target)
+            if distance is not None and distance > max_depth:
+                return []
+
+        if mode == 'k':
+            return self._k_shortest(source, target, rel_ok, max_depth, k)
+        limit = k if mode == 'all' else 1
+        if rel_ok is None and table is not None:
+            return list(_take(self._walk_table(table, source, target), limit))
+        found = self._bidirectional(source, target, rel_ok, max_depth)
+        if found is None:
+            return []
+        return list(_take(_join_paths(*found), limit))
+
+    def distance(self, source, target):
+        """Unfiltered degrees of separation, or None when the characters are not connected"""
+        if source not in self.adjacency or target not in self.adjacency:
+            return None
+        if source == target:
+            return 0
+        component, table = self.component, self.table
+        if component is not None and component[source] != component[target]:
+            return None
+        if table is not None:
+            d = table[source][self.ordinal[target]]
+            return None if d == UNREACHABLE else d
+        distances = self._bfs_distances(source, stop_at=target)
+        return distances.get(target)
+
+    def describe(self, path, types=None, movie_id=None):
+        """Turn a path into the characters/connections payload the frontend renders"""
+        rel_ok = self._rel_filter(types, movie_id) or (lambda key: True)
+        characters = []
+        for character_id in path:
+            character = self.graph.characters[character_id]
+            characters.append({
+                "id": character_id,
+                "name": character.get('name'),
+                "faction": character.get('faction')
+            })
+        connections = []
+        for a, b in zip(path, path[1:]):
+            key = next(key for key in self.adjacency[a][b] if rel_ok(key))
+            connections.append({"type": key[2], "movie": key[3]})
+        return {"characters": characters, "connections": connections, "degrees": len(path) - 1}
+
+    # Internals
+
+    def _rel_filter(self, types, movie_id):
+        if not types and not movie_id:
+            return None
+        types = set(types) if types else None
+
+        def rel_ok(key):
+            return (types is None or key[2] in types) and (not movie_id or key[3] == movie_id)
+        return rel_ok
+
+    def _neighbors(self, node, rel_ok, blocked_nodes=(), blocked_edges=()):
+        for other, keys in self.adjacency[node].items():
+            if other in blocked_nodes or (node, other) in blocked_edges:
+                continue
+            if rel_ok is None or any(rel_ok(key) for key in keys):
+                yield other
+
+    def _refresh_loop(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._refreshing = False
+                    return
+                self._pending = False
+                adjacency = dict(self.adjacency)
+            summaries = self._summaries(adjacency)
+            with self._lock:
+                # A change that landed meanwhile makes this pass stale; the next one replaces it
+                if not self._pending:
+                    self.component, self.ordinal, self.table = summaries
+
+    def _summaries(self, adjacency):
+        """Components, plus the ordinals and distance table when the graph is small enough"""
+        component = {}
+        for start in adjacency:
+            if start not in component:
+                for node in self._bfs_distances(start, adjacency=adjacency):
+                    component[node] = start
+        if len(adjacency) > self.table_limit:
+            return component, {}, None
+        return (component,) + self._build_table(adjacency)
+
+    def _bfs_distances(self, source, stop_at=None, adjacency=None):
+        adjacency = adjacency if adjacency is not None else self.adjacency
+        distances = {source: 0}
+        frontier = [source]
+        while frontier:
+            next_frontier = []
+            for node in frontier:
+                for other in adjacency[node]:
+                    if other not in distances:
+                        distances[other] = distances[node] + 1
+                        if other == stop_at:
+                            return distances
+                        next_frontier.append(other)
+            frontier = next_frontier
+        return distances
+
+    def _build_table(self, adjacency):
+        ordinal = {c: i for i, c in enumerate(adjacency)}
+        size = len(ordinal)
+        table = {}
+        for source in adjacency:
+            row = array('B', [UNREACHABLE]) * size
+            for node, d in self._bfs_distances(source, adjacency=adjacency).items():
+                if d <= MAX_TABLE_DISTANCE:
+                    row[ordinal[node]] = d
+            table[source] = row
+        return ordinal, table
+
+    def _walk_table(self, table, source, target):
+        """Yield every shortest path by stepping to neighbours one hop closer to the target"""
+        column = self.ordinal[target]
+        remaining = table[source][column]
+        if remaining == UNREACHABLE:
+            return
+        stack = [[source]]
+        while stack:
+            path = stack.pop()
+            node = path[-1]
+            if node == target:
+                yield path
+                continue
+            closer = table[node][column] - 1
+            steps = [o for o in self.adjacency[node] if table[o][column] == closer]
+            for other in reversed(steps):
+                stack.append(path + [other])
+
+    def _bidirectional(self, source, target, rel_ok, max_depth,
+                       blocked_nodes=(), blocked_edges=()):
+        """Layered BFS from both ends; returns the predecessor maps and meeting nodes"""
+        forward, backward = {source: []}, {target: []}
+        forward_frontier, backward_frontier = [source], [target]
+        depth = 0
+        while forward_frontier and backward_frontier and depth < max_depth:
+            if len(forward_frontier) <= len(backward_frontier):
+                forward_frontier = self._expand(forward_frontier, forward, rel_ok, blocked_nodes, blocked_edges)
+                frontier, other = forward_frontier, backward
+            else:
+                backward_frontier = self._expand(backward_frontier, backward, rel_ok, blocked_nodes, blocked_edges)
+                frontier, other = backward_frontier, forward
+            depth += 1
+            meeting = [node for node in frontier if node in other]
+            if meeting:
+                return forward, backward, meeting
+        return None
+
+    def _expand(self, frontier, preds, rel_ok, blocked_nodes, blocked_edges):
+        layer = {}
+        for node in frontier:
+            for other in self._neighbors(node, rel_ok, blocked_nodes, blocked_edges):
+                if other not in preds:
+                    layer.setdefault(other, []).append(node)
+        preds.update(layer)
+        return list(layer)
+
+    def _k_shortest(self, source, target, rel_ok, max_depth, k):
+        """Yen's algorithm over simple paths, using the BFS for each spur path"""
+        first = self._bidirectional(source, target, rel_ok, max_depth)
+        if first is None:
+            return []
+        found = [next(_join_paths(*first))]
+        candidates, seen = [], {tuple(found[0])}
+        while len(found) < k:
+            previous = found[-1]
+            for i in range(len(previous) - 1):
+                root = previous[:i + 1]
+                blocked_edges = set()
+                for path in found:
+                    if path[:i + 1] == root and len(path) > i + 1:
+                        blocked_edges.add((path[i], path[i + 1]))
+                        blocked_edges.add((path[i + 1], path[i]))
+                spur = self._bidirectional(previous[i], target, rel_ok, max_depth - i,
+                                           set(root[:-1]), blocked_edges)
+                if spur is None:
+                    continue
+                candidate = tuple(root[:-1] + next(_join_paths(*spur)))
+                if candidate not in seen:
+                    seen.add(candidate)
+                    heapq.heappush(candidates, (len(candidate), candidate))
+            if not candidates:
+                break
+            found.append(list(heapq.heappop(candidates)[1]))
+        return found
+
+
+def _walk(node, preds):
+    """Yield every path from the BFS root to node through the predecessor map"""
+    if not preds[node]:
+        yield [node]
+        return
+    for pred in preds[node]:
+        for path in _walk(pred, preds):
+            yield path + [node]
+
+
+def _join_paths(forward, backward, meeting):
+    for node in meeting:
+        for head in _walk(node, forward):
+            for tail in _walk(node, backward):
+                yield head + tail[-2::-1]
+
+
+def _take(iterable, limit):
+    for i, item in enumerate(iterable):
+        if i >= limit:
+            return
+        yield item
@@ -0,0 +1,98 @@
+"""Pre-serialized, pre-compressed JSON responses built once per data version."""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Misses compress inside the request, so use the levels past which size barely improves
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+class Payload:
+    """One JSON body in every encoding we can serve, plus a strong ETag per encoding"""
+
+    def __init__(self, body, version):
+        self.version = version
+        digest = hashlib.sha1(body).hexdigest()[:20]
+        self.bodies = {"identity": body, "gzip": gzip.compress(body, compresslevel=GZIP_LEVEL)}
+        if brotli is not None:
+            self.bodies["br"] = brotli.compress(body, quality=BROTLI_QUALITY)
+        # Strong ETags must differ between encodings of the same resource
+        self.etags = {
+            encoding: f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"'
+            for encoding in self.bodies
+        }
+
+    def response(self, request):
+        encoding = request.accept_encodings.best_match(list(self.bodies), default="identity")
+        if encoding not in self.bodies:
+            encoding = "identity"
+        etag = self.etags[encoding]
+
+        if any(request.if_none_match.contains(tag.strip('"')) for tag in self.etags.values()):
+            response = Response(status=304)
+        else:
+            response = Response(self.bodies[encoding], mimetype="application/json")
+            if encoding != "identity":
+                response.headers["Content-Encoding"] = encoding
+        response.headers["ETag"] = etag
+        response.headers["Vary"] = "Accept-Encoding"
+        # Let browsers keep the body but check the ETag every time
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+
+class PayloadCache:
+    """Small LRU of Payloads keyed by name; an entry is rebuilt when the data version moves on"""
+
+    def __init__(self, dumps, max_entries=64):
+        self.dumps = dumps
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks = {}
+
+    def get(self, key, version, build):
+        payload = self._lookup(key, version)
+        if payload is not None:
+            return payload
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        # Only one thread builds a given payload; the rest wait and reuse it
+        with build_lock:
+            payload = self._lookup(key, version)
+            if payload is None:
+                body = self.dumps(build()).encode("utf-8")
+                payload = Payload(body, version)
+                with self._lock:
+                    self._entries[key] = payload
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        evicted, _ = self._entries.popitem(last=False)
+                        self._build_locks.pop(evicted, None)
+        return payload
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {key: payload.version for key, payload in self._entries.items()}
+
+    def _lookup(self, key, version):
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None or payload.version != version:
+                return None
+            self._entries.move_to_end(key)
+            return payload
@@ -0,0 +1,38 @@
+"""Random picks for the fun endpoints without sorting a whole label per pick.
+
+Ids are kept in sorted arrays per label and per faction, so a pick is one index into a
+list, and the same seed gives the same picks on every worker and after every restart.
+"""
+from collections import defaultdict
+
+from snapshot import NODE_LABELS
+
+# Who the fortune teller warns you about
+ENEMY_FACTIONS = ['Royal Navy', 'East India Trading Company', 'Cursed']
+
+
+class Sampler:
+    """Id arrays per label, per faction and for the enemy factions, built once per loaded graph"""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.ids = {label: sorted(graph.nodes_for_label(label)) for label in NODE_LABELS}
+        by_faction = defaultdict(list)
+        for character_id in self.ids['Character']:
+            by_faction[graph.characters[character_id].get('faction')].append(character_id)
+        self.by_faction = dict(by_faction)
+        self.enemies = sorted(c for faction in ENEMY_FACTIONS for c in self.by_faction.get(faction, ()))
+
+    def pick(self, rng, label):
+        """Properties of a random node with this label, or None when there are none"""
+        ids = self.ids.get(label)
+        if not ids:
+            return None
+        return self.graph.nodes_for_label(label)[ids[rng.randrange(len(ids))]]
+
+    def pick_character(self, rng, faction=None):
+        ids = self.by_faction.get(faction, []) if faction else self.ids['Character']
+        return self.graph.characters[ids[rng.randrange(len(ids))]] if ids else None
+
+    def pick_enemy(self, rng):
+        return self.graph.characters[self.enemies[rng.randrange(len(self.enemies))]] if self.enemies else None
@@ -0,0 +1,160 @@
+"""In-process search index for /api/search.
+
+Names and descriptions are broken into 1-3 character grams so substring lookups only
+verify a handful of candidates instead of scanning every node. Results are ranked
+exact > prefix > substring > description hit > close misspelling.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+
+from snapshot import NODE_LABELS, _display_name
+
+EXACT, PREFIX, SUBSTRING, DESCRIPTION, FUZZY = range(5)
+
+SECONDARY_FIELDS = ('role', 'type', 'description')
+
+
+def _grams(text, n):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def _query_grams(query):
+    n = min(len(query), 3)
+    return _grams(query, n), n
+
+
+def _edit_distance(a, b, limit):
+    """Levenshtein distance with adjacent transpositions, giving up once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cost = 0 if ca == cb else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SearchIndex:
+    """Gram postings over node names and their role/type/description"""
+
+    def __init__(self, graph):
+        self.docs = []
+        self.name_grams = [defaultdict(set) for _ in range(4)]
+        self.text_grams = [defaultdict(set) for _ in range(4)]
+        tokens = []
+        for label in NODE_LABELS:
+            for props in graph.nodes_for_label(label).values():
+                name = _display_name(props)
+                secondary = next((props[f] for f in SECONDARY_FIELDS if props.get(f) is not None), '')
+                doc = len(self.docs)
+                name_lower, text_lower = (name or '').lower(), secondary.lower()
+                self.docs.append({
+                    "id": props.get('id'),
+                    "type": label,
+                    "name": name,
+                    "props": dict(props),
+                    "name_lower": name_lower,
+                    "text_lower": text_lower
+                })
+                for n in (1, 2, 3):
+                    for gram in _grams(name_lower, n):
+                        self.name_grams[n][gram].add(doc)
+                    for gram in _grams(text_lower, n):
+                        self.text_grams[n][gram].add(doc)
+                for token in name_lower.split():
+                    tokens.append((token, doc))
+        tokens.sort()
+        self.tokens = tokens
+        self.token_keys = [t for t, _ in tokens]
+
+    def search(self, query, limit=20, offset=0, fuzzy=True):
+        """Return (rows for the requested page, total number of matches)"""
+        query = query.lower().strip()
+        if not query:
+            return [], 0
+        ranked = {}
+
+        for doc in self._substring_candidates(query, self.name_grams):
+            name = self.docs[doc]["name_lower"]
+            if name == query:
+                ranked[doc] = EXACT
+            elif name.startswith(query):
+                ranked[doc] = PREFIX
+            elif query in name:
+                ranked[doc] = SUBSTRING
+        # "sparrow" is a prefix hit for "Captain Jack Sparrow" too
+        for doc in self._token_prefix(query):
+            ranked[doc] = min(ranked.get(doc, PREFIX), PREFIX)
+        for doc in self._substring_candidates(query, self.text_grams):
+            if doc not in ranked and query in self.docs[doc]["text_lower"]:
+                ranked[doc] = DESCRIPTION
+
+        distances = {}
+        # Always looked up, not only when a page runs short, so the total is the same on every page
+        if fuzzy and len(query) >= 3:
+            distances = self._fuzzy(query, exclude=ranked)
+            for doc in distances:
+                ranked[doc] = FUZZY
+
+        order = sorted(ranked, key=lambda d: (ranked[d], distances.get(d, 0),
+                                              len(self.docs[d]["name_lower"]), self.docs[d]["name_lower"]))
+        page = order[offset:offset + limit]
+        rows = [{k: self.docs[d][k] for k in ("id", "type", "name", "props")} for d in page]
+        return rows, len(order)
+
+    def _substring_candidates(self, query, postings):
+        grams, n = _query_grams(query)
+        candidates = None
+        # Intersect the rarest postings first so the set shrinks quickly
+        for gram in sorted(grams, key=lambda g: len(postings[n].get(g, ()))):
+            docs = postings[n].get(gram)
+            if not docs:
+                return set()
+            candidates = set(docs) if candidates is None else candidates & docs
+            if not candidates:
+                break
+        return candidates or set()
+
+    def _token_prefix(self, query):
+        start = bisect_left(self.token_keys, query)
+        docs = set()
+        for token, doc in self.tokens[start:]:
+            if not token.startswith(query):
+                break
+            docs.add(doc)
+        return docs
+
+    def _fuzzy(self, query, exclude):
+        """Names with a word within a small edit distance of the query"""
+        limit = 1 if len(query) <= 5 else 2
+        grams = _grams(query, 2)
+        shared = defaultdict(int)
+        for gram in grams:
+            for doc in self.name_grams[2].get(gram, ()):
+                if doc not in exclude:
+                    shared[doc] += 1
+        # Each edit can break at most two bigrams
+        needed = max(1, len(grams) - 2 * limit)
+        distances = {}
+        word_distances = {}   # names share most of their words, so each word is measured once
+        for doc, count in shared.items():
+            if count < needed:
+                continue
+            best = limit + 1
+            for word in self.docs[doc]["name_lower"].split():
+                if word not in word_distances:
+                    # Compare against word prefixes too, so a typo mid-word still matches while typing
+                    word_distances[word] = min(
+                        _edit_distance(query, word[:length], limit)
+                        for length in range(max(1, len(query) - limit), len(query) + limit + 1))
+                best = min(best, word_distances[word])
+            if best <= limit:
+                distances[doc] = best
+        return distances
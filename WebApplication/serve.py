@@ -0,0 +1,26 @@
+"""Production entry point: serves the Flask app with waitress instead of the dev server.
+
+    python serve.py
+
+Tune with SERVER_HOST, SERVER_PORT and SERVER_THREADS; keep NEO4J_MAX_POOL_SIZE at least
+as large as SERVER_THREADS so request threads never queue for a connection. Point the load
+balancer's health check at /ready, which turns 200 once the startup warm-up is done, and
+its liveness check at /live.
+"""
+import os
+
+from waitress import serve
+
+from server import app, warmup, GRAPH_BACKEND, NEO4J_URI
+
+HOST = os.getenv('SERVER_HOST', '0.0.0.0')
+PORT = int(os.getenv('SERVER_PORT', '5000'))
+THREADS = int(os.getenv('SERVER_THREADS', '32'))
+
+if __name__ == '__main__':
+    print("Starting Pirates of the Caribbean Graph Explorer (production)...")
+    print(f"Connecting to Neo4j at: {NEO4J_URI} (backend: {GRAPH_BACKEND})")
+    print(f"Listening on http://{HOST}:{PORT} with {THREADS} threads")
+    # Requests are served while this runs; /ready answers 503 until it is done
+    warmup.start()
+    serve(app, host=HOST, port=PORT, threads=THREADS)
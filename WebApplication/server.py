@@ -1,44 +1,519 @@
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, g, has_request_context, jsonify, request, send_file, send_from_directory
 from flask_cors import CORS
+from analytics import ANY, DIMENSIONS as CUBE_DIMENSIONS, FactionCube
 from neo4j import GraphDatabase
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from egograph import EDGE_KINDS, EGO_LABELS, EgoIndex, expand_types
+from contextvars import ContextVar
+from graphfile import load_snapshot as load_graph_file, write_graph
+from layout import VIEWS, LayoutEngine
+from metrics import InstrumentedSession, Gauge, ProfilePool, http_errors, http_latency, http_requests, registry
+from paths import PathIndex
+from payload_cache import PayloadCache
+from sampling import Sampler
+from search import SearchIndex
+from snapshot import CONFLICT_TYPES, GraphSnapshot
+from stats import CHARACTER_METRICS, GraphStats
+from store import make_store
+from timeline import MODES as TIMELINE_MODES, Timeline
+from warmup import Warmup
+import functools
+import hmac
+import json
+import logging
 import os
 import random
+import tempfile
+import threading
+import time
 
 load_dotenv()
 
 app = Flask(__name__, static_folder='.', static_url_path='')
-CORS(app)
+# Browsers on other origins may read and batch, but cannot send the admin token (no Authorization
+# header is allowed) or DELETE, so the endpoints that change data only work same-origin or from scripts
+CORS_ORIGINS = os.getenv('CORS_ORIGINS', '*')
+CORS(app, origins=[origin.strip() for origin in CORS_ORIGINS.split(',')],
+     methods=['GET', 'HEAD', 'POST', 'OPTIONS'], allow_headers=['Content-Type'])
 
 NEO4J_URI = os.getenv('NEO4J_URI', 'bolt://localhost:7687')
 NEO4J_USER = os.getenv('NEO4J_USER', 'neo4j')
 NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD', 'piratesproject')
+NEO4J_MAX_POOL_SIZE = int(os.getenv('NEO4J_MAX_POOL_SIZE', '50'))
+NEO4J_ACQUIRE_TIMEOUT = float(os.getenv('NEO4J_ACQUIRE_TIMEOUT', '30'))
+# Threads used to run an endpoint's independent queries side by side
+QUERY_WORKERS = int(os.getenv('QUERY_WORKERS', '16'))
+# Queries slower than this are counted and re-run under PROFILE into the slow query log (0 = off)
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '0'))
+# Slow queries waiting to be profiled; more than this and new ones are only counted
+PROFILE_QUEUE_SIZE = int(os.getenv('PROFILE_QUEUE_SIZE', '32'))
+
+# 'neo4j' runs every query against the database, 'snapshot' serves reads from memory
+GRAPH_BACKEND = os.getenv('GRAPH_BACKEND', 'neo4j')
+# Where the snapshot is loaded from: 'neo4j', or 'csv' / 'binary' (no database needed)
+SNAPSHOT_SOURCE = os.getenv('SNAPSHOT_SOURCE', 'neo4j')
+DATA_DIR = os.getenv('DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Data'))
+# Graph file written by graphfile.py, for SNAPSHOT_SOURCE=binary
+SNAPSHOT_FILE = os.getenv('SNAPSHOT_FILE', os.path.join(DATA_DIR, 'graph.pgraph'))
+# Snapshots loaded from files have no database behind them
+NO_DATABASE = GRAPH_BACKEND == 'snapshot' and SNAPSHOT_SOURCE in ('csv', 'binary')
+# Above this many characters the all-pairs distance table is skipped and paths use BFS only
+PATH_TABLE_MAX_CHARACTERS = int(os.getenv('PATH_TABLE_MAX_CHARACTERS', '3000'))
+# Betweenness uses this many sampled sources per component instead of all of them (0 = exact)
+BETWEENNESS_PIVOTS = int(os.getenv('BETWEENNESS_PIVOTS', '256'))
+# Compute node coordinates on the server so browsers can skip physics
+SERVER_LAYOUT = os.getenv('SERVER_LAYOUT', '1') == '1'
+# Counters and change events shared by all workers: 'memory' (one process) or 'sqlite:<path>'
+SHARED_STORE = os.getenv('SHARED_STORE', 'memory')
+# Seconds between keepalive comments on an idle /api/events stream
+EVENT_KEEPALIVE = float(os.getenv('EVENT_KEEPALIVE', '15'))
+# Every open /api/events stream holds a request thread, so only this many are served at once
+# (default a quarter of SERVER_THREADS); past the cap clients get 503 and poll instead
+EVENT_MAX_STREAMS = int(os.getenv('EVENT_MAX_STREAMS', str(int(os.getenv('SERVER_THREADS', '32')) // 4)))
+# Streams end after this many seconds and browsers reconnect, so pages take turns at the slots
+EVENT_STREAM_SECONDS = float(os.getenv('EVENT_STREAM_SECONDS', '300'))
+# Shared secret for the endpoints that change data (Authorization: Bearer <token>); unset = disabled
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+# Bounds on /api/ego: hops, new neighbours per node per hop (default), nodes in a result
+EGO_MAX_DEPTH = int(os.getenv('EGO_MAX_DEPTH', '4'))
+EGO_MAX_DEGREE = int(os.getenv('EGO_MAX_DEGREE', '25'))
+EGO_MAX_NODES = int(os.getenv('EGO_MAX_NODES', '500'))
+# Neighbourhoods kept ready to serve, least recently used dropped first
+EGO_CACHE_SIZE = int(os.getenv('EGO_CACHE_SIZE', '256'))
+# Timeline states and diffs: every mode times every movie, and movie pairs for diffs
+TIMELINE_CACHE_SIZE = int(os.getenv('TIMELINE_CACHE_SIZE', '128'))
+# Warm the pool, graph, indexes and endpoints at startup (0 = report ready at once)
+WARMUP = os.getenv('WARMUP', '1') == '1'
+# Connections opened ahead of the first requests, and seconds between attempts while Neo4j is down
+WARMUP_CONNECTIONS = int(os.getenv('WARMUP_CONNECTIONS', '8'))
+WARMUP_RETRY = float(os.getenv('WARMUP_RETRY', '5'))
 
 driver = None
+snapshot = None
+snapshot_lock = threading.Lock()
+# In Neo4j mode: "neo4j" moves on every data change, "reloads" only when the data is reloaded.
+# In snapshot mode the snapshot carries its own version.
+data_version = {"neo4j": 1, "reloads": 1}
+# Cached bodies leave out the spaces Flask puts after separators
+compact_dumps = functools.partial(app.json.dumps, separators=(',', ':'))
+payload_cache = PayloadCache(compact_dumps)
+ego_cache = PayloadCache(compact_dumps, max_entries=EGO_CACHE_SIZE)
+# Kept apart so stepping through the timeline never evicts graph/full or the layouts
+timeline_cache = PayloadCache(compact_dumps, max_entries=TIMELINE_CACHE_SIZE)
+# In-process indexes built from the graph, keyed by name: (data version, index)
+derived = {}
+derived_lock = threading.RLock()
+layout_engine = LayoutEngine()
+query_pool = ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix='cypher')
+profile_pool = ProfilePool(PROFILE_QUEUE_SIZE)
+store = make_store(SHARED_STORE)
+# Tags the events this worker publishes so it does not apply its own changes twice
+WORKER_ID = f"{os.getpid()}-{random.getrandbits(32):08x}"
+STARTED = time.time()
+synced = {"event_id": store.latest_event_id()}
+sync_lock = threading.Lock()
+stream_slots = threading.BoundedSemaphore(EVENT_MAX_STREAMS) if EVENT_MAX_STREAMS else None
+# Set while /api/batch runs, so all of its sub-requests share one Neo4j session
+batch_session = ContextVar('batch_session', default=None)
+
+pool_size_gauge = registry.add(Gauge('neo4j_max_pool_size', 'Configured size of the Neo4j connection pool'))
+pool_size_gauge.set(NEO4J_MAX_POOL_SIZE)
+ready_gauge = registry.add(Gauge('warmup_ready', '1 once the startup warm-up has finished',
+                                  callback=lambda: 1 if warmup.ready else 0))
+streams_open = registry.add(Gauge('event_streams_open', 'Open /api/events streams'))
+query_threads_busy = registry.add(Gauge('cypher_fanout_threads_busy', 'Fan-out threads currently running a query'))
+if SLOW_QUERY_MS:
+    logging.basicConfig()
+    logging.getLogger('pirates.slow_queries').setLevel(logging.WARNING)
 
 def get_driver():
     global driver
     if driver is None:
-        driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
+        driver = GraphDatabase.driver(
+            NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD),
+            max_connection_pool_size=NEO4J_MAX_POOL_SIZE,
+            connection_acquisition_timeout=NEO4J_ACQUIRE_TIMEOUT
+        )
     return driver
 
+def db_session(endpoint=None):
+    """Open a Neo4j session whose queries are timed and reported on /metrics"""
+    if endpoint is None:
+        endpoint = request.endpoint if has_request_context() else 'background'
+    shared = batch_session.get()
+    if shared is not None:
+        # Opened on first use, so a batch that only needs the snapshot never takes a connection
+        if shared["session"] is None:
+            shared["session"] = InstrumentedSession(get_driver(), 'batch', SLOW_QUERY_MS, profile_pool).__enter__()
+        return InstrumentedSession(get_driver(), endpoint, SLOW_QUERY_MS, profile_pool,
+                                   session=shared["session"].session)
+    return InstrumentedSession(get_driver(), endpoint, SLOW_QUERY_MS, profile_pool)
+
+def run_queries(*queries):
+    """Run independent read queries at the same time, each in its own pooled session.
+
+    Takes (cypher, params) pairs and returns one list of record dicts per query.
+    """
+    endpoint = request.endpoint if has_request_context() else 'background'
+    if batch_session.get() is not None:
+        # Inside a batch everything goes through its one session, one query after another
+        with db_session(endpoint) as session:
+            return [[dict(record) for record in session.run(cypher, **params)] for cypher, params in queries]
+
+    def run(query):
+        cypher, params = query
+        query_threads_busy.inc()
+        try:
+            with db_session(endpoint) as session:
+                return [dict(record) for record in session.run(cypher, **params)]
+        finally:
+            query_threads_busy.dec()
+    return list(query_pool.map(run, queries))
+
+def load_snapshot():
+    if SNAPSHOT_SOURCE == 'csv':
+        return GraphSnapshot.from_csv(DATA_DIR)
+    if SNAPSHOT_SOURCE == 'binary':
+        return load_graph_file(SNAPSHOT_FILE)
+    return GraphSnapshot.from_neo4j(get_driver())
+
+def get_snapshot():
+    """Return the in-memory graph, or None when reads should go to Neo4j"""
+    global snapshot
+    if GRAPH_BACKEND != 'snapshot':
+        return None
+    if snapshot is None:
+        with snapshot_lock:
+            if snapshot is None:
+                snapshot = load_snapshot()
+    return snapshot
+
+def current_data_version():
+    graph = get_snapshot()
+    if graph is not None:
+        return graph.version
+    return data_version["neo4j"]
+
+def get_derived(name, build, version=None):
+    """Build an in-process index once per data version"""
+    version = version if version is not None else current_data_version()
+    entry = derived.get(name)
+    if entry is None or entry[0] != version:
+        with derived_lock:
+            entry = derived.get(name)
+            if entry is None or entry[0] != version:
+                entry = (version, build())
+                derived[name] = entry
+    return entry[1]
+
+def get_index_graph():
+    """Graph the in-process indexes are built from; in Neo4j mode it is pulled once per data version"""
+    graph = get_snapshot()
+    if graph is not None:
+        return graph
+    return get_derived('graph', lambda: GraphSnapshot.from_neo4j(get_driver()),
+                       version=data_version["reloads"])
+
+def get_live_index(name, build):
+    """Build an index once per loaded graph; it keeps itself current through the graph's listeners"""
+    graph = get_index_graph()
+    entry = derived.get(name)
+    if entry is None or entry[0] is not graph:
+        with derived_lock:
+            entry = derived.get(name)
+            if entry is None or entry[0] is not graph:
+                # No relationship change may land between the build and its listener registering
+                with graph.write_lock:
+                    entry = (graph, build(graph))
+                derived[name] = entry
+    return entry[1]
+
+def get_path_index():
+    return get_live_index('paths', lambda graph: PathIndex(graph, PATH_TABLE_MAX_CHARACTERS))
+
+def get_search_index():
+    return get_derived('search', lambda: SearchIndex(get_index_graph()))
+
+def get_layout(view, movie_id=None):
+    return layout_engine.positions(view, movie_id, current_data_version(), get_index_graph())
+
+def get_timeline():
+    return get_derived('timeline', lambda: Timeline(get_index_graph()))
+
+def get_analytics():
+    return get_live_index('analytics', FactionCube)
+
+def get_sampler():
+    return get_live_index('sampler', Sampler)
+
+def get_stats():
+    return get_live_index('stats', lambda graph: GraphStats(graph, BETWEENNESS_PIVOTS or None))
+
+def get_ego_index():
+    return get_live_index('ego', EgoIndex)
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.before_request
+def sync_shared_state():
+    """Apply the changes other workers published since this worker last looked"""
+    if store.latest_event_id() <= synced["event_id"]:
+        return
+    with sync_lock:
+        events = store.events_since(synced["event_id"])
+        if events and events[0][0] > synced["event_id"] + 1:
+            # Older events were already pruned from the log, so start over from the database
+            reload_local()
+            events = []
+            synced["event_id"] = store.latest_event_id()
+        for event_id, event_type, data, origin in events:
+            if origin != WORKER_ID:
+                if event_type == 'reload':
+                    reload_local()
+                elif event_type == 'relationship':
+                    key = (data["source_id"], data["target_id"], data["type"], data["movie_id"])
+                    apply_relationship_change(data["op"], key, loaded_only=True)
+            synced["event_id"] = event_id
+
+def publish(event_type, data):
+    """Tell the other workers and every /api/events client about a change"""
+    return store.publish(event_type, data, WORKER_ID)
+
+def require_admin(view):
+    """Only callers sending ADMIN_TOKEN as a bearer token may use the endpoint"""
+    @functools.wraps(view)
+    def wrapped(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({"error": "Changes are disabled on this server (ADMIN_TOKEN is not set)"}), 403
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied.encode('utf-8'), f"Bearer {ADMIN_TOKEN}".encode('utf-8')):
+            return jsonify({"error": "Missing or wrong admin token"}), 401
+        return view(*args, **kwargs)
+    return wrapped
+
+@app.after_request
+def record_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        http_latency.observe(time.perf_counter() - started, route)
+        http_requests.inc(route, request.method, response.status_code)
+        if response.status_code >= 500:
+            http_errors.inc(route)
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition of request, query and pool metrics"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/events')
+def stream_events():
+    """Server-sent events: data reloads, relationship changes and counter updates.
+
+    With poll=1 it answers at once with the events after last_event_id, for clients that
+    could not get a stream.
+    """
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_id = int(last_id) if last_id else store.latest_event_id()
+    except ValueError:
+        return jsonify({"error": "Last-Event-ID must be a number"}), 400
+
+    if request.args.get('poll') == '1':
+        events = store.events_since(last_id)
+        return jsonify({
+            "last_event_id": events[-1][0] if events else last_id,
+            # The client missed events that are gone from the log; it has to refetch
+            "reset": bool(events) and events[0][0] > last_id + 1,
+            "events": [{"id": event_id, "type": event_type, "data": data}
+                       for event_id, event_type, data, _ in events]
+        })
+
+    if stream_slots is None or not stream_slots.acquire(blocking=False):
+        response = jsonify({"error": "Too many open event streams, poll with ?poll=1", "poll": True})
+        response.headers["Retry-After"] = "60"
+        return response, 503
+    streams_open.inc()
+
+    def stream(event_id):
+        yield "retry: 3000\n\n"
+        deadline = time.monotonic() + EVENT_STREAM_SECONDS
+        while time.monotonic() < deadline:
+            events = store.events_since(event_id, min(EVENT_KEEPALIVE, max(0.0, deadline - time.monotonic())))
+            if not events:
+                yield ": keepalive\n\n"
+                continue
+            if events[0][0] > event_id + 1:
+                yield "event: reset\ndata: {}\n\n"
+            for event_id, event_type, data, _ in events:
+                yield f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+    def release():
+        streams_open.dec()
+        stream_slots.release()
+
+    response = Response(stream(last_id), mimetype='text/event-stream',
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # Runs when the server closes the response: the stream ended or the client went away
+    response.call_on_close(release)
+    return response
+
 @app.route('/')
 def index():
     return send_from_directory('.', 'index.html')
 
 @app.route('/api/health')
 def health():
+    if NO_DATABASE:
+        try:
+            graph = get_snapshot()
+            return jsonify({"status": "connected", "backend": "snapshot", "version": graph.version})
+        except Exception as e:
+            return jsonify({"status": "error", "message": str(e)}), 500
     try:
-        with get_driver().session() as session:
+        with db_session() as session:
             session.run("RETURN 1")
         return jsonify({"status": "connected", "uri": NEO4J_URI})
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+# Warm-up and readiness
+
+def warm_connection_pool():
+    """Verify the database and open connections up front so the first requests find them ready"""
+    get_driver().verify_connectivity()
+    sessions, transactions = [], []
+    try:
+        for _ in range(min(WARMUP_CONNECTIONS, NEO4J_MAX_POOL_SIZE)):
+            session = get_driver().session()
+            sessions.append(session)
+            # An open transaction holds on to its connection, so every session gets a new one
+            transactions.append(session.begin_transaction())
+            transactions[-1].run("RETURN 1").consume()
+    finally:
+        for transaction in transactions:
+            transaction.close()
+        for session in sessions:
+            session.close()
+    return {"connections": len(sessions)}
+
+def warm_graph():
+    graph = get_index_graph()
+    return {"version": current_data_version(), "counts": graph.counts()}
+
+def warm_indexes():
+    timings = {}
+    for name, build in (('paths', get_path_index), ('search', get_search_index), ('stats', get_stats),
+                        ('analytics', get_analytics), ('sampler', get_sampler),
+                        ('timeline', get_timeline), ('ego', get_ego_index)):
+        started = time.perf_counter()
+        build()
+        timings[name] = round(time.perf_counter() - started, 3)
+    return timings
+
+def warm_layouts():
+    """Queue every layout; they are computed in the background, so readiness does not wait for them"""
+    if not SERVER_LAYOUT:
+        return "disabled"
+    scopes = [(view, None) for view in VIEWS if view != 'movie']
+    scopes += [('movie', movie_id) for movie_id in get_index_graph().movies]
+    for view, movie_id in scopes:
+        get_layout(view, movie_id)
+    return {"queued": len(scopes)}
+
+def warm_endpoints():
+    """Answer each read endpoint once: primes Neo4j's query plans and fills the payload caches"""
+    graph = get_index_graph()
+    character_id = next(iter(graph.characters), None)
+    movie_id = next(iter(graph.movies), None)
+    paths = ['/api/characters', '/api/characters/relationships', '/api/ships/routes', '/api/rivalries',
+             '/api/movies', '/api/factions', '/api/graph/full', '/api/timeline', '/api/leaderboard']
+    items = []
+    if movie_id is not None:
+        paths += [f'/api/relationships/{movie_id}', f'/api/ships/routes?movie_id={movie_id}',
+                  f'/api/rivalries?movie_id={movie_id}', f'/api/timeline/{movie_id}']
+    if character_id is not None:
+        paths += [f'/api/character/{character_id}/connections', f'/api/character/{character_id}/movies']
+        items.append({"name": "view:character", "view": "character", "id": character_id})
+    items.append({"name": "view:characters", "view": "characters"})
+    items += [{"name": path, "path": path} for path in paths]
+    failed = [item["name"] for item in items if run_batch_item(item)["status"] >= 400]
+    return {"requests": len(items), "failed": failed}
+
+def warmup_steps():
+    if not WARMUP:
+        return []
+    steps = [] if NO_DATABASE else [('connection_pool', warm_connection_pool, True)]
+    return steps + [
+        ('graph', warm_graph, True),
+        ('indexes', warm_indexes, True),
+        ('layouts', warm_layouts, False),
+        ('endpoints', warm_endpoints, False),
+    ]
+
+warmup = Warmup(warmup_steps(), WARMUP_RETRY)
+
+def loaded_data():
+    """The graph the indexes use and the data version, without loading anything (None if not loaded)"""
+    if GRAPH_BACKEND == 'snapshot':
+        return snapshot, snapshot.version if snapshot is not None else None
+    entry = derived.get('graph')
+    graph = entry[1] if entry is not None and entry[0] == data_version["reloads"] else None
+    return graph, data_version["neo4j"]
+
+def cache_states():
+    """Which caches hold data for the current version"""
+    graph, version = loaded_data()
+
+    def summary(versions):
+        # graph/full and the layouts are cached under (data version, layout version)
+        current = sum(1 for v in versions if (v[0] if isinstance(v, tuple) else v) == version)
+        return {"current": current, "stale": len(versions) - current}
+
+    indexes = {}
+    for name, (key, _) in list(derived.items()):
+        current = key == data_version["reloads"] if name == 'graph' else key is graph or key == version
+        indexes[name] = "current" if current else "stale"
+    stats = derived.get('stats')
+    return {
+        "graph_loaded": graph is not None,
+        "indexes": indexes,
+        "centrality": stats[1].centrality_state() if stats is not None else None,
+        "layouts": summary(list(layout_engine.stats().values())),
+        "payloads": summary(list(payload_cache.stats().values())),
+        "ego": summary(list(ego_cache.stats().values())),
+        "timeline": summary(list(timeline_cache.stats().values()))
+    }
+
+@app.route('/live')
+def live():
+    """Liveness: the process answers requests; says nothing about the data"""
+    return jsonify({"status": "alive", "worker": WORKER_ID, "uptime": round(time.time() - STARTED, 1)})
+
+@app.route('/ready')
+def ready():
+    """Readiness: 200 once the warm-up has finished, 503 (with its progress) until then"""
+    warmup.start()
+    result = {
+        "ready": warmup.ready,
+        "backend": GRAPH_BACKEND,
+        "data_version": loaded_data()[1],
+        "warmup": warmup.state(),
+        "caches": cache_states()
+    }
+    return jsonify(result), 200 if warmup.ready else 503
+
 @app.route('/api/characters')
 def get_characters():
     try:
-        with get_driver().session() as session:
+        graph = get_snapshot()
+        if graph is not None:
+            return jsonify(graph.get_characters())
+        with db_session() as session:
             result = session.run("""
                 MATCH (c:Character)
                 RETURN c.id as id, c.name as name, c.role as role,
@@ -52,7 +527,10 @@ def get_characters():
 @app.route('/api/characters/relationships')
 def get_all_character_relationships():
     try:
-        with get_driver().session() as session:
+        graph = get_snapshot()
+        if graph is not None:
+            return jsonify(graph.get_character_relationships())
+        with db_session() as session:
             result = session.run("""
                 MATCH (c1:Character)-[r:RELATIONSHIP]->(c2:Character)
                 RETURN c1.id as source_id, c1.name as source,
@@ -66,22 +544,33 @@ def get_all_character_relationships():
 @app.route('/api/relationships/<movie_id>')
 def get_movie_relationships(movie_id):
     try:
-        with get_driver().session() as session:
-            result = session.run("""
-                MATCH (c1:Character)-[r:RELATIONSHIP]->(c2:Character)
-                WHERE r.movie = $movie_id
-                RETURN c1.id as source_id, c1.name as source, c1.faction as source_faction,
-                       c2.id as target_id, c2.name as target, c2.faction as target_faction,
-                       r.type as relationship_type
-            """, movie_id=movie_id)
-            return jsonify([dict(record) for record in result])
+        payload = payload_cache.get(f"relationships/{movie_id}", current_data_version(),
+                                    lambda: build_movie_relationships(movie_id))
+        return payload.response(request)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def build_movie_relationships(movie_id):
+    graph = get_snapshot()
+    if graph is not None:
+        return graph.get_movie_relationships(movie_id)
+    with db_session() as session:
+        result = session.run("""
+            MATCH (c1:Character)-[r:RELATIONSHIP]->(c2:Character)
+            WHERE r.movie = $movie_id
+            RETURN c1.id as source_id, c1.name as source, c1.faction as source_faction,
+                   c2.id as target_id, c2.name as target, c2.faction as target_faction,
+                   r.type as relationship_type
+        """, movie_id=movie_id)
+        return [dict(record) for record in result]
+
 @app.route('/api/character/<character_id>/connections')
 def get_character_connections(character_id):
     try:
-        with get_driver().session() as session:
+        graph = get_snapshot()
+        if graph is not None:
+            return jsonify(graph.get_character_connections(character_id))
+        with db_session() as session:
             result = session.run("""
                 MATCH (c:Character {id: $char_id})-[r]-(connected)
                 RETURN type(r) as relationship_type,
@@ -95,11 +584,64 @@ def get_character_connections(character_id):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def ego_options(args):
+    """Read the neighbourhood filters from query args"""
+    def listed(name):
+        return [value.strip() for value in args.get(name, '').split(',') if value.strip()]
+
+    seeds = list(dict.fromkeys(listed('seeds')))
+    if not seeds:
+        raise ValueError("seeds is required (comma-separated node ids)")
+    depth = int(args.get('depth', 1))
+    if not 1 <= depth <= EGO_MAX_DEPTH:
+        raise ValueError(f"depth must be between 1 and {EGO_MAX_DEPTH}")
+    kinds = [kind.upper() for kind in listed('edges')]
+    if any(kind not in EDGE_KINDS for kind in kinds):
+        raise ValueError(f"edges must be among: {', '.join(EDGE_KINDS)}")
+    labels = [label.capitalize() for label in listed('labels')]
+    if any(label not in EGO_LABELS for label in labels):
+        raise ValueError(f"labels must be among: {', '.join(EGO_LABELS)}")
+    max_degree = [int(cap) for cap in listed('max_degree')] or [EGO_MAX_DEGREE]
+    if any(cap < 1 for cap in max_degree):
+        raise ValueError("max_degree values must be positive")
+    return {
+        "seeds": seeds,
+        "depth": depth,
+        "kinds": kinds or None,
+        "types": expand_types(listed('types')) or None,
+        "movie_id": args.get('movie_id') or None,
+        "labels": labels or None,
+        "max_degree": max_degree,
+        "max_nodes": min(int(args.get('max_nodes', EGO_MAX_NODES)), EGO_MAX_NODES)
+    }
+
+@app.route('/api/ego')
+def get_ego_graph():
+    """Nodes within depth hops of the seeds, filtered and capped per hop, ready for vis-network"""
+    try:
+        options = ego_options(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        index = get_ego_index()
+        missing = [seed for seed in options["seeds"] if seed not in index.labels]
+        if missing:
+            return jsonify({"error": f"Unknown node: {', '.join(missing)}"}), 404
+        # Same question, same key: filters are stored in a fixed order
+        key = json.dumps(options, sort_keys=True)
+        payload = ego_cache.get(key, current_data_version(), lambda: index.expand(**options))
+        return payload.response(request)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/ships/routes')
 def get_ship_routes():
     movie_id = request.args.get('movie_id')
     try:
-        with get_driver().session() as session:
+        graph = get_snapshot()
+        if graph is not None:
+            return jsonify(graph.get_ship_routes(movie_id))
+        with db_session() as session:
             if movie_id:
                 result = session.run("""
                     MATCH (s:Ship)-[r:ROUTE]->(l:Location)
@@ -127,28 +669,31 @@ def get_ship_routes():
 def get_rivalries():
     movie_id = request.args.get('movie_id')
     try:
-        with get_driver().session() as session:
+        graph = get_snapshot()
+        if graph is not None:
+            return jsonify(graph.get_rivalries(movie_id))
+        with db_session() as session:
             if movie_id:
                 result = session.run("""
                     MATCH (c1:Character)-[r:RELATIONSHIP]->(c2:Character)
-                    WHERE r.type IN ['ENEMY', 'RIVALRY', 'BETRAYED', 'MISTRUST']
+                    WHERE r.type IN $types
                       AND r.movie = $movie_id
                     MATCH (m:Movie {id: r.movie})
                     RETURN c1.id as char1_id, c1.name as character1, c2.id as char2_id, c2.name as character2,
                            r.type as conflict_type, m.title as movie, r.movie as movie_id,
                            c1.faction as faction1, c2.faction as faction2
                     ORDER BY m.release_year
-                """, movie_id=movie_id)
+                """, types=CONFLICT_TYPES, movie_id=movie_id)
             else:
                 result = session.run("""
                     MATCH (c1:Character)-[r:RELATIONSHIP]->(c2:Character)
-                    WHERE r.type IN ['ENEMY', 'RIVALRY', 'BETRAYED', 'MISTRUST']
+                    WHERE r.type IN $types
                     MATCH (m:Movie {id: r.movie})
                     RETURN c1.id as char1_id, c1.name as character1, c2.id as char2_id, c2.name as character2,
                            r.type as conflict_type, m.title as movie, r.movie as movie_id,
                            c1.faction as faction1, c2.faction as faction2
                     ORDER BY m.release_year
-                """)
+                """, types=CONFLICT_TYPES)
             return jsonify([dict(record) for record in result])
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -156,7 +701,10 @@ def get_rivalries():
 @app.route('/api/character/<character_id>/movies')
 def get_character_movies(character_id):
     try:
-        with get_driver().session() as session:
+        graph = get_snapshot()
+        if graph is not None:
+            return jsonify(graph.get_character_movies(character_id))
+        with db_session() as session:
             result = session.run("""
                 MATCH (c:Character {id: $char_id})-[:APPEARS_IN]->(m:Movie)
                 RETURN m.id as id, m.title as title, m.release_year as year,
@@ -169,72 +717,142 @@ def get_character_movies(character_id):
 
 @app.route('/api/graph/full')
 def get_full_graph():
+    """Whole graph, serialized and compressed once per data version"""
     try:
-        with get_driver().session() as session:
-            nodes_result = session.run("""
-                MATCH (n)
-                WHERE n:Character OR n:Ship OR n:Location OR n:Movie
-                RETURN id(n) as neo_id, labels(n)[0] as type,
-                       coalesce(n.name, n.ship_name, n.location_name, n.title) as label,
-                       n.id as node_id,
-                       properties(n) as props
-            """)
-            nodes = []
-            for record in nodes_result:
-                nodes.append({
-                    "id": record["node_id"],
-                    "label": record["label"],
-                    "type": record["type"],
-                    "props": dict(record["props"])
-                })
-
-            edges_result = session.run("""
-                MATCH (a)-[r]->(b)
-                WHERE (a:Character OR a:Ship OR a:Location OR a:Movie)
-                  AND (b:Character OR b:Ship OR b:Location OR b:Movie)
-                RETURN a.id as from_id, b.id as to_id, type(r) as type,
-                       coalesce(r.type, type(r)) as label
-            """)
-            edges = []
-            for record in edges_result:
-                edges.append({
-                    "from": record["from_id"],
-                    "to": record["to_id"],
-                    "type": record["type"],
-                    "label": record["label"]
-                })
+        # A layout finished in the background changes the body too
+        version = (current_data_version(), layout_engine.version('full') if SERVER_LAYOUT else None)
+        payload = payload_cache.get("graph/full", version, build_full_graph)
+        return payload.response(request)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def build_full_graph():
+    graph = get_snapshot()
+    if graph is not None:
+        return with_layout(graph.get_full_graph())
+    nodes_result, edges_result = run_queries(
+        ("""
+            MATCH (n)
+            WHERE n:Character OR n:Ship OR n:Location OR n:Movie
+            RETURN id(n) as neo_id, labels(n)[0] as type,
+                   coalesce(n.name, n.ship_name, n.location_name, n.title) as label,
+                   n.id as node_id,
+                   properties(n) as props
+        """, {}),
+        ("""
+            MATCH (a)-[r]->(b)
+            WHERE (a:Character OR a:Ship OR a:Location OR a:Movie)
+              AND (b:Character OR b:Ship OR b:Location OR b:Movie)
+            RETURN a.id as from_id, b.id as to_id, type(r) as type,
+                   coalesce(r.type, type(r)) as label
+        """, {})
+    )
+    nodes = []
+    for record in nodes_result:
+        nodes.append({
+            "id": record["node_id"],
+            "label": record["label"],
+            "type": record["type"],
+            "props": dict(record["props"])
+        })
+
+    edges = []
+    for record in edges_result:
+        edges.append({
+            "from": record["from_id"],
+            "to": record["to_id"],
+            "type": record["type"],
+            "label": record["label"]
+        })
+
+    return with_layout({"nodes": nodes, "edges": edges})
 
-        return jsonify({"nodes": nodes, "edges": edges})
+def with_layout(data):
+    """Add server-computed x/y to the full graph's nodes, once a layout exists"""
+    if SERVER_LAYOUT:
+        positions = get_layout('full') or {}
+        for node in data["nodes"]:
+            node.update(positions.get(node["id"], {}))
+    return data
+
+@app.route('/api/layout/<view>')
+def get_view_layout(view):
+    """Precomputed node positions for one graph view, as {id: {x, y}}"""
+    movie_id = request.args.get('movie_id')
+    if view not in VIEWS or (view == 'movie' and not movie_id):
+        return jsonify({"error": f"Unknown view, expected one of: {', '.join(VIEWS)} (movie needs movie_id)"}), 400
+    if not SERVER_LAYOUT:
+        return jsonify({"error": "Server layout is disabled (SERVER_LAYOUT=0)"}), 404
+    try:
+        if movie_id and movie_id not in get_index_graph().movies:
+            return jsonify({"error": f"Unknown movie: {movie_id}"}), 404
+        version = current_data_version()
+
+        def build():
+            positions = get_layout(view, movie_id)
+            layout_version = layout_engine.version(view, movie_id)
+            return {
+                "view": view,
+                "movie_id": movie_id,
+                "version": layout_version,
+                # Positions are missing or from older data while the new layout is computed
+                "pending": layout_version != version,
+                "positions": positions or {}
+            }
+
+        payload = payload_cache.get(f"layout/{view}/{movie_id or ''}",
+                                    (version, layout_engine.version(view, movie_id)), build)
+        return payload.response(request)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/graph/export')
+def export_graph():
+    """The whole graph as a binary graph file (see graphfile.py), written once per data version"""
+    try:
+        path = get_derived('export', write_export)
+        return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                         download_name='graph.pgraph')
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def write_export():
+    previous = derived.get('export')
+    if previous is not None and os.path.exists(previous[1]):
+        os.remove(previous[1])
+    fd, path = tempfile.mkstemp(prefix='pirates-', suffix='.pgraph')
+    os.close(fd)
+    write_graph(get_index_graph(), path)
+    return path
+
 @app.route('/api/search')
 def search():
+    """Ranked search over names and descriptions; paginate with limit/offset"""
     query = request.args.get('q', '').lower()
     if not query:
         return jsonify([])
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), 100))
+        offset = max(0, int(request.args.get('offset', 0)))
+    except ValueError:
+        return jsonify({"error": "limit and offset must be numbers"}), 400
+    fuzzy = request.args.get('fuzzy', '1') != '0'
 
     try:
-        with get_driver().session() as session:
-            result = session.run("""
-                MATCH (n)
-                WHERE (n:Character OR n:Ship OR n:Location OR n:Movie)
-                  AND (toLower(coalesce(n.name, n.ship_name, n.location_name, n.title, ''))
-                       CONTAINS $query
-                       OR toLower(coalesce(n.role, n.type, n.description, '')) CONTAINS $query)
-                RETURN n.id as id, labels(n)[0] as type,
-                       coalesce(n.name, n.ship_name, n.location_name, n.title) as name,
-                       properties(n) as props
-                LIMIT 20
-            """, query=query)
-            return jsonify([dict(record) for record in result])
+        rows, total = get_search_index().search(query, limit, offset, fuzzy)
+        response = jsonify(rows)
+        response.headers['X-Total-Count'] = str(total)
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/movies')
 def get_movies():
     try:
-        with get_driver().session() as session:
+        graph = get_snapshot()
+        if graph is not None:
+            return jsonify(graph.get_movies())
+        with db_session() as session:
             result = session.run("""
                 MATCH (m:Movie)
                 RETURN m.id as id, m.title as title, m.release_year as year,
@@ -247,181 +865,590 @@ def get_movies():
 
 @app.route('/api/factions')
 def get_factions():
-    movie_id = request.args.get('movie_id')
+    """Characters grouped by faction, precomputed once per loaded graph"""
     try:
-        with get_driver().session() as session:
-            if movie_id:
-                result = session.run("""
-                    MATCH (c:Character)-[:APPEARS_IN]->(m:Movie {id: $movie_id})
-                    RETURN c.faction as faction, count(c) as member_count,
-                           collect(c.name) as members, collect(c.id) as member_ids
-                    ORDER BY member_count DESC
-                """, movie_id=movie_id)
-            else:
-                result = session.run("""
-                    MATCH (c:Character)
-                    RETURN c.faction as faction, count(c) as member_count,
-                           collect(c.name) as members, collect(c.id) as member_ids
-                    ORDER BY member_count DESC
-                """)
-            return jsonify([dict(record) for record in result])
+        return jsonify(get_analytics().get_factions(request.args.get('movie_id')))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def cube_filters(args):
+    """Fixed coordinates of a cube query; anything left out is rolled up"""
+    return {
+        "faction": args.get('faction', ANY),
+        "other_faction": args.get('other_faction', ANY),
+        "rel_type": args.get('type', ANY),
+        "movie_id": args.get('movie_id', ANY)
+    }
+
+def cube_group_by(args):
+    group_by = [dim.strip() for dim in args.get('group_by', '').split(',') if dim.strip()]
+    unknown = [dim for dim in group_by if dim not in CUBE_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown group_by dimension, expected: {', '.join(CUBE_DIMENSIONS)}")
+    return group_by
+
+@app.route('/api/analytics/dimensions')
+def get_cube_dimensions():
+    """Factions, relationship types, type groups and movies the cube can be sliced by"""
+    try:
+        return jsonify(get_analytics().dimensions())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/analytics/cube')
+def get_cube():
+    """Relationship counts for a slice (faction, other_faction, type, movie_id), optionally grouped"""
+    try:
+        group_by = cube_group_by(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    members = request.args.get('members') == '1'
+    try:
+        cube = get_analytics()
+        if group_by:
+            return jsonify(cube.rollup(group_by, members, **cube_filters(request.args)))
+        return jsonify(cube.slice(members=members, **cube_filters(request.args)))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/analytics/ratio')
+def get_cube_ratio():
+    """Share of one relationship type or group per group_by cell, e.g. alliances per faction per movie"""
+    filters = cube_filters(request.args)
+    rel_type = filters.pop('rel_type')
+    if rel_type == ANY:
+        return jsonify({"error": "type is required (a relationship type or group)"}), 400
+    try:
+        group_by = cube_group_by(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        return jsonify(get_analytics().ratio(rel_type, group_by, **filters))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/timeline')
+def get_timeline_summary():
+    """Movies in release order with how many relationships each holds and adds"""
+    try:
+        return jsonify(get_timeline().summary())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/timeline/<movie_id>')
+def get_timeline_state(movie_id):
+    """Character graph in one movie (mode=movie) or up to and including it (mode=cumulative)"""
+    mode = request.args.get('mode', 'movie')
+    if mode not in TIMELINE_MODES:
+        return jsonify({"error": f"mode must be one of: {', '.join(TIMELINE_MODES)}"}), 400
+    try:
+        timeline = get_timeline()
+        if movie_id not in timeline.position:
+            return jsonify({"error": f"Unknown movie: {movie_id}"}), 404
+        payload = timeline_cache.get(f"timeline/{mode}/{movie_id}", current_data_version(),
+                                    lambda: timeline.state(movie_id, mode))
+        return payload.response(request)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/timeline/diff')
+def get_timeline_diff():
+    """Nodes and edges added, removed or retyped going from one movie to another"""
+    from_movie, to_movie = request.args.get('from'), request.args.get('to')
+    mode = request.args.get('mode', 'movie')
+    if mode not in TIMELINE_MODES:
+        return jsonify({"error": f"mode must be one of: {', '.join(TIMELINE_MODES)}"}), 400
+    if not from_movie or not to_movie:
+        return jsonify({"error": "from and to movie ids are required"}), 400
+    try:
+        timeline = get_timeline()
+        for movie_id in (from_movie, to_movie):
+            if movie_id not in timeline.position:
+                return jsonify({"error": f"Unknown movie: {movie_id}"}), 404
+        payload = timeline_cache.get(f"timeline/diff/{mode}/{from_movie}/{to_movie}", current_data_version(),
+                                    lambda: timeline.diff(from_movie, to_movie, mode))
+        return payload.response(request)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/reload', methods=['POST'])
+@require_admin
+def reload_data():
+    """Call after reloading the data: rebuilds the snapshot and drops cached payloads"""
+    try:
+        reload_local()
+        graph = get_snapshot()
+        result = {
+            "version": current_data_version(),
+            "counts": graph.counts() if graph is not None else None
+        }
+        publish('reload', result)
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def reload_local():
+    """Rebuild this worker's snapshot and forget everything derived from the old data"""
+    global snapshot
+    if GRAPH_BACKEND == 'snapshot':
+        fresh = load_snapshot()
+        with snapshot_lock:
+            snapshot = fresh
+    else:
+        data_version["neo4j"] += 1
+        data_version["reloads"] += 1
+    payload_cache.clear()
+    ego_cache.clear()
+    timeline_cache.clear()
+    with derived_lock:
+        derived.clear()
+
+@app.route('/api/relationships', methods=['POST', 'DELETE'])
+@require_admin
+def change_relationship():
+    """Add or remove a character relationship; in-process indexes are updated in place"""
+    body = request.get_json(silent=True) or {}
+    try:
+        key = (body['source_id'], body['target_id'], body['type'], body['movie_id'])
+    except KeyError as e:
+        return jsonify({"error": f"Missing field: {e.args[0]}"}), 400
+    try:
+        # A snapshot loaded from a file has no database behind it, so changes live in memory only
+        if not NO_DATABASE:
+            with db_session() as session:
+                if request.method == 'POST':
+                    session.run("""
+                        MATCH (c1:Character {id: $source_id})
+                        MATCH (c2:Character {id: $target_id})
+                        MERGE (c1)-[:RELATIONSHIP {type: $type, movie: $movie_id}]->(c2)
+                    """, source_id=key[0], target_id=key[1], type=key[2], movie_id=key[3]).consume()
+                else:
+                    session.run("""
+                        MATCH (:Character {id: $source_id})-[r:RELATIONSHIP {type: $type, movie: $movie_id}]->
+                              (:Character {id: $target_id})
+                        DELETE r
+                    """, source_id=key[0], target_id=key[1], type=key[2], movie_id=key[3]).consume()
+
+        op = 'add' if request.method == 'POST' else 'remove'
+        changed = apply_relationship_change(op, key)
+        if changed:
+            graph = get_index_graph()
+            publish('relationship', {
+                "op": op,
+                "source_id": key[0],
+                "target_id": key[1],
+                "type": key[2],
+                "movie_id": key[3],
+                "version": current_data_version(),
+                "nodes": [{"id": c, "name": graph.characters[c].get('name'),
+                           "faction": graph.characters[c].get('faction')}
+                          for c in dict.fromkeys(key[:2]) if c in graph.characters]
+            })
+        return jsonify({"changed": changed, "version": current_data_version()})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def apply_relationship_change(op, key, loaded_only=False):
+    """Update the in-process graph (and through it every live index) for one relationship.
+
+    With loaded_only, a graph that is not loaded yet is left alone: it will be read fresh.
+    """
+    if loaded_only:
+        if GRAPH_BACKEND == 'snapshot':
+            graph = snapshot
+        else:
+            entry = derived.get('graph')
+            graph = entry[1] if entry is not None and entry[0] == data_version["reloads"] else None
+    else:
+        graph = get_index_graph()
+    changed = False
+    if graph is not None:
+        if op == 'add':
+            changed = graph.insert_relationship(*key) is not None
+        else:
+            changed = graph.delete_relationship(*key) is not None
+    if GRAPH_BACKEND != 'snapshot':
+        data_version["neo4j"] += 1
+    return changed
+
+# Batching
+
+# Sub-requests that cannot be answered inside a batch
+BATCH_EXCLUDED = {'stream_events', 'run_batch'}
+BATCH_MAX_REQUESTS = 50
+
+@app.route('/api/batch', methods=['POST'])
+def run_batch():
+    """Answer several GET requests and views in one round trip, sharing one Neo4j session.
+
+    Body: {"requests": [{"name": ..., "path": "/api/..."} or {"name": ..., "view": ..., ...}]}
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"error": "Body must be a JSON object with a requests list"}), 400
+    items = body.get('requests')
+    if isinstance(items, dict):
+        items = [{"name": name, "path": path} for name, path in items.items()]
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "requests must be a non-empty list"}), 400
+    if len(items) > BATCH_MAX_REQUESTS:
+        return jsonify({"error": f"At most {BATCH_MAX_REQUESTS} requests per batch"}), 400
+
+    shared = {"session": None}
+    token = batch_session.set(shared)
+    try:
+        results = {}
+        for i, item in enumerate(items):
+            name = str(item.get('name', i)) if isinstance(item, dict) else str(i)
+            results[name] = run_batch_item(item)
+        return jsonify({"results": results})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        batch_session.reset(token)
+        if shared["session"] is not None:
+            shared["session"].__exit__(None, None, None)
+
+def run_batch_item(item):
+    """One sub-request as {"status": ..., "body": ...}; a failure only fails its own entry"""
+    if not isinstance(item, dict):
+        return {"status": 400, "body": {"error": "Each request needs a path or a view"}}
+    if 'view' in item:
+        view = item['view']
+        build = BATCH_VIEWS.get(view) if isinstance(view, str) else None
+        if build is None:
+            return {"status": 400, "body": {"error": f"Unknown view, expected one of: {', '.join(BATCH_VIEWS)}"}}
+        try:
+            return {"status": 200, "body": build(item)}
+        except KeyError as e:
+            return {"status": 400, "body": {"error": f"Missing field: {e.args[0]}"}}
+        except ValueError as e:
+            return {"status": 400, "body": {"error": str(e)}}
+        except Exception as e:
+            return {"status": 500, "body": {"error": str(e)}}
+
+    path = item.get('path')
+    if not isinstance(path, str) or not path:
+        return {"status": 400, "body": {"error": "Each request needs a path or a view"}}
+    path, _, query_string = path.partition('?')
+    try:
+        endpoint, args = app.url_map.bind('localhost').match(path, method='GET')
+    except Exception:
+        endpoint = None
+    if endpoint in (None, 'static'):
+        return {"status": 404, "body": {"error": f"No GET endpoint at {path}"}}
+    if endpoint in BATCH_EXCLUDED:
+        return {"status": 400, "body": {"error": f"{path} cannot be batched"}}
+    try:
+        with app.test_request_context(path, query_string=query_string):
+            response = app.make_response(app.view_functions[endpoint](**args))
+            return {"status": response.status_code, "body": response.get_json(silent=True)}
+    except Exception as e:
+        return {"status": 500, "body": {"error": str(e)}}
+
+def character_view(item):
+    """Connections and movies of one character, in a single query"""
+    character_id = item['id']
+    if not isinstance(character_id, str) or not character_id:
+        raise ValueError("id must be a character id")
+    graph = get_snapshot()
+    if graph is not None:
+        return {
+            "connections": graph.get_character_connections(character_id),
+            "movies": graph.get_character_movies(character_id)
+        }
+    with db_session() as session:
+        record = session.run("""
+            MATCH (c:Character {id: $char_id})
+            CALL {
+                WITH c
+                MATCH (c)-[r]-(connected)
+                RETURN collect({relationship_type: type(r), connected_type: labels(connected)[0],
+                                connected_name: connected.name, connected_id: connected.id,
+                                rel_detail: r.type, movie_id: r.movie}) as connections
+            }
+            CALL {
+                WITH c
+                MATCH (c)-[:APPEARS_IN]->(m:Movie)
+                WITH m ORDER BY m.release_year
+                RETURN collect({id: m.id, title: m.title, year: m.release_year,
+                                budget: m.budget_in_million}) as movies
+            }
+            RETURN connections, movies
+        """, char_id=character_id).single()
+        if record is None:
+            return {"connections": [], "movies": []}
+        return {"connections": record["connections"], "movies": record["movies"]}
+
+def characters_view(item):
+    """Every character and every character relationship, in a single query"""
+    graph = get_snapshot()
+    if graph is not None:
+        return {
+            "characters": graph.get_characters(),
+            "relationships": graph.get_character_relationships()
+        }
+    with db_session() as session:
+        record = session.run("""
+            CALL {
+                MATCH (c:Character)
+                WITH c ORDER BY c.name
+                RETURN collect({id: c.id, name: c.name, role: c.role,
+                                faction: c.faction, status: c.status}) as characters
+            }
+            CALL {
+                MATCH (c1:Character)-[r:RELATIONSHIP]->(c2:Character)
+                RETURN collect({source_id: c1.id, source: c1.name, target_id: c2.id, target: c2.name,
+                                relationship_type: r.type, movie_id: r.movie}) as relationships
+            }
+            RETURN characters, relationships
+        """).single()
+        return {"characters": record["characters"], "relationships": record["relationships"]}
+
+BATCH_VIEWS = {
+    "character": character_view,
+    "characters": characters_view,
+}
+
 
 # Fun features
 
+def path_options(args):
+    """Read the Six Degrees filters from query args or a JSON body; raises ValueError on bad input"""
+    def positive(name, default):
+        value = args.get(name, default)
+        if value in (None, ''):
+            return None
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be a number")
+        if value < 1:
+            raise ValueError(f"{name} must be at least 1")
+        return value
+
+    types = args.get('types')
+    if isinstance(types, str):
+        types = [t.strip().upper() for t in types.split(',') if t.strip()]
+    elif types is not None and not (isinstance(types, list) and all(isinstance(t, str) for t in types)):
+        raise ValueError("types must be a comma-separated string or a list of strings")
+    movie_id = args.get('movie_id') or None
+    if movie_id is not None and not isinstance(movie_id, str):
+        raise ValueError("movie_id must be a string")
+    mode = args.get('mode', 'shortest')
+    if mode not in ('shortest', 'all', 'k'):
+        raise ValueError("mode must be one of: shortest, all, k")
+    return {
+        "types": types or None,
+        "movie_id": movie_id,
+        "max_depth": positive('max_depth', None),
+        "mode": mode,
+        "k": min(positive('k', 3) or 3, 20)
+    }
+
+def describe_paths(index, char1_id, char2_id, options):
+    paths = index.find_paths(char1_id, char2_id, **options)
+    if not paths:
+        return {"found": False, "message": "No path found between these characters!"}
+    described = [index.describe(p, options["types"], options["movie_id"]) for p in paths]
+    result = {"found": True}
+    result.update(described[0])
+    if options["mode"] != 'shortest':
+        result["paths"] = described
+    return result
+
 @app.route('/api/path/<char1_id>/<char2_id>')
 def find_path(char1_id, char2_id):
     """Find shortest path between two characters"""
     try:
-        with get_driver().session() as session:
-            result = session.run("""
-                MATCH path = shortestPath(
-                    (c1:Character {id: $char1})-[:RELATIONSHIP*]-(c2:Character {id: $char2})
-                )
-                RETURN [n in nodes(path) | {id: n.id, name: n.name, faction: n.faction}] as characters,
-                       [r in relationships(path) | {type: r.type, movie: r.movie}] as connections,
-                       length(path) as degrees
-            """, char1=char1_id, char2=char2_id)
-            record = result.single()
-            if record:
-                return jsonify({
-                    "found": True,
-                    "characters": record["characters"],
-                    "connections": record["connections"],
-                    "degrees": record["degrees"]
-                })
-            return jsonify({"found": False, "message": "No path found between these characters!"})
+        options = path_options(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        return jsonify(describe_paths(get_path_index(), char1_id, char2_id, options))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/path/batch', methods=['POST'])
+def find_paths_batch():
+    """Resolve many character pairs in one call"""
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"error": "Body must be a JSON object with a pairs list"}), 400
+    pairs = body.get('pairs') or []
+    if not isinstance(pairs, list):
+        return jsonify({"error": "pairs must be a list"}), 400
+    if len(pairs) > 1000:
+        return jsonify({"error": "At most 1000 pairs per batch"}), 400
+    try:
+        options = path_options(body)
+        pairs = [(p["from"], p["to"]) if isinstance(p, dict) else (p[0], p[1]) for p in pairs]
+        if not all(isinstance(a, str) and isinstance(b, str) for a, b in pairs):
+            raise ValueError("character ids must be strings")
+    except (ValueError, KeyError, IndexError, TypeError) as e:
+        return jsonify({"error": f"Invalid batch request: {e}"}), 400
+    try:
+        index = get_path_index()
+        results = []
+        for char1_id, char2_id in pairs:
+            result = {"from": char1_id, "to": char2_id}
+            result.update(describe_paths(index, char1_id, char2_id, options))
+            results.append(result)
+        return jsonify({"results": results})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/path/distance/<char1_id>/<char2_id>')
+def get_path_distance(char1_id, char2_id):
+    """Degrees of separation only, straight from the distance table"""
+    try:
+        degrees = get_path_index().distance(char1_id, char2_id)
+        return jsonify({"found": degrees is not None, "degrees": degrees})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/leaderboard')
 def get_leaderboard():
     """Get stats about characters - most connected, most enemies, etc"""
+    movie_id = request.args.get('movie_id')
     try:
-        with get_driver().session() as session:
-            connected = session.run("""
-                MATCH (c:Character)-[r:RELATIONSHIP]-()
-                RETURN c.name as name, c.faction as faction, count(r) as connections
-                ORDER BY connections DESC LIMIT 5
-            """)
-            most_connected = [dict(r) for r in connected]
-
-            enemies = session.run("""
-                MATCH (c:Character)-[r:RELATIONSHIP]-()
-                WHERE r.type IN ['ENEMY', 'RIVALRY', 'BETRAYED']
-                RETURN c.name as name, c.faction as faction, count(r) as enemy_count
-                ORDER BY enemy_count DESC LIMIT 5
-            """)
-            most_enemies = [dict(r) for r in enemies]
-
-            appearances = session.run("""
-                MATCH (c:Character)-[:APPEARS_IN]->(m:Movie)
-                RETURN c.name as name, c.faction as faction, count(m) as movies
-                ORDER BY movies DESC LIMIT 5
-            """)
-            most_appearances = [dict(r) for r in appearances]
+        limit = max(1, min(int(request.args.get('limit', 5)), 100))
+    except ValueError:
+        return jsonify({"error": "limit must be a number"}), 400
+    try:
+        stats = get_stats()
 
-            traveled = session.run("""
-                MATCH (s:Ship)-[r:ROUTE]->(l:Location)
-                RETURN s.ship_name as name, s.captain as captain, count(DISTINCT l) as locations
-                ORDER BY locations DESC LIMIT 5
-            """)
-            most_traveled = [dict(r) for r in traveled]
+        def top(metric, key):
+            rows = stats.top_characters(metric, movie_id, limit)
+            return [{"name": r["name"], "faction": r["faction"], key: r[metric]} for r in rows]
 
         return jsonify({
-            "most_connected": most_connected,
-            "most_enemies": most_enemies,
-            "most_appearances": most_appearances,
-            "most_traveled_ships": most_traveled
+            "most_connected": top('connections', 'connections'),
+            "most_enemies": top('enemy_count', 'enemy_count'),
+            "most_appearances": top('movies', 'movies'),
+            "most_traveled_ships": stats.top_ships(movie_id, limit),
+            "most_central": top('betweenness', 'betweenness'),
+            "most_influential": top('pagerank', 'pagerank')
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/fortune')
-def get_fortune():
-    """Generate a random pirate adventure using data from the database"""
+@app.route('/api/stats/characters')
+def get_character_stats():
+    """Every statistic for every character, optionally within one movie"""
     try:
-        with get_driver().session() as session:
-            char_result = session.run("""
-                MATCH (c:Character)
-                WITH c, rand() as r ORDER BY r LIMIT 1
-                RETURN c.name as name, c.role as role, c.faction as faction
-            """)
-            character = dict(char_result.single())
+        return jsonify(get_stats().characters(request.args.get('movie_id')))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-            ship_result = session.run("""
-                MATCH (s:Ship)
-                WITH s, rand() as r ORDER BY r LIMIT 1
-                RETURN s.ship_name as name, s.type as type, s.captain as captain
-            """)
-            ship = dict(ship_result.single())
+@app.route('/api/stats/top/<metric>')
+def get_top_characters(metric):
+    """Top N characters by one statistic"""
+    if metric not in CHARACTER_METRICS:
+        return jsonify({"error": f"Unknown metric, expected one of: {', '.join(CHARACTER_METRICS)}"}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', 10)), 100))
+    except ValueError:
+        return jsonify({"error": "limit must be a number"}), 400
+    try:
+        return jsonify(get_stats().top_characters(metric, request.args.get('movie_id'), limit))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-            loc_result = session.run("""
-                MATCH (l:Location)
-                WITH l, rand() as r ORDER BY r LIMIT 1
-                RETURN l.location_name as name, l.description as description
-            """)
-            location = dict(loc_result.single())
+@app.route('/api/stats/components')
+def get_components():
+    """Connected groups of characters, largest first"""
+    try:
+        return jsonify(get_stats().components(request.args.get('movie_id')))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-            enemy_result = session.run("""
-                MATCH (c:Character)
-                WHERE c.faction IN ['Royal Navy', 'East India Trading Company', 'Cursed']
-                WITH c, rand() as r ORDER BY r LIMIT 1
-                RETURN c.name as name, c.role as role
-            """)
-            enemy = dict(enemy_result.single())
-
-        fortunes = [
-            f"Ye shall sail aboard the {ship['name']} to {location['name']}, where {character['name']} awaits with a mysterious map. Beware of {enemy['name']}!",
-            f"The winds whisper of treasure at {location['name']}. {character['name']} knows the way, but {enemy['name']} follows in the shadows...",
-            f"A storm brews over {location['name']}! Only {character['name']} and the mighty {ship['name']} can save ye from {enemy['name']}'s wrath!",
-            f"Legends speak of {character['name']} hiding cursed gold at {location['name']}. The {ship['name']} is yer only hope, but {enemy['name']} seeks the same prize!",
-            f"Tonight, ye dream of {location['name']}... {character['name']} appears as a ghost, warning ye that {enemy['name']} has cursed the {ship['name']}!",
-            f"The compass points to {location['name']}, where {character['name']} guards an ancient secret. Race {enemy['name']} aboard the {ship['name']}!",
-        ]
+def fun_options(args):
+    """Seed and bulk count for the fun endpoints: (rng, count or None)"""
+    seed = args.get('seed')
+    count = args.get('count')
+    count = max(1, min(int(count), 100)) if count not in (None, '') else None
+    # A seeded generator makes the results reproducible, on any worker
+    return (random.Random(seed) if seed is not None else random), count
 
-        return jsonify({
-            "fortune": random.choice(fortunes),
-            "character": character,
-            "ship": ship,
-            "location": location,
-            "enemy": enemy,
-            "lucky_number": random.randint(1, 8),
-            "lucky_item": random.choice(["Compass", "Rum Bottle", "Cursed Medallion", "Treasure Map", "Kraken Tooth", "Mermaid Tear"])
-        })
+@app.route('/api/fortune')
+def get_fortune():
+    """Generate a random pirate adventure from the characters, ships and places in the graph"""
+    try:
+        rng, count = fun_options(request.args)
+    except ValueError:
+        return jsonify({"error": "count must be a number"}), 400
+    try:
+        sampler = get_sampler()
+        if count is None:
+            return jsonify(make_fortune(sampler, rng))
+        return jsonify({"seed": request.args.get('seed'), "fortunes": [make_fortune(sampler, rng) for _ in range(count)]})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def make_fortune(sampler, rng):
+    character = sampler.pick_character(rng)
+    ship = sampler.pick(rng, 'Ship')
+    location = sampler.pick(rng, 'Location')
+    enemy = sampler.pick_enemy(rng)
+    if character is None or ship is None or location is None or enemy is None:
+        raise LookupError("Not enough characters, ships, places and enemies for a fortune")
+    character = {"name": character.get('name'), "role": character.get('role'), "faction": character.get('faction')}
+    ship = {"name": ship.get('ship_name'), "type": ship.get('type'), "captain": ship.get('captain')}
+    location = {"name": location.get('location_name'), "description": location.get('description')}
+    enemy = {"name": enemy.get('name'), "role": enemy.get('role')}
+
+    fortunes = [
+        f"Ye shall sail aboard the {ship['name']} to {location['name']}, where {character['name']} awaits with a mysterious map. Beware of {enemy['name']}!",
+        f"The winds whisper of treasure at {location['name']}. {character['name']} knows the way, but {enemy['name']} follows in the shadows...",
+        f"A storm brews over {location['name']}! Only {character['name']} and the mighty {ship['name']} can save ye from {enemy['name']}'s wrath!",
+        f"Legends speak of {character['name']} hiding cursed gold at {location['name']}. The {ship['name']} is yer only hope, but {enemy['name']} seeks the same prize!",
+        f"Tonight, ye dream of {location['name']}... {character['name']} appears as a ghost, warning ye that {enemy['name']} has cursed the {ship['name']}!",
+        f"The compass points to {location['name']}, where {character['name']} guards an ancient secret. Race {enemy['name']} aboard the {ship['name']}!",
+    ]
+
+    return {
+        "fortune": rng.choice(fortunes),
+        "character": character,
+        "ship": ship,
+        "location": location,
+        "enemy": enemy,
+        "lucky_number": rng.randint(1, 8),
+        "lucky_item": rng.choice(["Compass", "Rum Bottle", "Cursed Medallion", "Treasure Map", "Kraken Tooth", "Mermaid Tear"])
+    }
+
 @app.route('/api/pirate-name')
 def generate_pirate_name():
     """Generate a random pirate identity"""
+    try:
+        rng, count = fun_options(request.args)
+    except ValueError:
+        return jsonify({"error": "count must be a number"}), 400
+    try:
+        sampler = get_sampler()
+    except Exception:
+        sampler = None
+    if count is None:
+        return jsonify(make_pirate_name(sampler, rng))
+    return jsonify({"seed": request.args.get('seed'), "names": [make_pirate_name(sampler, rng) for _ in range(count)]})
+
+def make_pirate_name(sampler, rng):
     prefixes = ["Captain", "Bloody", "One-Eyed", "Dread Pirate", "Mad", "Scurvy", "Black", "Red", "Silver", "Ghost"]
     first_names = ["Jack", "William", "Anne", "Mary", "Edward", "Bartholomew", "Henry", "Charles", "James", "Calico"]
     nicknames = ["the Terrible", "Bones", "the Cursed", "Goldtooth", "Blackbeard", "the Feared", "Cutlass", "Stormrider", "Seadog", "the Immortal"]
 
-    name = f"{random.choice(prefixes)} {random.choice(first_names)} {random.choice(nicknames)}"
+    name = f"{rng.choice(prefixes)} {rng.choice(first_names)} {rng.choice(nicknames)}"
 
-    try:
-        with get_driver().session() as session:
-            ship_result = session.run("""
-                MATCH (s:Ship)
-                WITH s, rand() as r ORDER BY r LIMIT 1
-                RETURN s.ship_name as name
-            """)
-            ship = ship_result.single()
-            vessel = ship["name"] if ship else "The Black Pearl"
-    except:
-        vessel = "The Black Pearl"
+    ship = sampler.pick(rng, 'Ship') if sampler is not None else None
+    vessel = ship.get('ship_name') if ship and ship.get('ship_name') else "The Black Pearl"
 
-    return jsonify({
+    return {
         "pirate_name": name,
         "vessel": vessel,
-        "crew_size": random.randint(15, 150),
-        "bounty": f"{random.randint(1, 100) * 1000} gold doubloons",
-        "reputation": random.choice(["Legendary", "Feared", "Notorious", "Infamous", "Mythical", "Dreaded"])
-    })
+        "crew_size": rng.randint(15, 150),
+        "bounty": f"{rng.randint(1, 100) * 1000} gold doubloons",
+        "reputation": rng.choice(["Legendary", "Feared", "Notorious", "Infamous", "Mythical", "Dreaded"])
+    }
 
 @app.route('/api/wisdom')
 def get_wisdom():
@@ -444,13 +1471,12 @@ def get_wisdom():
         "speaker": "Captain Jack Sparrow"
     })
 
-rum_count = {"gone": 0}
-
 @app.route('/api/rum', methods=['GET', 'POST'])
 def rum_tracker():
     """Track how many times the rum has been gone"""
     if request.method == 'POST':
-        rum_count["gone"] += 1
+        times_gone = store.incr('rum_gone')
+        publish('counter', {"name": "rum_gone", "value": times_gone})
         responses = [
             "Why is the rum always gone?",
             "But WHY is the rum gone?!",
@@ -461,12 +1487,17 @@ def rum_tracker():
         ]
         return jsonify({
             "message": random.choice(responses),
-            "times_gone": rum_count["gone"]
+            "times_gone": times_gone
         })
-    return jsonify({"times_gone": rum_count["gone"]})
+    return jsonify({"times_gone": store.get('rum_gone')})
 
 
 if __name__ == '__main__':
     print("Starting Pirates of the Caribbean Graph Explorer...")
     print(f"Connecting to Neo4j at: {NEO4J_URI}")
+    if GRAPH_BACKEND == 'snapshot':
+        print(f"Serving reads from an in-memory snapshot (source: {SNAPSHOT_SOURCE})")
+    # The debug reloader runs this file twice; only the child process serves requests
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        warmup.start()
     app.run(debug=True, port=5000)
@@ -0,0 +1,449 @@
+"""In-memory copy of the graph so the read endpoints can skip the Neo4j round trip.
+
+A snapshot is loaded once (from Neo4j or straight from the CSVs in Data/) and then
+answers the same questions as the Cypher in server.py, returning the same rows.
+"""
+import csv
+import itertools
+import os
+import threading
+from collections import defaultdict
+
+CONFLICT_TYPES = ['ENEMY', 'RIVALRY', 'BETRAYED', 'MISTRUST']
+# The conflicts that count as a character's enemies on the leaderboard
+ENEMY_TYPES = ['ENEMY', 'RIVALRY', 'BETRAYED']
+ALLIANCE_TYPES = ['ALLY', 'UNEASY_ALLY', 'CREW', 'FRIENDS']
+
+RELATIONSHIP_GROUPS = {
+    "conflict": CONFLICT_TYPES,
+    "enemy": ENEMY_TYPES,
+    "alliance": ALLIANCE_TYPES,
+}
+
+NODE_LABELS = ['Character', 'Ship', 'Location', 'Movie']
+
+_versions = itertools.count(1)
+
+
+def _display_name(props):
+    for key in ('name', 'ship_name', 'location_name', 'title'):
+        if props.get(key) is not None:
+            return props[key]
+    return None
+
+
+def _sort_key(value):
+    # Cypher's ORDER BY puts nulls last
+    return (value is None, value if value is not None else '')
+
+
+def _read_csv(data_dir, filename):
+    path = os.path.join(data_dir, filename)
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            # LOAD CSV turns empty fields into null, and SET skips null properties
+            yield {k: v for k, v in row.items() if v not in ('', None)}
+
+
+class GraphSnapshot:
+    """Nodes by id plus RELATIONSHIP/ROUTE/APPEARS_IN/PLAYED_BY edges indexed for the API"""
+
+    def __init__(self):
+        self.version = next(_versions)
+        self.characters = {}
+        self.ships = {}
+        self.locations = {}
+        self.movies = {}
+        self.cast = {}
+
+        # Edges are stored as tuples in dicts used as ordered sets, which keeps
+        # MERGE semantics (no duplicates) and makes removal cheap
+        self.relationships = {}   # (source, target, type, movie)
+        self.routes = {}          # (ship, location, movie_id, type)
+        self.appearances = {}     # (character, movie)
+        self.played_by = {}       # (character, cast, movie_id)
+
+        self.relationships_by_type = defaultdict(dict)
+        self.relationships_by_movie = defaultdict(dict)
+        self.relationships_by_character = defaultdict(dict)
+        self.routes_by_movie = defaultdict(dict)
+        self.routes_by_ship = defaultdict(dict)
+        self.movies_by_character = defaultdict(dict)
+        self.characters_by_movie = defaultdict(dict)
+        self.cast_by_character = defaultdict(dict)
+
+        # Called as listener(op, kind, key) after insert_/delete_ changes, not during loading
+        self.listeners = []
+        # One live change at a time, so listeners see changes in the order they were made.
+        # Hold it while building an index and registering its listener so no change slips in between
+        self.write_lock = threading.RLock()
+
+    # Live changes
+    #
+    # Request threads iterate the edge dicts without locks, so a live change never mutates a
+    # dict that is already published: it builds changed copies and swaps them in. A reader
+    # keeps iterating the dict it started with.
+
+    def insert_relationship(self, source, target, rel_type, movie):
+        """Add a relationship after loading: bumps the version and tells the listeners"""
+        with self.write_lock:
+            if source not in self.characters or target not in self.characters:
+                return None
+            key = (source, target, rel_type, movie)
+            if key in self.relationships:
+                return None
+            self._swap_relationship('add', key)
+            self._changed('add', 'relationship', key)
+            return key
+
+    def delete_relationship(self, source, target, rel_type, movie):
+        with self.write_lock:
+            key = (source, target, rel_type, movie)
+            if key not in self.relationships:
+                return None
+            self._swap_relationship('remove', key)
+            self._changed('remove', 'relationship', key)
+            return key
+
+    def _swap_relationship(self, op, key):
+        source, target, rel_type, movie = key
+        # Copied in one pass with fromkeys: the tables may be read-only views (see graphfile.py)
+        relationships = dict.fromkeys(self.relationships, True)
+        buckets = {
+            'relationships_by_type': [rel_type],
+            'relationships_by_movie': [movie],
+            'relationships_by_character': list(dict.fromkeys((source, target))),
+        }
+        indexes = {}
+        for name, index_keys in buckets.items():
+            index = defaultdict(dict, getattr(self, name))
+            for index_key in index_keys:
+                bucket = dict.fromkeys(index.get(index_key, ()), True)
+                if op == 'add':
+                    bucket[key] = True
+                else:
+                    bucket.pop(key, None)
+                if bucket:
+                    index[index_key] = bucket
+                else:
+                    index.pop(index_key, None)
+            indexes[name] = index
+        if op == 'add':
+            relationships[key] = True
+        else:
+            del relationships[key]
+        self.relationships = relationships
+        for name, index in indexes.items():
+            setattr(self, name, index)
+
+    def _changed(self, op, kind, key):
+        self.version = next(_versions)
+        for listener in list(self.listeners):
+            listener(op, kind, key)
+
+    # Building
+
+    def add_node(self, label, props):
+        nodes = self.nodes_for_label(label)
+        if nodes is None or props.get('id') is None:
+            return
+        # MERGE ... ON CREATE SET: the first row for an id wins
+        nodes.setdefault(props['id'], dict(props))
+
+    def add_relationship(self, source, target, rel_type, movie):
+        if source not in self.characters or target not in self.characters:
+            return None
+        key = (source, target, rel_type, movie)
+        if key in self.relationships:
+            return None
+        self.relationships[key] = True
+        self.relationships_by_type[rel_type][key] = True
+        self.relationships_by_movie[movie][key] = True
+        self.relationships_by_character[source][key] = True
+        self.relationships_by_character[target][key] = True
+        return key
+
+    def add_route(self, ship, location, movie_id, route_type):
+        if ship not in self.ships or location not in self.locations:
+            return
+        key = (ship, location, movie_id, route_type)
+        self.routes[key] = True
+        self.routes_by_movie[movie_id][key] = True
+        self.routes_by_ship[ship][key] = True
+
+    def add_appearance(self, character, movie):
+        if character not in self.characters or movie not in self.movies:
+            return
+        key = (character, movie)
+        self.appearances[key] = True
+        self.movies_by_character[character][movie] = True
+        self.characters_by_movie[movie][character] = True
+
+    def add_played_by(self, character, cast_id, movie_id):
+        if character not in self.characters or cast_id not in self.cast:
+            return
+        key = (character, cast_id, movie_id)
+        self.played_by[key] = True
+        self.cast_by_character[character][key] = True
+
+    def nodes_for_label(self, label):
+        return {
+            'Character': self.characters,
+            'Ship': self.ships,
+            'Location': self.locations,
+            'Movie': self.movies,
+            'Cast': self.cast,
+        }.get(label)
+
+    def counts(self):
+        return {
+            "characters": len(self.characters),
+            "ships": len(self.ships),
+            "locations": len(self.locations),
+            "movies": len(self.movies),
+            "cast": len(self.cast),
+            "relationships": len(self.relationships),
+            "routes": len(self.routes),
+            "appearances": len(self.appearances),
+            "played_by": len(self.played_by),
+        }
+
+    @classmethod
+    def from_csv(cls, data_dir):
+        """Build a snapshot from the CSVs, following the same rules as load_data.cypher"""
+        graph = cls()
+        for row in _read_csv(data_dir, 'nodes_movies.csv'):
+            graph.add_node('Movie', row)
+        for row in _read_csv(data_dir, 'nodes_characters.csv'):
+            graph.add_node('Character', row)
+        for row in _read_csv(data_dir, 'nodes_cast.csv'):
+            props = {k: v for k, v in row.items() if k != 'cast_id'}
+            graph.add_node('Cast', dict(id=row.get('cast_id'), **props))
+        for row in _read_csv(data_dir, 'nodes_ships.csv'):
+            graph.add_node('Ship', row)
+        for row in _read_csv(data_dir, 'nodes_locations.csv'):
+            graph.add_node('Location', row)
+
+        for row in _read_csv(data_dir, 'relationships_cast.csv'):
+            # The Cypher MATCHes the character, the actor and the movie before merging either edge
+            if row.get('movie_id') not in graph.movies or row.get('cast_id') not in graph.cast:
+                continue
+            graph.add_played_by(row.get('character_id'), row.get('cast_id'), row.get('movie_id'))
+            graph.add_appearance(row.get('character_id'), row.get('movie_id'))
+        for row in _read_csv(data_dir, 'relationships_characters.csv'):
+            graph.add_relationship(row.get('character_id_1'), row.get('character_id_2'),
+                                   row.get('type'), row.get('movie_id'))
+        for row in _read_csv(data_dir, 'relationships_ship_locations.csv'):
+            graph.add_route(row.get('ship_id'), row.get('location_id'),
+                            row.get('movie_id'), row.get('type'))
+        return graph
+
+    @classmethod
+    def from_neo4j(cls, driver):
+        """Pull every node and edge the API uses out of Neo4j in a handful of queries"""
+        graph = cls()
+        with driver.session() as session:
+            for label in NODE_LABELS + ['Cast']:
+                result = session.run(f"MATCH (n:{label}) RETURN properties(n) as props")
+                for record in result:
+                    graph.add_node(label, dict(record["props"]))
+
+            result = session.run("""
+                MATCH (c:Character)-[:APPEARS_IN]->(m:Movie)
+                RETURN c.id as character, m.id as movie
+            """)
+            for record in result:
+                graph.add_appearance(record["character"], record["movie"])
+
+            result = session.run("""
+                MATCH (c:Character)-[r:PLAYED_BY]->(a:Cast)
+                RETURN c.id as character, a.id as cast_id, r.movie_id as movie_id
+            """)
+            for record in result:
+                graph.add_played_by(record["character"], record["cast_id"], record["movie_id"])
+
+            result = session.run("""
+                MATCH (c1:Character)-[r:RELATIONSHIP]->(c2:Character)
+                RETURN c1.id as source, c2.id as target, r.type as type, r.movie as movie
+            """)
+            for record in result:
+                graph.add_relationship(record["source"], record["target"],
+                                       record["type"], record["movie"])
+
+            result = session.run("""
+                MATCH (s:Ship)-[r:ROUTE]->(l:Location)
+                RETURN s.id as ship, l.id as location, r.movie_id as movie_id, r.type as type
+            """)
+            for record in result:
+                graph.add_route(record["ship"], record["location"],
+                                record["movie_id"], record["type"])
+        return graph
+
+    # Queries - each returns the same rows as the matching endpoint in server.py
+
+    def get_characters(self):
+        rows = [self._character_row(c) for c in self.characters.values()]
+        return sorted(rows, key=lambda r: _sort_key(r["name"]))
+
+    def get_character_relationships(self):
+        rows = []
+        for source, target, rel_type, movie in self.relationships:
+            rows.append({
+                "source_id": source,
+                "source": self.characters[source].get('name'),
+                "target_id": target,
+                "target": self.characters[target].get('name'),
+                "relationship_type": rel_type,
+                "movie_id": movie
+            })
+        return rows
+
+    def get_movie_relationships(self, movie_id):
+        rows = []
+        for source, target, rel_type, movie in self.relationships_by_movie.get(movie_id, {}):
+            c1, c2 = self.characters[source], self.characters[target]
+            rows.append({
+                "source_id": source,
+                "source": c1.get('name'),
+                "source_faction": c1.get('faction'),
+                "target_id": target,
+                "target": c2.get('name'),
+                "target_faction": c2.get('faction'),
+                "relationship_type": rel_type
+            })
+        return rows
+
+    def get_character_connections(self, character_id):
+        if character_id not in self.characters:
+            return []
+        rows = []
+        for source, target, rel_type, movie in self.relationships_by_character.get(character_id, {}):
+            # A self-relationship matches twice in an undirected pattern, once per direction
+            others = [target, source] if source == target else [target if source == character_id else source]
+            for other in others:
+                rows.append(self._connection_row('RELATIONSHIP', 'Character',
+                                                 self.characters[other], rel_type, movie))
+        for movie_id in self.movies_by_character.get(character_id, {}):
+            rows.append(self._connection_row('APPEARS_IN', 'Movie', self.movies[movie_id], None, None))
+        for _, cast_id, _ in self.cast_by_character.get(character_id, {}):
+            rows.append(self._connection_row('PLAYED_BY', 'Cast', self.cast[cast_id], None, None))
+        return rows
+
+    def get_ship_routes(self, movie_id=None):
+        routes = self.routes_by_movie.get(movie_id, {}) if movie_id else self.routes
+        rows = []
+        for ship_id, location_id, route_movie, route_type in routes:
+            ship, location = self.ships[ship_id], self.locations[location_id]
+            rows.append({
+                "ship_id": ship_id,
+                "ship_name": ship.get('ship_name'),
+                "ship_type": ship.get('type'),
+                "location_id": location_id,
+                "location_name": location.get('location_name'),
+                "location_desc": location.get('description'),
+                "movie_id": route_movie,
+                "route_type": route_type
+            })
+        return sorted(rows, key=lambda r: (_sort_key(r["ship_name"]), _sort_key(r["movie_id"])))
+
+    def get_rivalries(self, movie_id=None):
+        rows = []
+        for rel_type in CONFLICT_TYPES:
+            for source, target, _, movie in self.relationships_by_type.get(rel_type, {}):
+                if movie_id and movie != movie_id:
+                    continue
+                # MATCH (m:Movie {id: r.movie}) drops relationships with an unknown movie
+                if movie not in self.movies:
+                    continue
+                c1, c2 = self.characters[source], self.characters[target]
+                rows.append({
+                    "char1_id": source,
+                    "character1": c1.get('name'),
+                    "char2_id": target,
+                    "character2": c2.get('name'),
+                    "conflict_type": rel_type,
+                    "movie": self.movies[movie].get('title'),
+                    "movie_id": movie,
+                    "faction1": c1.get('faction'),
+                    "faction2": c2.get('faction')
+                })
+        return sorted(rows, key=lambda r: _sort_key(self.movies[r["movie_id"]].get('release_year')))
+
+    def get_character_movies(self, character_id):
+        movie_ids = self.movies_by_character.get(character_id, {})
+        rows = [self._movie_row(self.movies[m]) for m in movie_ids]
+        return sorted(rows, key=lambda r: _sort_key(r["year"]))
+
+    def get_full_graph(self):
+        nodes = []
+        for label in NODE_LABELS:
+            for props in self.nodes_for_label(label).values():
+                nodes.append({
+                    "id": props.get('id'),
+                    "label": _display_name(props),
+                    "type": label,
+                    "props": dict(props)
+                })
+
+        edges = []
+        for character, movie in self.appearances:
+            edges.append({"from": character, "to": movie, "type": "APPEARS_IN", "label": "APPEARS_IN"})
+        for source, target, rel_type, _ in self.relationships:
+            label = rel_type if rel_type is not None else 'RELATIONSHIP'
+            edges.append({"from": source, "to": target, "type": "RELATIONSHIP", "label": label})
+        for ship, location, _, route_type in self.routes:
+            label = route_type if route_type is not None else 'ROUTE'
+            edges.append({"from": ship, "to": location, "type": "ROUTE", "label": label})
+        return {"nodes": nodes, "edges": edges}
+
+    def get_movies(self):
+        rows = [self._movie_row(m) for m in self.movies.values()]
+        return sorted(rows, key=lambda r: _sort_key(r["year"]))
+
+    def get_factions(self, movie_id=None):
+        if movie_id:
+            members = [self.characters[c] for c in self.characters_by_movie.get(movie_id, {})]
+        else:
+            members = list(self.characters.values())
+
+        factions = {}
+        for character in members:
+            faction = factions.setdefault(character.get('faction'), {
+                "faction": character.get('faction'),
+                "member_count": 0,
+                "members": [],
+                "member_ids": []
+            })
+            faction["member_count"] += 1
+            faction["members"].append(character.get('name'))
+            faction["member_ids"].append(character.get('id'))
+        return sorted(factions.values(), key=lambda f: -f["member_count"])
+
+    # Row helpers
+
+    def _character_row(self, character):
+        return {
+            "id": character.get('id'),
+            "name": character.get('name'),
+            "role": character.get('role'),
+            "faction": character.get('faction'),
+            "status": character.get('status')
+        }
+
+    def _movie_row(self, movie):
+        return {
+            "id": movie.get('id'),
+            "title": movie.get('title'),
+            "year": movie.get('release_year'),
+            "budget": movie.get('budget_in_million')
+        }
+
+    def _connection_row(self, relationship_type, connected_type, connected, rel_detail, movie_id):
+        return {
+            "relationship_type": relationship_type,
+            "connected_type": connected_type,
+            "connected_name": connected.get('name'),
+            "connected_id": connected.get('id'),
+            "rel_detail": rel_detail,
+            "movie_id": movie_id
+        }
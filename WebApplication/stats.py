@@ -0,0 +1,405 @@
+"""Leaderboard and centrality statistics, kept current as relationships change.
+
+Counters and connected components are computed when the graph is loaded and updated in
+place when a relationship is added or removed. PageRank and betweenness are recomputed on
+a background thread from a copy of the adjacency: PageRank is re-iterated from the previous
+vector and betweenness is recomputed only for the components that changed, using sampled
+pivots on large components. Reads never wait for them and serve the last vectors.
+Rankings per metric are sorted once and reused until their scope changes.
+"""
+import random
+import threading
+import time
+from collections import defaultdict, deque
+
+from snapshot import ENEMY_TYPES
+
+CHARACTER_METRICS = ['connections', 'enemy_count', 'movies', 'pagerank', 'betweenness', 'component_size']
+
+
+class ScopeStats:
+    """Statistics for one view of the character graph: all movies, or a single movie"""
+
+    def __init__(self, nodes, betweenness_pivots=None):
+        self.betweenness_pivots = betweenness_pivots
+        # Nodes that belong to the scope even without relationships (e.g. cast in the movie)
+        self.base_nodes = set(nodes)
+        self.degree = defaultdict(int)
+        self.enemy_degree = defaultdict(int)
+        self.adjacency = {}      # node -> {neighbour: number of relationships}
+        self.component = {}      # node -> component label (one of its members)
+        self.members = {}        # component label -> set of nodes
+        self.pagerank = {}
+        self.pagerank_dirty = True
+        self.betweenness = {}
+        self.dirty_components = set()
+        self.rankings = {}       # metric -> node ids with a non-zero value, best first
+        for node in nodes:
+            self.add_node(node)
+
+    def add_node(self, node):
+        if node in self.adjacency:
+            return
+        self.adjacency[node] = {}
+        self.component[node] = node
+        self.members[node] = {node}
+        self.betweenness[node] = 0.0
+        self.pagerank_dirty = True
+        self.rankings.clear()
+
+    def add_edge(self, source, target, rel_type):
+        self.rankings.clear()
+        self.add_node(source)
+        self.add_node(target)
+        self.degree[source] += 1
+        self.degree[target] += 1
+        if rel_type in ENEMY_TYPES:
+            self.enemy_degree[source] += 1
+            self.enemy_degree[target] += 1
+        if source != target:
+            first_link = target not in self.adjacency[source]
+            self.adjacency[source][target] = self.adjacency[source].get(target, 0) + 1
+            self.adjacency[target][source] = self.adjacency[target].get(source, 0) + 1
+            label = self._union(source, target) if first_link else self.component[source]
+            self.dirty_components.add(label)
+        self.pagerank_dirty = True
+
+    def remove_edge(self, source, target, rel_type):
+        self.rankings.clear()
+        self.degree[source] -= 1
+        self.degree[target] -= 1
+        if rel_type in ENEMY_TYPES:
+            self.enemy_degree[source] -= 1
+            self.enemy_degree[target] -= 1
+        if source != target:
+            for a, b in ((source, target), (target, source)):
+                self.adjacency[a][b] -= 1
+                if not self.adjacency[a][b]:
+                    del self.adjacency[a][b]
+            if target not in self.adjacency[source]:
+                self._split(source, target)
+            self.dirty_components.add(self.component[source])
+            self.dirty_components.add(self.component[target])
+        for node in (source, target):
+            if node not in self.base_nodes and node in self.adjacency and not self.degree[node]:
+                self._drop_node(node)
+        self.pagerank_dirty = True
+
+    @property
+    def dirty(self):
+        return self.pagerank_dirty or bool(self.dirty_components)
+
+    def take_refresh_work(self):
+        """Copy what the stale centralities need, so they can be computed without holding the lock"""
+        work = {"pagerank": None, "components": []}
+        if self.pagerank_dirty:
+            work["pagerank"] = ({v: dict(nbrs) for v, nbrs in self.adjacency.items()}, dict(self.pagerank))
+            self.pagerank_dirty = False
+        for label in self.dirty_components:
+            if label in self.members:
+                members = self.members[label]
+                work["components"].append({v: dict(self.adjacency[v]) for v in members})
+        self.dirty_components.clear()
+        return work
+
+    def compute(self, work):
+        """Run the refresh work from take_refresh_work; safe to call without the lock"""
+        results = {"pagerank": None, "betweenness": {}}
+        if work["pagerank"] is not None:
+            results["pagerank"] = pagerank(*work["pagerank"])
+        for adjacency in work["components"]:
+            results["betweenness"].update(betweenness(adjacency, self.betweenness_pivots))
+        return results
+
+    def apply_refresh(self, results):
+        # Nodes dropped meanwhile are skipped; changed components are already dirty again
+        if results["pagerank"] is not None:
+            self.pagerank = {v: r for v, r in results["pagerank"].items() if v in self.adjacency}
+            self.rankings.pop('pagerank', None)
+        for node, value in results["betweenness"].items():
+            if node in self.adjacency:
+                self.betweenness[node] = value
+        if results["betweenness"]:
+            self.rankings.pop('betweenness', None)
+
+    def mark_all_dirty(self):
+        self.pagerank_dirty = True
+        self.dirty_components.update(self.members)
+
+    def value(self, metric, node):
+        if metric == 'connections':
+            return self.degree.get(node, 0)
+        if metric == 'enemy_count':
+            return self.enemy_degree.get(node, 0)
+        if metric == 'pagerank':
+            return round(self.pagerank.get(node, 0.0), 6)
+        if metric == 'betweenness':
+            n = len(self.adjacency)
+            scale = 2.0 / ((n - 1) * (n - 2)) if n > 2 else 0.0
+            return round(self.betweenness.get(node, 0.0) * scale, 6)
+        if metric == 'component_size':
+            return len(self.members[self.component[node]]) if node in self.component else 0
+        raise ValueError(f"Unknown metric: {metric}")
+
+    def _drop_node(self, node):
+        """Forget a node that only belonged to the scope through relationships it no longer has"""
+        label = self.component.pop(node)
+        del self.adjacency[node]
+        del self.members[label]
+        self.dirty_components.discard(label)
+        self.betweenness.pop(node, None)
+        self.pagerank.pop(node, None)
+        self.degree.pop(node, None)
+        self.enemy_degree.pop(node, None)
+
+    # Components
+
+    def _union(self, a, b):
+        big, small = self.component[a], self.component[b]
+        if big == small:
+            return big
+        if len(self.members[big]) < len(self.members[small]):
+            big, small = small, big
+        for node in self.members[small]:
+            self.component[node] = big
+        self.members[big] |= self.members.pop(small)
+        self.dirty_components.discard(small)
+        return big
+
+    def _split(self, source, target):
+        """After the last edge between source and target went away, check whether their component fell apart"""
+        reached = {source}
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            for other in self.adjacency[node]:
+                if other == target:
+                    return
+                if other not in reached:
+                    reached.add(other)
+                    queue.append(other)
+
+        label = self.component[source]
+        rest = self.members[label] - reached
+        # Keep the old label on whichever side still contains it
+        if label in reached:
+            self.members[label] = reached
+            new_label, new_members = target, rest
+        else:
+            self.members[label] = rest
+            new_label, new_members = source, reached
+        self.members[new_label] = new_members
+        for node in new_members:
+            self.component[node] = new_label
+        self.dirty_components.update((label, new_label))
+
+
+def pagerank(adjacency, previous, damping=0.85, tol=1e-9, max_iter=100):
+    nodes = list(adjacency)
+    n = len(nodes)
+    if not n:
+        return {}
+    # Warm start from the previous vector, so small changes converge in a few iterations
+    rank = {v: previous.get(v, 1.0 / n) for v in nodes}
+    total = sum(rank.values())
+    rank = {v: r / total for v, r in rank.items()}
+    weight = {v: sum(adjacency[v].values()) for v in nodes}
+
+    for _ in range(max_iter):
+        dangling = damping * sum(rank[v] for v in nodes if not weight[v]) / n
+        fresh = dict.fromkeys(nodes, (1.0 - damping) / n + dangling)
+        for v in nodes:
+            if weight[v]:
+                share = damping * rank[v] / weight[v]
+                for u, count in adjacency[v].items():
+                    fresh[u] += share * count
+        delta = sum(abs(fresh[v] - rank[v]) for v in nodes)
+        rank = fresh
+        if delta < tol:
+            break
+    return rank
+
+
+def betweenness(adjacency, pivots=None):
+    """Brandes' algorithm over one component, given as {node: {neighbour: count}}"""
+    scores = dict.fromkeys(adjacency, 0.0)
+    sources = list(adjacency)
+    scale = 1.0
+    if pivots and len(sources) > pivots:
+        sources = random.Random(0).sample(sorted(sources), pivots)
+        scale = len(adjacency) / pivots
+
+    for source in sources:
+        order = []
+        preds = {source: []}
+        sigma = {source: 1}
+        dist = {source: 0}
+        queue = deque([source])
+        while queue:
+            v = queue.popleft()
+            order.append(v)
+            for w in adjacency[v]:
+                if w not in dist:
+                    dist[w] = dist[v] + 1
+                    sigma[w] = 0
+                    preds[w] = []
+                    queue.append(w)
+                if dist[w] == dist[v] + 1:
+                    sigma[w] += sigma[v]
+                    preds[w].append(v)
+        delta = dict.fromkeys(order, 0.0)
+        for w in reversed(order):
+            for v in preds[w]:
+                delta[v] += sigma[v] / sigma[w] * (1.0 + delta[w])
+            if w != source:
+                scores[w] += delta[w] * scale
+
+    # Undirected: every pair was counted from both ends
+    return {node: score / 2.0 for node, score in scores.items()}
+
+
+class GraphStats:
+    """Per-character and per-ship statistics, globally and per movie"""
+
+    def __init__(self, graph, betweenness_pivots=None):
+        self.graph = graph
+        self.betweenness_pivots = betweenness_pivots
+        self._lock = threading.Lock()
+        # Centrality refresh state: a pass is wanted, a thread is running one, and how they went
+        self._pending = False
+        self._refreshing = False
+        self.centrality = {"status": "computing", "passes": 0, "seconds": None}
+        self.scopes = {None: ScopeStats(graph.characters, betweenness_pivots)}
+        for movie_id in graph.movies:
+            self.scopes[movie_id] = ScopeStats(graph.characters_by_movie.get(movie_id, {}), betweenness_pivots)
+        for key in graph.relationships:
+            self._apply('add', key)
+        with self._lock:
+            for scope in self.scopes.values():
+                scope.mark_all_dirty()
+            self._schedule_refresh()
+        graph.listeners.append(self.on_change)
+
+    def on_change(self, op, kind, key):
+        if kind != 'relationship':
+            return
+        with self._lock:
+            self._apply(op, key)
+            self._schedule_refresh()
+
+    def top_characters(self, metric, movie_id=None, limit=5):
+        if metric not in CHARACTER_METRICS:
+            raise ValueError(f"Unknown metric: {metric} (expected one of {', '.join(CHARACTER_METRICS)})")
+        with self._lock:
+            scope = self._scope(movie_id)
+            if scope is None:
+                return []
+            ranking = scope.rankings.get(metric)
+            if ranking is None:
+                values = {node: self._value(scope, metric, node, movie_id) for node in scope.adjacency}
+                ranking = sorted((node for node, value in values.items() if value),
+                                 key=lambda node: (-values[node], self._name(node)))
+                scope.rankings[metric] = ranking
+            chosen = ranking[:limit] if limit is not None else ranking
+            return [self._row(scope, node, movie_id) for node in chosen]
+
+    def characters(self, movie_id=None):
+        """Every metric for every character in scope"""
+        with self._lock:
+            scope = self._scope(movie_id)
+            if scope is None:
+                return []
+            return [self._row(scope, node, movie_id) for node in scope.adjacency]
+
+    def centrality_state(self):
+        with self._lock:
+            state = dict(self.centrality)
+            if self._pending or self._refreshing:
+                state["status"] = "computing"
+            return state
+
+    def top_ships(self, movie_id=None, limit=5):
+        routes = self.graph.routes_by_movie.get(movie_id, {}) if movie_id else self.graph.routes
+        locations = defaultdict(set)
+        for ship_id, location_id, _, _ in routes:
+            locations[ship_id].add(location_id)
+        rows = []
+        for ship_id, visited in locations.items():
+            ship = self.graph.ships[ship_id]
+            rows.append({"name": ship.get('ship_name'), "captain": ship.get('captain'), "locations": len(visited)})
+        rows.sort(key=lambda r: (-r["locations"], r["name"] or ''))
+        return rows[:limit] if limit is not None else rows
+
+    def components(self, movie_id=None):
+        with self._lock:
+            scope = self._scope(movie_id)
+            if scope is None:
+                return []
+            groups = [sorted(members) for members in scope.members.values()]
+        groups.sort(key=lambda members: (-len(members), members[0]))
+        return [{"size": len(members), "members": members} for members in groups]
+
+    def _scope(self, movie_id):
+        return self.scopes.get(movie_id or None)
+
+    def _name(self, character_id):
+        return self.graph.characters.get(character_id, {}).get('name') or ''
+
+    def _value(self, scope, metric, character_id, movie_id):
+        if metric == 'movies':
+            return self._appearances(character_id, movie_id)
+        return scope.value(metric, character_id)
+
+    def _row(self, scope, character_id, movie_id):
+        character = self.graph.characters.get(character_id, {})
+        row = {
+            "id": character_id,
+            "name": character.get('name'),
+            "faction": character.get('faction')
+        }
+        for metric in CHARACTER_METRICS:
+            row[metric] = self._value(scope, metric, character_id, movie_id)
+        return row
+
+    # Background centrality
+
+    def _schedule_refresh(self):
+        """Ask for a centrality pass; called with the lock held"""
+        self._pending = True
+        if not self._refreshing:
+            # A thread only lives while there is work, so an unused GraphStats leaves nothing behind
+            self._refreshing = True
+            threading.Thread(target=self._refresh_loop, name='stats-refresh', daemon=True).start()
+
+    def _refresh_loop(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._refreshing = False
+                    self.centrality["status"] = "current"
+                    return
+                self._pending = False
+                work = [(scope, scope.take_refresh_work()) for scope in self.scopes.values() if scope.dirty]
+            started = time.perf_counter()
+            results = [(scope, scope.compute(scope_work)) for scope, scope_work in work]
+            with self._lock:
+                for scope, scope_results in results:
+                    scope.apply_refresh(scope_results)
+                self.centrality["passes"] += 1
+                self.centrality["seconds"] = round(time.perf_counter() - started, 3)
+
+    def _appearances(self, character_id, movie_id):
+        movies = self.graph.movies_by_character.get(character_id, {})
+        if movie_id:
+            return 1 if movie_id in movies else 0
+        return len(movies)
+
+    def _apply(self, op, key):
+        source, target, rel_type, movie_id = key
+        if movie_id not in self.scopes:
+            self.scopes[movie_id] = ScopeStats((), self.betweenness_pivots)
+        for scope in (self.scopes[None], self.scopes[movie_id]):
+            if op == 'add':
+                scope.add_edge(source, target, rel_type)
+            else:
+                scope.remove_edge(source, target, rel_type)
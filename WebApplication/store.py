@@ -0,0 +1,134 @@
+"""Shared state for the server workers: named counters plus an append-only event log.
+
+The memory store is enough for a single process. The SQLite store keeps the same data in
+a file that every worker process opens, so counters survive restarts and an event one
+worker publishes reaches the other workers and their connected clients.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import deque
+
+
+class MemoryStore:
+    """Counters and events in this process only"""
+
+    def __init__(self, max_events=1000):
+        self.counters = {}
+        self.events = deque(maxlen=max_events)   # (id, type, data, origin)
+        self.last_id = 0
+        self._changed = threading.Condition()
+
+    def incr(self, name, amount=1):
+        with self._changed:
+            value = self.counters.get(name, 0) + amount
+            self.counters[name] = value
+            return value
+
+    def get(self, name):
+        return self.counters.get(name, 0)
+
+    def publish(self, event_type, data, origin=None):
+        with self._changed:
+            self.last_id += 1
+            self.events.append((self.last_id, event_type, data, origin))
+            self._changed.notify_all()
+            return self.last_id
+
+    def latest_event_id(self):
+        return self.last_id
+
+    def events_since(self, event_id, timeout=0):
+        """Events after event_id, waiting up to timeout seconds for one to arrive"""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while self.last_id <= event_id:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._changed.wait(remaining)
+            return [event for event in self.events if event[0] > event_id]
+
+
+class SQLiteStore:
+    """Counters and events in a SQLite file shared by every worker on the machine"""
+
+    def __init__(self, path, max_events=1000, poll_interval=0.2):
+        self.path = path
+        self.max_events = max_events
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                type TEXT NOT NULL,
+                data TEXT NOT NULL,
+                origin TEXT
+            )
+        """)
+
+    def _db(self):
+        # sqlite3 connections belong to the thread that opened them
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        return db
+
+    def incr(self, name, amount=1):
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("""
+                INSERT INTO counters (name, value) VALUES (?, ?)
+                ON CONFLICT(name) DO UPDATE SET value = value + excluded.value
+            """, (name, amount))
+            value = db.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return value
+
+    def get(self, name):
+        row = self._db().execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def publish(self, event_type, data, origin=None):
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            event_id = db.execute("INSERT INTO events (type, data, origin) VALUES (?, ?, ?)",
+                                  (event_type, json.dumps(data), origin)).lastrowid
+            db.execute("DELETE FROM events WHERE id <= ?", (event_id - self.max_events,))
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return event_id
+
+    def latest_event_id(self):
+        row = self._db().execute("SELECT max(id) FROM events").fetchone()
+        return row[0] or 0
+
+    def events_since(self, event_id, timeout=0):
+        """Events after event_id; other processes cannot wake us, so this polls until timeout"""
+        deadline = time.monotonic() + timeout
+        while True:
+            rows = self._db().execute("SELECT id, type, data, origin FROM events WHERE id > ? ORDER BY id",
+                                      (event_id,)).fetchall()
+            if rows or time.monotonic() >= deadline:
+                return [(row[0], row[1], json.loads(row[2]), row[3]) for row in rows]
+            time.sleep(min(self.poll_interval, max(0.0, deadline - time.monotonic())))
+
+
+def make_store(spec):
+    """'memory' or 'sqlite:<path>'"""
+    if spec == 'memory':
+        return MemoryStore()
+    if spec.startswith('sqlite:'):
+        return SQLiteStore(spec[len('sqlite:'):])
+    raise ValueError(f"Unknown SHARED_STORE: {spec} (expected memory or sqlite:<path>)")
@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(HERE, '..', '..', 'Data')
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+# server.py reads its settings at import: run it on the CSVs, with no database and no warm-up thread
+os.environ.setdefault('GRAPH_BACKEND', 'snapshot')
+os.environ.setdefault('SNAPSHOT_SOURCE', 'csv')
+os.environ.setdefault('DATA_DIR', DATA_DIR)
+os.environ.setdefault('ADMIN_TOKEN', 'test-token')
+os.environ.setdefault('SERVER_LAYOUT', '0')
+
+from graphfile import load_snapshot, write_graph  # noqa: E402
+from snapshot import GraphSnapshot  # noqa: E402
+
+
+@pytest.fixture
+def csv_graph():
+    return GraphSnapshot.from_csv(DATA_DIR)
+
+
+@pytest.fixture
+def mapped_graph(tmp_path):
+    path = str(tmp_path / 'graph.pgraph')
+    write_graph(GraphSnapshot.from_csv(DATA_DIR), path)
+    return load_snapshot(path)
+
+
+@pytest.fixture
+def client():
+    import server
+    # A fresh snapshot and empty caches, so no test sees another's changes
+    server.reload_local()
+    return server.app.test_client()
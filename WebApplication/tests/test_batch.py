@@ -0,0 +1,38 @@
+import pytest
+
+
+@pytest.mark.parametrize('body', [[{"path": "/api/movies"}], 5, "requests", None])
+def test_body_must_be_an_object(client, body):
+    response = client.post('/api/batch', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+@pytest.mark.parametrize('requests', [None, [], {}, "x", [{"path": "/api/movies"}] * 51])
+def test_requests_must_be_a_short_list(client, requests):
+    assert client.post('/api/batch', json={"requests": requests}).status_code == 400
+
+
+def test_each_item_fails_on_its_own(client, monkeypatch):
+    import server
+    monkeypatch.setitem(server.BATCH_VIEWS, 'characters', lambda item: 1 / 0)
+    response = client.post('/api/batch', json={"requests": [
+        {"name": "list_id", "view": "character", "id": ["C1"]},
+        {"name": "no_id", "view": "character"},
+        {"name": "list_view", "view": ["character"]},
+        {"name": "list_path", "path": ["/api/movies"]},
+        {"name": "unknown", "path": "/api/nowhere"},
+        {"name": "excluded", "path": "/api/events"},
+        {"name": "failing", "view": "characters"},
+        {"name": "movies", "path": "/api/character/C1/movies"},
+        {"name": "character", "view": "character", "id": "C1"},
+        7,
+    ]})
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert {name: result["status"] for name, result in results.items()} == {
+        "list_id": 400, "no_id": 400, "list_view": 400, "list_path": 400, "unknown": 404,
+        "excluded": 400, "failing": 500, "movies": 200, "character": 200, "9": 400,
+    }
+    assert results["movies"]["body"] == results["character"]["body"]["movies"]
+    assert [movie["title"] for movie in results["movies"]["body"]]
@@ -0,0 +1,100 @@
+import graphfile
+from graphfile import GraphFile, MappedSnapshot, write_graph
+
+
+def answers(graph):
+    """Every query the API asks a snapshot, with its rows"""
+    rows = {
+        "characters": graph.get_characters(),
+        "relationships": graph.get_character_relationships(),
+        "routes": graph.get_ship_routes(),
+        "rivalries": graph.get_rivalries(),
+        "full": graph.get_full_graph(),
+        "movies": graph.get_movies(),
+        "factions": graph.get_factions(),
+        "counts": graph.counts(),
+    }
+    for movie_id in graph.movies:
+        rows[f"movie/{movie_id}"] = (graph.get_movie_relationships(movie_id), graph.get_ship_routes(movie_id),
+                                     graph.get_rivalries(movie_id), graph.get_factions(movie_id))
+    for character_id in graph.characters:
+        rows[f"character/{character_id}"] = (graph.get_character_connections(character_id),
+                                             graph.get_character_movies(character_id))
+    return rows
+
+
+def indexes(graph):
+    return {name: {key: list(bucket) for key, bucket in getattr(graph, name).items()}
+            for name in ('relationships_by_type', 'relationships_by_movie', 'relationships_by_character',
+                         'routes_by_movie', 'routes_by_ship', 'movies_by_character',
+                         'characters_by_movie', 'cast_by_character')}
+
+
+def test_mapped_snapshot_matches_csv(csv_graph, mapped_graph):
+    assert isinstance(mapped_graph, MappedSnapshot)
+    assert answers(mapped_graph) == answers(csv_graph)
+    assert indexes(mapped_graph) == indexes(csv_graph)
+
+
+def test_export_of_mapped_snapshot_is_identical(tmp_path, csv_graph, mapped_graph):
+    write_graph(csv_graph, str(tmp_path / 'a.pgraph'))
+    write_graph(mapped_graph, str(tmp_path / 'b.pgraph'))
+    assert (tmp_path / 'a.pgraph').read_bytes() == (tmp_path / 'b.pgraph').read_bytes()
+
+
+def test_live_changes_on_mapped_snapshot(csv_graph, mapped_graph, monkeypatch):
+    seen = []
+    mapped_graph.listeners.append(lambda op, kind, key: seen.append((op, key)))
+    existing = next(iter(csv_graph.relationships))
+    source, target = list(csv_graph.characters)[:2]
+    added = (source, target, 'ALLY', 'M9')
+
+    def change(graph):
+        assert graph.insert_relationship(*added) == added
+        assert graph.insert_relationship(*added) is None
+        assert graph.delete_relationship(*existing) == existing
+        assert graph.delete_relationship(*existing) is None
+
+    change(csv_graph)
+    decoded = []
+    edge = GraphFile.edge
+    monkeypatch.setattr(GraphFile, 'edge', lambda self, kind, number: decoded.append(number) or edge(self, kind, number))
+    change(mapped_graph)
+    # Copying the touched buckets reads each edge a few times at most, not once per lookup
+    assert len(decoded) <= 4 * len(csv_graph.relationships)
+
+    assert seen == [('add', added), ('remove', existing)]
+    assert answers(mapped_graph) == answers(csv_graph)
+    assert indexes(mapped_graph) == indexes(csv_graph)
+
+
+def test_graph_file_decodes_lazily(tmp_path, csv_graph):
+    path = str(tmp_path / 'graph.pgraph')
+    write_graph(csv_graph, path)
+    graph_file = GraphFile(path)
+    graph = graphfile.load_snapshot(path)
+    assert graph_file._node_index is None and all(s is None for s in graph_file._strings)
+    assert graph.graph_file._node_index is None
+    assert 'C1' in graph.characters
+    assert graph.graph_file._node_index is not None
+    graph_file.close()
+
+
+def test_endpoints_match_between_csv_and_mapped(client, mapped_graph, monkeypatch):
+    import server
+    paths = ['/api/characters', '/api/relationships/characters', '/api/movies', '/api/factions',
+             '/api/graph/full', '/api/ships/routes', '/api/rivalries', '/api/timeline', '/api/leaderboard',
+             '/api/search?q=jack', '/api/path/C1/C20?mode=all', '/api/ego?seeds=C1&depth=2',
+             '/api/character/C1/connections', '/api/character/C1/movies', '/api/relationships/M1',
+             '/api/timeline/M2?mode=cumulative', '/api/timeline/diff?from=M1&to=M3']
+
+    def bodies():
+        responses = {path: client.get(path) for path in paths}
+        assert {path: r.status_code for path, r in responses.items()} == dict.fromkeys(paths, 200)
+        return {path: r.get_json() for path, r in responses.items()}
+
+    from_csv = bodies()
+    # Versions differ between snapshots, so nothing cached for the CSV graph is reused
+    monkeypatch.setattr(server, 'snapshot', mapped_graph)
+    assert server.get_index_graph() is mapped_graph
+    assert bodies() == from_csv
@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+from paths import PathIndex
+
+AUTH = {"Authorization": "Bearer test-token"}
+
+
+def distances(index, graph):
+    return {(a, b): index.distance(a, b) for a in graph.characters for b in graph.characters}
+
+
+def wait_until_current(index):
+    deadline = time.time() + 10
+    while index.component is None and time.time() < deadline:
+        time.sleep(0.01)
+    assert index.component is not None
+
+
+@pytest.mark.parametrize('table_limit', [3000, 0])
+def test_live_changes_match_a_rebuild(csv_graph, table_limit):
+    index = PathIndex(csv_graph, table_limit)
+    existing = next(iter(csv_graph.relationships))
+    characters = list(csv_graph.characters)
+    csv_graph.insert_relationship(characters[0], characters[-1], 'ALLY', 'M1')
+    csv_graph.delete_relationship(*existing)
+    # Right after a change the BFS answers; once the refresh lands the table does
+    for _ in range(2):
+        rebuilt = PathIndex(csv_graph, table_limit)
+        assert index.adjacency == rebuilt.adjacency
+        assert distances(index, csv_graph) == distances(rebuilt, csv_graph)
+        assert (index.find_paths(characters[0], characters[-1], mode='k', k=3)
+                == rebuilt.find_paths(characters[0], characters[-1], mode='k', k=3))
+        wait_until_current(index)
+
+
+def test_index_survives_live_changes(client):
+    import server
+    index = server.get_path_index()
+    change = {"source_id": "C1", "target_id": "C30", "type": "ALLY", "movie_id": "M1"}
+    assert client.post('/api/relationships', json=change, headers=AUTH).status_code == 200
+    try:
+        assert server.get_path_index() is index
+        assert client.get('/api/path/distance/C1/C30').get_json() == {"found": True, "degrees": 1}
+    finally:
+        client.delete('/api/relationships', json=change, headers=AUTH)
+
+
+@pytest.mark.parametrize('query', ['k=0&mode=k', 'k=-1&mode=k', 'k=x', 'max_depth=0', 'max_depth=x', 'mode=fast'])
+def test_bad_path_options(client, query):
+    assert client.get(f'/api/path/C1/C2?{query}').status_code == 400
+
+
+@pytest.mark.parametrize('body', [
+    [{"from": "C1", "to": "C2"}],
+    "C1",
+    {"pairs": {"from": "C1", "to": "C2"}},
+    {"pairs": [{"from": "C1", "to": "C2"}], "types": 5},
+    {"pairs": [{"from": "C1", "to": "C2"}], "types": [5]},
+    {"pairs": [{"from": "C1", "to": "C2"}], "mode": "k", "k": 0},
+    {"pairs": [{"from": ["C1"], "to": "C2"}]},
+    {"pairs": [{"from": "C1"}]},
+])
+def test_bad_path_batches(client, body):
+    response = client.post('/api/path/batch', json=body)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_path_batch(client):
+    response = client.post('/api/path/batch', json={"pairs": [["C1", "C2"]], "types": ["ALLY", "CREW"]})
+    assert response.status_code == 200
+    assert response.get_json()["results"][0]["from"] == "C1"
@@ -0,0 +1,44 @@
+import time
+
+AUTH = {"Authorization": "Bearer test-token"}
+
+
+def wait_ready(client):
+    deadline = time.time() + 30
+    response = client.get('/ready')
+    while response.status_code != 200 and time.time() < deadline:
+        time.sleep(0.05)
+        response = client.get('/ready')
+    return response
+
+
+def test_live_is_always_up(client):
+    assert client.get('/live').get_json()["status"] == "alive"
+
+
+def test_ready_after_warmup(client):
+    response = wait_ready(client)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["ready"] is True
+    assert {step["name"]: step["status"] for step in body["warmup"]["steps"]} == {
+        "graph": "ok", "indexes": "ok", "layouts": "ok", "endpoints": "ok"}
+    caches = body["caches"]
+    assert caches["graph_loaded"] is True
+    assert set(caches["indexes"].values()) == {"current"}
+
+
+def test_cached_payloads_are_current_until_the_data_changes(client):
+    wait_ready(client)
+    client.get('/api/graph/full')
+    client.get('/api/layout/characters')
+    payloads = client.get('/ready').get_json()["caches"]["payloads"]
+    assert payloads["current"] >= 1 and payloads["stale"] == 0
+
+    change = {"source_id": "C1", "target_id": "C30", "type": "ENEMY", "movie_id": "M2"}
+    assert client.post('/api/relationships', json=change, headers=AUTH).status_code == 200
+    try:
+        payloads = client.get('/ready').get_json()["caches"]["payloads"]
+        assert payloads["current"] == 0 and payloads["stale"] >= 1
+    finally:
+        client.delete('/api/relationships', json=change, headers=AUTH)
@@ -0,0 +1,18 @@
+import random
+
+from sampling import ENEMY_FACTIONS, Sampler
+
+
+def test_enemies_are_the_original_factions(csv_graph):
+    assert ENEMY_FACTIONS == ['Royal Navy', 'East India Trading Company', 'Cursed']
+    sampler = Sampler(csv_graph)
+    expected = sorted(c for c, props in csv_graph.characters.items() if props.get('faction') in ENEMY_FACTIONS)
+    assert sampler.enemies == expected
+    assert all(csv_graph.characters[c].get('faction') != 'EITC' for c in sampler.enemies)
+
+
+def test_same_seed_same_picks(csv_graph):
+    sampler = Sampler(csv_graph)
+    picks = [[sampler.pick_enemy(random.Random(seed)), sampler.pick(random.Random(seed), 'Ship')] for seed in (1, 1)]
+    assert picks[0] == picks[1]
+    assert picks[0][0].get('faction') in ENEMY_FACTIONS
@@ -0,0 +1,155 @@
+"""The character graph as it stands in each movie, and as it has built up by each movie.
+
+Movies are put in release order. Every character pair keeps a single short history of
+(position, types) entries, so the per-movie and cumulative states all share the same
+records instead of each holding its own copy. Reading a state walks the histories, and a
+diff between two movies only looks at the pairs that changed in between.
+"""
+import bisect
+from collections import defaultdict
+
+from snapshot import _sort_key
+
+MODES = ['movie', 'cumulative']
+
+
+class Timeline:
+    """Per-movie and cumulative states of the RELATIONSHIP graph, plus diffs between them"""
+
+    def __init__(self, graph):
+        self.graph = graph
+        movies = sorted(graph.movies.values(), key=lambda m: (_sort_key(m.get('release_year')), m.get('id')))
+        self.order = [movie['id'] for movie in movies]
+        self.position = {movie_id: i for i, movie_id in enumerate(self.order)}
+
+        by_pair = defaultdict(lambda: defaultdict(list))
+        for source, target, rel_type, movie in graph.relationships:
+            # Relationships pointing at a movie that does not exist have no place on the timeline
+            if movie in self.position:
+                by_pair[(source, target)][self.position[movie]].append(rel_type)
+
+        # pair -> ([positions], [types]) with positions ascending; equal type tuples are shared
+        self.history = {}
+        self.pairs_at = [[] for _ in self.order]
+        self.pairs_from = [[] for _ in self.order]
+        self.first_seen = {}
+        shared_types = {}
+        for pair, entries in by_pair.items():
+            positions = sorted(entries)
+            types = []
+            for position in positions:
+                key = tuple(sorted(entries[position], key=_sort_key))
+                types.append(shared_types.setdefault(key, key))
+                self.pairs_at[position].append(pair)
+            self.history[pair] = (positions, types)
+            self.pairs_from[positions[0]].append(pair)
+            for character in pair:
+                if positions[0] < self.first_seen.get(character, len(self.order)):
+                    self.first_seen[character] = positions[0]
+
+    def types_at(self, pair, position, mode):
+        """Types of a pair in one movie, or as of that movie; None when it has none"""
+        entry = self.history.get(pair)
+        if entry is None:
+            return None, None
+        positions, types = entry
+        i = bisect.bisect_right(positions, position) - 1
+        if i < 0 or (mode == 'movie' and positions[i] != position):
+            return None, None
+        return types[i], positions[i]
+
+    def state(self, movie_id, mode='movie'):
+        """Nodes and edges on screen for one movie: {"nodes": [...], "edges": [...]}"""
+        position = self.position[movie_id]
+        if mode == 'movie':
+            pairs = self.pairs_at[position]
+        else:
+            pairs = [pair for p in range(position + 1) for pair in self.pairs_from[p]]
+
+        edges, characters = [], {}
+        for pair in pairs:
+            types, since = self.types_at(pair, position, mode)
+            edges.append(self._edge_row(pair, types, since))
+            characters[pair[0]] = True
+            characters[pair[1]] = True
+        return {
+            "movie_id": movie_id,
+            "mode": mode,
+            "nodes": [self._node_row(c) for c in characters],
+            "edges": edges
+        }
+
+    def diff(self, from_movie, to_movie, mode='movie'):
+        """What changes on screen going from one movie to another"""
+        x, y = self.position[from_movie], self.position[to_movie]
+        if mode == 'movie':
+            pairs = dict.fromkeys(self.pairs_at[x] + self.pairs_at[y])
+        else:
+            # Only pairs with an entry between the two movies can differ
+            low, high = min(x, y), max(x, y)
+            pairs = dict.fromkeys(pair for p in range(low + 1, high + 1) for pair in self.pairs_at[p])
+
+        added, removed, changed = [], [], []
+        for pair in pairs:
+            before, _ = self.types_at(pair, x, mode)
+            after, since = self.types_at(pair, y, mode)
+            if before == after:
+                continue
+            if before is None:
+                added.append(self._edge_row(pair, after, since))
+            elif after is None:
+                removed.append(self._edge_row(pair, before, None))
+            else:
+                row = self._edge_row(pair, after, since)
+                row["previous_types"] = list(before)
+                changed.append(row)
+
+        before_nodes = self._characters(x, mode)
+        after_nodes = self._characters(y, mode)
+        return {
+            "from": from_movie,
+            "to": to_movie,
+            "mode": mode,
+            "nodes": {
+                "added": [self._node_row(c) for c in after_nodes if c not in before_nodes],
+                "removed": [c for c in before_nodes if c not in after_nodes]
+            },
+            "edges": {"added": added, "removed": removed, "changed": changed}
+        }
+
+    def summary(self):
+        """Each movie in order with how much of the graph it holds and adds"""
+        rows, cumulative = [], 0
+        new_characters = [0] * len(self.order)
+        for position in self.first_seen.values():
+            new_characters[position] += 1
+        for position, movie_id in enumerate(self.order):
+            movie = self.graph.movies[movie_id]
+            cumulative += len(self.pairs_from[position])
+            rows.append({
+                "movie_id": movie_id,
+                "title": movie.get('title'),
+                "year": movie.get('release_year'),
+                "position": position,
+                "pairs": len(self.pairs_at[position]),
+                "cumulative_pairs": cumulative,
+                "new_characters": new_characters[position]
+            })
+        return rows
+
+    def _characters(self, position, mode):
+        if mode == 'movie':
+            return dict.fromkeys(c for pair in self.pairs_at[position] for c in pair)
+        return dict.fromkeys(c for c, first in self.first_seen.items() if first <= position)
+
+    def _node_row(self, character_id):
+        character = self.graph.characters.get(character_id, {})
+        return {"id": character_id, "name": character.get('name'), "faction": character.get('faction')}
+
+    def _edge_row(self, pair, types, since):
+        return {
+            "source_id": pair[0],
+            "target_id": pair[1],
+            "types": list(types),
+            "movie_id": self.order[since] if since is not None else None
+        }
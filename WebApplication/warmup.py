@@ -0,0 +1,78 @@
+"""Startup warm-up: named steps run once on a background thread, with their timings kept.
+
+/ready reports this state, so a load balancer only sends users to a worker once its
+connection pool, graph, indexes and first responses are in place. A run that fails a
+required step (say Neo4j is still starting) is retried from that step until it succeeds.
+"""
+import threading
+import time
+
+
+class Warmup:
+    """Runs (name, function, required) steps in order; a step's return value is kept as its detail"""
+
+    def __init__(self, steps, retry_interval=5.0):
+        self.steps = steps
+        self.retry_interval = retry_interval
+        self.status = 'pending'
+        self.attempts = 0
+        self.results = {}   # step name -> {"status", "seconds", "detail" or "error"}
+        self.started = None
+        self.seconds = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.status == 'ready'
+
+    def start(self):
+        """Start the warm-up thread unless it is already running or done"""
+        with self._lock:
+            if self._thread is not None:
+                return False
+            self._thread = threading.Thread(target=self.run, name='warmup', daemon=True)
+        self._thread.start()
+        return True
+
+    def run(self):
+        self.status = 'warming'
+        self.started = time.time()
+        began = time.perf_counter()
+        while True:
+            self.attempts += 1
+            if self._run_steps():
+                break
+            time.sleep(self.retry_interval)
+        self.seconds = round(time.perf_counter() - began, 3)
+        self.status = 'ready'
+
+    def _run_steps(self):
+        for name, function, required in self.steps:
+            if self.results.get(name, {}).get('status') == 'ok':
+                continue
+            began = time.perf_counter()
+            try:
+                result = {"status": "ok", "detail": function()}
+            except Exception as e:
+                # Optional steps only make the first requests slower, so they never block readiness
+                result = {"status": "failed" if required else "skipped", "error": str(e)}
+            result["seconds"] = round(time.perf_counter() - began, 3)
+            self.results[name] = result
+            if result["status"] == 'failed':
+                return False
+        return True
+
+    def state(self):
+        steps = []
+        for name, _, required in self.steps:
+            step = {"name": name, "required": required, "status": "pending"}
+            step.update(self.results.get(name, {}))
+            steps.append(step)
+        return {
+            "status": self.status,
+            "attempts": self.attempts,
+            "started": self.started,
+            "seconds": self.seconds,
+            "steps": steps
+        }